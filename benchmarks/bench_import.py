@@ -0,0 +1,73 @@
+"""
+Cold-start budget of rv16_lib.
+
+Each scenario is imported in a fresh interpreter. The benchmark fails (exit status 1) if a scenario
+loads a module it must not load, or if its import time, measured as the overhead over a bare
+interpreter start, exceeds the budget in `import_budget.json`.
+
+Usage:
+    python -m benchmarks.bench_import [--repeat 7] [--budget benchmarks/import_budget.json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+DEFAULT_BUDGET = os.path.join(os.path.dirname(__file__), "import_budget.json")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import sys
+{statement}
+print(",".join(sorted(m for m in {forbidden!r} if m in sys.modules)))
+"""
+
+
+def run_once(statement: str, forbidden: list[str]) -> tuple[float, list[str]]:
+    code = PROBE.format(statement=statement, forbidden=tuple(forbidden))
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=ROOT, check=True)
+    elapsed = time.perf_counter() - start
+    loaded = [m for m in completed.stdout.strip().split(",") if m]
+    return elapsed, loaded
+
+
+def measure(statement: str, forbidden: list[str], repeat: int) -> tuple[float, list[str]]:
+    timings = []
+    loaded: list[str] = []
+    for _ in range(repeat):
+        elapsed, loaded = run_once(statement, forbidden)
+        timings.append(elapsed)
+    return min(timings), loaded
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--budget", default=DEFAULT_BUDGET)
+    args = parser.parse_args()
+
+    with open(args.budget) as file:
+        scenarios = json.load(file)["scenarios"]
+
+    interpreter, _ = measure("pass", [], args.repeat)
+    print(f"bare interpreter: {interpreter * 1000:.1f} ms")
+
+    failures = 0
+    for scenario in scenarios:
+        elapsed, loaded = measure(scenario["statement"], scenario.get("forbidden", []), args.repeat)
+        overhead_ms = (elapsed - interpreter) * 1000
+        ok = overhead_ms <= scenario["budget_ms"] and not loaded
+        failures += not ok
+        status = "ok" if ok else "FAIL"
+        print(f"  [{status:>4}] {scenario['statement']:<60} {overhead_ms:7.1f} ms (budget {scenario['budget_ms']} ms)")
+        if loaded:
+            print(f"         unexpectedly loaded: {', '.join(loaded)}")
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
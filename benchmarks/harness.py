@@ -0,0 +1,169 @@
+"""
+Measurement, baseline and comparison helpers of the benchmark suite.
+"""
+import asyncio
+import gc
+import json
+import platform
+import statistics
+import sys
+import time
+from typing import Awaitable, Callable, Optional
+
+from pydantic import BaseModel
+
+
+class BenchResult(BaseModel):
+    """Result of one benchmark.
+    Args:
+        name: Name of the benchmark
+        ops: Number of operations measured, each call counting as `batch` operations
+        batch: Number of items handled by one call (1 for single operations)
+        ops_per_sec: Throughput, in items per second
+        p50_us: Median latency of one call, in microseconds
+        p99_us: 99th percentile latency of one call, in microseconds
+    """
+    name: str
+    ops: int
+    batch: int = 1
+    ops_per_sec: float
+    p50_us: float
+    p99_us: float
+
+
+class Baseline(BaseModel):
+    """Results saved to compare later runs against."""
+    python: str
+    platform: str
+    results: dict[str, BenchResult]
+
+
+class Regression(BaseModel):
+    """A metric that got worse than the baseline by more than the allowed threshold."""
+    name: str
+    metric: str
+    baseline: float
+    current: float
+    change: float
+
+
+def _summarize(name: str, latencies: list[float], elapsed: float, batch: int) -> BenchResult:
+    latencies.sort()
+    p99_index = min(len(latencies) - 1, int(len(latencies) * 0.99))
+    return BenchResult(name=name,
+                       ops=len(latencies) * batch,
+                       batch=batch,
+                       ops_per_sec=len(latencies) * batch / elapsed,
+                       p50_us=statistics.median(latencies) * 1e6,
+                       p99_us=latencies[p99_index] * 1e6)
+
+
+def measure(name: str, fn: Callable[[], object], iterations: int, warmup: int = 10, batch: int = 1) -> BenchResult:
+    """Call `fn` `iterations` times and record the latency of each call.
+    Args:
+        name (str): Name of the benchmark
+        fn (Callable): The operation to measure
+        iterations (int): Number of measured calls
+        warmup (int): Number of calls made before measuring
+        batch (int): Number of items handled by one call, to report throughput in items per second
+
+    Returns:
+        BenchResult: Throughput and latency percentiles
+    """
+    for _ in range(warmup):
+        fn()
+
+    latencies = []
+    # Like timeit, keep the cyclic GC out of the measurement
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            call_start = time.perf_counter()
+            fn()
+            latencies.append(time.perf_counter() - call_start)
+        elapsed = time.perf_counter() - start
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return _summarize(name, latencies, elapsed, batch)
+
+
+async def measure_async(name: str, fn: Callable[[], Awaitable[object]], iterations: int, warmup: int = 10,
+                        batch: int = 1, concurrency: int = 1) -> BenchResult:
+    """Await `fn` `iterations` times, with up to `concurrency` calls in flight, and record the
+    latency of each call. See `measure`.
+    """
+    for _ in range(warmup):
+        await fn()
+
+    latencies = []
+    remaining = iterations
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            call_start = time.perf_counter()
+            await fn()
+            latencies.append(time.perf_counter() - call_start)
+
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return _summarize(name, latencies, elapsed, batch)
+
+
+def save_baseline(results: list[BenchResult], path: str):
+    """Write the results to a JSON baseline file."""
+    baseline = Baseline(python=platform.python_version(),
+                        platform=platform.platform(),
+                        results={r.name: r for r in results})
+    with open(path, "w") as file:
+        file.write(baseline.model_dump_json(indent=2))
+
+
+def load_baseline(path: str) -> Baseline:
+    """Read a JSON baseline file written by `save_baseline`."""
+    with open(path) as file:
+        return Baseline.model_validate(json.load(file))
+
+
+def compare(results: list[BenchResult], baseline: Baseline, threshold: float = 0.2) -> list[Regression]:
+    """List the benchmarks whose throughput dropped, or whose p50 or p99 latency grew, by more than
+    `threshold` (a fraction) compared to the baseline. Benchmarks missing from the baseline are skipped.
+    """
+    regressions = []
+    for result in results:
+        reference = baseline.results.get(result.name)
+        if reference is None:
+            continue
+
+        throughput_change = result.ops_per_sec / reference.ops_per_sec - 1
+        if throughput_change < -threshold:
+            regressions.append(Regression(name=result.name, metric="ops_per_sec", baseline=reference.ops_per_sec,
+                                          current=result.ops_per_sec, change=throughput_change))
+        for metric in ("p50_us", "p99_us"):
+            before, after = getattr(reference, metric), getattr(result, metric)
+            change = after / before - 1
+            if change > threshold:
+                regressions.append(Regression(name=result.name, metric=metric, baseline=before,
+                                              current=after, change=change))
+    return regressions
+
+
+def print_results(results: list[BenchResult], baseline: Optional[Baseline] = None, file=sys.stdout):
+    """Print a table of the results, with the throughput change against the baseline if given."""
+    print(f"{'benchmark':<36} {'ops/s':>12} {'p50 us':>10} {'p99 us':>10} {'vs base':>8}", file=file)
+    for result in results:
+        reference = baseline.results.get(result.name) if baseline else None
+        change = f"{(result.ops_per_sec / reference.ops_per_sec - 1) * 100:+7.1f}%" if reference else ""
+        print(f"{result.name:<36} {result.ops_per_sec:12.0f} {result.p50_us:10.1f} {result.p99_us:10.1f} {change:>8}",
+              file=file)
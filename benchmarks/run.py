@@ -0,0 +1,188 @@
+"""
+Offline benchmark suite of the HTTP helpers, the Configuration Manager proxies and the storage connectors.
+
+Every service is replaced by an in-process stand-in (see `benchmarks.standins`), so the numbers
+track the client-side cost of rv16_lib from one release to the next. Requires `rv16-lib[bench]`.
+
+Usage:
+    python -m benchmarks.run                               # run and print
+    python -m benchmarks.run --save baseline.json          # run and save a baseline
+    python -m benchmarks.run --compare baseline.json       # run and fail (exit 1) on regressions
+    python -m benchmarks.run --suite redis --scale 0.2     # run one suite, with fewer iterations
+"""
+import argparse
+import asyncio
+import sys
+from typing import Callable
+
+from benchmarks.harness import BenchResult, measure, measure_async, save_baseline, load_baseline, compare, \
+    print_results
+from benchmarks.standins import ConfigurationManagerApp, ASGIAdapter, fake_redis_connector, fake_mongo_connector
+
+import httpx
+
+from rv16_lib.configuration_manager import ConfigurationManagerProxy, AsyncConfigurationManagerProxy, \
+    ServiceConfigurationRequest
+from rv16_lib.http_client import http_clients
+from rv16_lib.storage.mongo_batch_writer import MongoBatchWriter, BatchWriterSettings
+from rv16_lib.storage.mongo_bulk import MongoInsert, MongoDelete
+from rv16_lib.storage.mongo_element import MongoElement
+from rv16_lib.storage.redis_connector import RedisElement
+from rv16_lib.utils import call_srv_sync, call_srv_async
+
+CM_HOST = "cm-standin"
+CM_PORT = 8000
+CM_URL = f"http://{CM_HOST}:{CM_PORT}"
+BULK = 100
+
+
+class BenchConfig(MongoElement):
+    hostname: str
+    port: int
+    options: dict[str, str] = {}
+
+
+def _mount_configuration_manager() -> ConfigurationManagerApp:
+    app = ConfigurationManagerApp()
+    for i in range(20):
+        app.set_configuration("bench", f"service-{i}",
+                              {"hostname": f"host-{i}", "port": 8000 + i,
+                               "options": {f"key-{k}": f"value-{k}" for k in range(20)}})
+    http_clients.mount(CM_URL, adapter=ASGIAdapter(app), transport=httpx.ASGITransport(app=app))
+    return app
+
+
+def http_suite(scale: float) -> list[BenchResult]:
+    _mount_configuration_manager()
+    payload = ServiceConfigurationRequest(provider="bench", service="service-0").model_dump()
+    url = f"{CM_URL}/get-service-configuration"
+    n = _n(2000, scale)
+
+    results = [measure("http.call_srv_sync", lambda: call_srv_sync("POST", url, json=payload), n)]
+
+    async def run_async() -> list[BenchResult]:
+        call = lambda: call_srv_async("POST", url, json=payload)
+        return [await measure_async("http.call_srv_async", call, n),
+                await measure_async("http.call_srv_async.c16", call, n, concurrency=16)]
+
+    results += asyncio.run(run_async())
+    return results
+
+
+def proxy_suite(scale: float) -> list[BenchResult]:
+    _mount_configuration_manager()
+    payload = ServiceConfigurationRequest(provider="bench", service="service-0")
+    uncached = ConfigurationManagerProxy(hostname=CM_HOST, port=CM_PORT, cache_ttl=None)
+    cached = ConfigurationManagerProxy(hostname=CM_HOST, port=CM_PORT)
+    revalidated = ConfigurationManagerProxy(hostname=CM_HOST, port=CM_PORT, cache_ttl=1e-9, cache_stale_ttl=1e-9)
+    n = _n(2000, scale)
+
+    results = [
+        measure("proxy.get.uncached", lambda: uncached.get(payload, BenchConfig), n),
+        measure("proxy.get.cached", lambda: cached.get(payload, BenchConfig), _n(100000, scale)),
+        measure("proxy.get.not_modified", lambda: revalidated.get(payload, BenchConfig), n),
+    ]
+
+    async def run_async() -> list[BenchResult]:
+        proxy = AsyncConfigurationManagerProxy(hostname=CM_HOST, port=CM_PORT, cache_ttl=None)
+        payloads = [ServiceConfigurationRequest(provider="bench", service=f"service-{i}") for i in range(20)]
+        return [await measure_async("proxy.async.get.uncached", lambda: proxy.get(payload, BenchConfig), n),
+                await measure_async("proxy.async.get_many.20", lambda: proxy.get_many(payloads, BenchConfig),
+                                    _n(200, scale), batch=len(payloads))]
+
+    results += asyncio.run(run_async())
+    return results
+
+
+def redis_suite(scale: float) -> list[BenchResult]:
+    connector = fake_redis_connector()
+    element = RedisElement(key="bench:single", value="x" * 64)
+    elements = [RedisElement(key=f"bench:bulk:{i}", value="x" * 64) for i in range(BULK)]
+    connector.insert_one(element)
+    n = _n(5000, scale)
+
+    return [
+        measure("redis.insert_one", lambda: connector.insert_one(element), n),
+        measure("redis.find", lambda: connector.find(element), n),
+        measure(f"redis.insert_many.{BULK}", lambda: connector.insert_many(elements), _n(500, scale), batch=BULK),
+        measure(f"redis.find_many.{BULK}", lambda: connector.find_many(elements), _n(500, scale), batch=BULK),
+    ]
+
+
+def mongo_suite(scale: float) -> list[BenchResult]:
+    connector = fake_mongo_connector()
+    collection = "bench"
+    element = BenchConfig(hostname="host", port=1, options={"a": "b"})
+    connector.insert_many([BenchConfig(hostname=f"host-{i}", port=i) for i in range(1000)], collection)
+    batch = [BenchConfig(hostname=f"bulk-{i}", port=i) for i in range(BULK)]
+    n = _n(2000, scale)
+
+    def bulk_write():
+        operations = [MongoInsert(element=e.model_copy()) for e in batch]
+        operations.append(MongoDelete(query={"hostname": {"$regex": "^bulk-"}}, many=True))
+        connector.bulk_write(operations, collection)
+
+    writer = MongoBatchWriter(connector, "bench_events", BatchWriterSettings(max_batch_size=BULK))
+
+    def batch_writer():
+        for e in batch:
+            writer.submit(e)
+        writer.flush()
+
+    results = [
+        measure("mongo.insert_one", lambda: connector.insert_one(element.model_copy(), collection), n),
+        measure("mongo.find.one", lambda: connector.find({"port": 500}, collection, BenchConfig), n),
+        measure(f"mongo.find.{BULK}", lambda: connector.find({"port": {"$lt": BULK}}, collection, BenchConfig),
+                _n(200, scale), batch=BULK),
+        measure("mongo.find_stream.1000", lambda: sum(1 for _ in connector.find_stream({}, collection, BenchConfig,
+                                                                                       limit=1000)),
+                _n(50, scale), batch=1000),
+        measure(f"mongo.bulk_write.{BULK}", bulk_write, _n(100, scale), batch=BULK + 1),
+        measure(f"mongo.batch_writer.{BULK}", batch_writer, _n(100, scale), batch=BULK),
+    ]
+    writer.close()
+    return results
+
+
+SUITES: dict[str, Callable[[float], list[BenchResult]]] = {
+    "http": http_suite,
+    "proxy": proxy_suite,
+    "redis": redis_suite,
+    "mongo": mongo_suite,
+}
+
+
+def _n(iterations: int, scale: float) -> int:
+    return max(10, int(iterations * scale))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--suite", action="append", choices=sorted(SUITES), help="Suite to run, all by default")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplier of the number of iterations")
+    parser.add_argument("--save", metavar="PATH", help="Save the results as a baseline")
+    parser.add_argument("--compare", metavar="PATH", help="Compare the results against a baseline")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Allowed relative degradation before a benchmark counts as a regression")
+    args = parser.parse_args()
+
+    results = []
+    for name in args.suite or SUITES:
+        results += SUITES[name](args.scale)
+
+    baseline = load_baseline(args.compare) if args.compare else None
+    print_results(results, baseline)
+    if args.save:
+        save_baseline(results, args.save)
+        print(f"Baseline saved to {args.save}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        for r in regressions:
+            print(f"REGRESSION {r.name} {r.metric}: {r.baseline:.1f} -> {r.current:.1f} ({r.change * 100:+.1f}%)")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
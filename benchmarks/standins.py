@@ -0,0 +1,120 @@
+"""
+In-process stand-ins for the services the benchmarks talk to, so that the suite runs offline:
+
+  - `ConfigurationManagerApp`: an ASGI application answering like the Configuration Manager,
+    reached through httpx's ASGI transport (async) or `ASGIAdapter` (requests)
+  - `fake_redis_connector`: a RedisConnector on fakeredis
+  - `fake_mongo_connector`: a MongoConnector on mongomock
+
+The stand-ins measure the client-side cost of rv16_lib (serialization, validation, pooling,
+caching), not the cost of the real servers or of the network.
+"""
+import asyncio
+import hashlib
+import json
+import threading
+
+import httpx
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+from rv16_lib.storage.mongo_connector import MongoConnector
+from rv16_lib.storage.redis_connector import RedisConnector
+
+
+class ConfigurationManagerApp:
+    """ ASGI application implementing the Configuration Manager endpoints used by the proxies.
+    Configurations are answered as JSON-encoded JSON strings, with an ETag, and conditional
+    requests get a 304 when the configuration did not change.
+    """
+
+    def __init__(self, register_path: str = "/register-service", get_path: str = "/get-service-configuration"):
+        self.register_path = register_path
+        self.get_path = get_path
+        self.configurations: dict[tuple[str, str], tuple[bytes, str]] = {}
+
+    def set_configuration(self, provider: str, service: str, configuration: dict):
+        body = json.dumps(json.dumps(configuration)).encode()
+        self.configurations[(provider, service)] = body, f'"{hashlib.sha1(body).hexdigest()}"'
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+
+        headers = {k.decode().lower(): v.decode() for k, v in scope["headers"]}
+        status, payload, extra = self._handle(scope["path"], json.loads(body) if body else {}, headers)
+        response_headers = [(b"content-type", b"application/json"),
+                            (b"content-length", str(len(payload)).encode())]
+        response_headers += [(k.encode(), v.encode()) for k, v in extra.items()]
+        await send({"type": "http.response.start", "status": status, "headers": response_headers})
+        await send({"type": "http.response.body", "body": payload})
+
+    def _handle(self, path: str, request: dict, headers: dict) -> tuple[int, bytes, dict]:
+        if path == self.register_path:
+            self.set_configuration(request["provider"], request["service"], request["configuration"])
+            return 200, b'{"status": "registered"}', {}
+
+        if path == self.get_path:
+            stored = self.configurations.get((request["provider"], request["service"]))
+            if stored is None:
+                return 404, b'{"detail": "not found"}', {}
+            body, etag = stored
+            if headers.get("if-none-match") == etag:
+                return 304, b"", {"etag": etag}
+            return 200, body, {"etag": etag}
+
+        return 404, b'{"detail": "not found"}', {}
+
+
+class ASGIAdapter(BaseAdapter):
+    """ requests adapter sending the requests to an ASGI application, through httpx's ASGI
+    transport running on a private event loop.
+    """
+
+    def __init__(self, app):
+        super().__init__()
+        self._loop = asyncio.new_event_loop()
+        self._lock = threading.Lock()
+        self._client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app))
+
+    def send(self, request: requests.PreparedRequest, stream=False, timeout=None, verify=True, cert=None,
+             proxies=None) -> requests.Response:
+        with self._lock:
+            answer = self._loop.run_until_complete(
+                self._client.request(request.method, request.url, headers=dict(request.headers), content=request.body))
+
+        response = requests.Response()
+        response.status_code = answer.status_code
+        response.headers = CaseInsensitiveDict(answer.headers)
+        response._content = answer.content
+        response.encoding = answer.encoding
+        response.url = request.url
+        response.request = request
+        response.reason = answer.reason_phrase
+        return response
+
+    def close(self):
+        # The adapter stays usable: the registry closes its session when clients are re-created
+        pass
+
+
+def fake_redis_connector() -> RedisConnector:
+    """Return a RedisConnector on an in-memory fakeredis server."""
+    import fakeredis
+
+    return RedisConnector("localhost", 6379, 0, client=fakeredis.FakeRedis(decode_responses=True), ping=False)
+
+
+def fake_mongo_connector(db_name: str = "bench") -> MongoConnector:
+    """Return a MongoConnector on an in-memory mongomock client."""
+    import mongomock
+
+    return MongoConnector("localhost", 27017, db_name, client=mongomock.MongoClient(), ping=False)
@@ -1,5 +1,21 @@
 """
 This is the entry point for the rv16-lib library.
+
+Only the logger is imported eagerly; everything else is loaded on first access,
+so that importing `rv16_lib` does not pull in PyYAML, pydantic or the HTTP clients.
 """
-from .utils import get_object_from_config
-from .logger import get_logger, logger
+from typing import TYPE_CHECKING
+
+from ._lazy import lazy_getattr
+from .logger import configure_logging, get_logger, logger
+
+if TYPE_CHECKING:
+    from .config_watcher import ConfigWatcher
+    from .utils import get_object_from_config
+
+__all__ = ["ConfigWatcher", "configure_logging", "get_object_from_config", "get_logger", "logger"]
+
+__getattr__, __dir__ = lazy_getattr(__name__, {
+    "ConfigWatcher": ".config_watcher",
+    "get_object_from_config": ".utils",
+})
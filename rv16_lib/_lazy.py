@@ -0,0 +1,31 @@
+"""
+Helper for lazy attribute loading in package `__init__` modules (PEP 562).
+"""
+import importlib
+import sys
+from typing import Any, Callable
+
+
+def lazy_getattr(package: str, attributes: dict[str, str]) -> tuple[Callable[[str], Any], Callable[[], list]]:
+    """Build the module-level `__getattr__` and `__dir__` of a package whose attributes are
+    imported from their submodules on first access.
+    Args:
+        package (str): The `__name__` of the package
+        attributes (dict[str, str]): Maps each attribute to the module defining it, relative to the package
+
+    Returns:
+        tuple: The `__getattr__` and `__dir__` functions to assign in the package
+    """
+    def __getattr__(name: str) -> Any:
+        module_name = attributes.get(name)
+        if module_name is None:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+        value = getattr(importlib.import_module(module_name, package), name)
+        # Cache on the package so that later lookups skip __getattr__
+        setattr(sys.modules[package], name, value)
+        return value
+
+    def __dir__() -> list:
+        return sorted(set(vars(sys.modules[package])) | set(attributes))
+
+    return __getattr__, __dir__
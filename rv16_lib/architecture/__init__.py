@@ -0,0 +1,32 @@
+"""
+Base classes for rv16 services, providers and service connectors, loaded on first access.
+"""
+from typing import TYPE_CHECKING
+
+from rv16_lib._lazy import lazy_getattr
+
+if TYPE_CHECKING:
+    from rv16_lib.architecture.base_provider import BaseProvider, BaseProviderType
+    from rv16_lib.architecture.base_service import BaseService
+    from rv16_lib.architecture.base_service_connector import BaseServiceConnector, BaseConnectionParams, \
+        BaseServiceConfig, setup_connectors_async
+    from rv16_lib.architecture.startup import StartupOrchestrator, ComponentState, ComponentReadiness
+
+__all__ = [
+    "BaseProvider", "BaseProviderType", "BaseService",
+    "BaseServiceConnector", "BaseConnectionParams", "BaseServiceConfig", "setup_connectors_async",
+    "StartupOrchestrator", "ComponentState", "ComponentReadiness",
+]
+
+__getattr__, __dir__ = lazy_getattr(__name__, {
+    "BaseProvider": ".base_provider",
+    "BaseProviderType": ".base_provider",
+    "BaseService": ".base_service",
+    "BaseServiceConnector": ".base_service_connector",
+    "BaseConnectionParams": ".base_service_connector",
+    "BaseServiceConfig": ".base_service_connector",
+    "setup_connectors_async": ".base_service_connector",
+    "StartupOrchestrator": ".startup",
+    "ComponentState": ".startup",
+    "ComponentReadiness": ".startup",
+})
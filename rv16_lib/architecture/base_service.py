@@ -1,19 +1,25 @@
-from starlette import status
+import inspect
+from typing import TYPE_CHECKING, Any, Callable, Optional, Sequence
 
 from rv16_lib import logger
 from rv16_lib.exceptions import RV16Exception
 from rv16_lib.architecture.base_provider import BaseProvider
-from rv16_lib.configuration_manager import ConfigurationManagerProxy
+from rv16_lib.architecture.startup import ComponentReadiness, StartupOrchestrator
 from rv16_lib.configuration_manager.entities import ServiceRegistrationRequest, ServicePairingRequest
 
+if TYPE_CHECKING:
+    from rv16_lib.architecture.base_service_connector import BaseServiceConnector
+    from rv16_lib.configuration_manager import ConfigurationManagerProxy, AsyncConfigurationManagerProxy
+
 
 class BaseService:
 
     def __init__(self):
         self.service_name = None
         self.providers: dict[str, BaseProvider] = {}
+        self.startup = StartupOrchestrator()
 
-    def register_service(self, cm_proxy: ConfigurationManagerProxy, provider: str, configuration: dict):
+    def register_service(self, cm_proxy: "ConfigurationManagerProxy", provider: str, configuration: dict):
         logger.info("Starting service registration...")
 
         request = ServiceRegistrationRequest(
@@ -22,19 +28,105 @@ class BaseService:
             configuration=configuration
         )
         response = cm_proxy.register(request)
-        logger.info(f"Service registration response: {response}")
+        logger.info("Service registration response: %s", response)
         return response
 
+    def add_registration(self, cm_proxy, provider: str, configuration: dict, depends_on: Sequence[str] = (),
+                         name: str = "registration"):
+        """Declare the registration of the service with the Configuration Manager as a step of `start`,
+        e.g. to register only once the providers it depends on are ready.
+        Args:
+            cm_proxy: A `ConfigurationManagerProxy` or an `AsyncConfigurationManagerProxy`
+            provider (str): The provider to register the service for
+            configuration (dict): The configuration of the service
+            depends_on (Sequence[str]): Components to initialize first
+            name (str, optional): Name of the step. Defaults to "registration".
+        """
+        if inspect.iscoroutinefunction(cm_proxy.register):
+            async def init():
+                logger.info("Starting service registration...")
+                response = await cm_proxy.register(ServiceRegistrationRequest(
+                    provider=provider,
+                    service=self.service_name,
+                    configuration=configuration
+                ))
+                logger.info("Service registration response: %s", response)
+                return response
+        else:
+            def init():
+                return self.register_service(cm_proxy, provider, configuration)
+        self.startup.add(name, init, depends_on)
+
     def initialize_service(self):
         raise NotImplementedError()
 
+    def add_provider(self, name: str, factory: Callable[[], Any], depends_on: Sequence[str] = (),
+                     critical: bool = True):
+        """Declare a provider built by `start`, or on its first `get_provider` if it is not critical.
+        Args:
+            name (str): The provider name, as passed to `get_provider`
+            factory (Callable): Builds the provider; may be a coroutine function
+            depends_on (Sequence[str]): Providers, connectors or steps to initialize first
+            critical (bool, optional): If False, the provider is created lazily. Defaults to True.
+        """
+        if inspect.iscoroutinefunction(factory):
+            async def init():
+                self.providers[name] = await factory()
+                return self.providers[name]
+        else:
+            def init():
+                self.providers[name] = factory()
+                return self.providers[name]
+        self.startup.add(name, init, depends_on, critical)
+
+    def add_connector(self, connector: "BaseServiceConnector", cm_proxy, cm_provider: str, output_type,
+                      depends_on: Sequence[str] = (), name: Optional[str] = None):
+        """Declare a service connector whose connection is requested to the Configuration Manager at `start`.
+        Args:
+            connector (BaseServiceConnector): The connector to set up
+            cm_proxy: A `ConfigurationManagerProxy` or an `AsyncConfigurationManagerProxy`
+            cm_provider (str): The provider to request the configuration for
+            output_type: The type of the connection
+            depends_on (Sequence[str]): Components to initialize first
+            name (str, optional): Name of the component. Defaults to the connector service name.
+        """
+        if inspect.iscoroutinefunction(cm_proxy.get):
+            async def init():
+                await connector.setup_connections_async(cm_proxy, cm_provider, output_type)
+                return connector
+        else:
+            def init():
+                connector.setup_connections(cm_proxy, cm_provider, output_type)
+                return connector
+        self.startup.add(name or connector.srv_name, init, depends_on)
+
+    async def start(self):
+        """Initialize the declared providers and connectors, independent ones concurrently.
+
+        Raises:
+            RV16Exception: If a critical provider or connector failed
+        """
+        await self.startup.start()
+
+    def readiness(self) -> dict[str, ComponentReadiness]:
+        """Return the readiness of every declared provider and connector, e.g. for a readiness endpoint."""
+        return self.startup.readiness()
+
+    @property
+    def ready(self) -> bool:
+        return self.startup.ready
+
     def get_provider(self, provider: str) -> BaseProvider:
-        try:
-            p = self.providers.get(provider)
-            if p:
-                return p
-        except Exception:
-            raise RV16Exception(
-                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                message=f"Provider {provider} not supported."
-            )
+        p = self.providers.get(provider)
+        if p is not None:
+            return p
+        if provider in self.startup:
+            # Created on first use if it is not critical, 503 while it is not ready
+            return self.startup.get(provider)
+
+        from starlette import status
+
+        raise RV16Exception(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            message=f"Provider {provider} not supported."
+        )
@@ -1,8 +1,11 @@
-from typing import TypeVar, Optional, Any
+from typing import TypeVar, Optional, Any, Sequence, TYPE_CHECKING
 
 from pydantic import BaseModel
 
-from rv16_lib.configuration_manager import ServiceConfigurationRequest, ConfigurationManagerProxy
+from rv16_lib.configuration_manager.entities import ServiceConfigurationRequest
+
+if TYPE_CHECKING:
+    from rv16_lib.configuration_manager import ConfigurationManagerProxy, AsyncConfigurationManagerProxy
 
 
 class BaseConnectionParams(BaseModel):
@@ -28,7 +31,29 @@ class BaseServiceConnector:
         self.provider = self.config.provider
         self.srv_name = self.config.name
 
-    def setup_connections(self, cm_proxy: ConfigurationManagerProxy, cm_provider: str, output_type):  # TODO - tipizzare
-        self.connection = cm_proxy.get(payload=ServiceConfigurationRequest(service=self.srv_name,
-                                                                           provider=cm_provider),
+    def setup_connections(self, cm_proxy: "ConfigurationManagerProxy", cm_provider: str, output_type):  # TODO - tipizzare
+        self.connection = cm_proxy.get(payload=self.configuration_request(cm_provider),
                                        output_type=output_type)
+
+    async def setup_connections_async(self, cm_proxy: "AsyncConfigurationManagerProxy", cm_provider: str, output_type):
+        self.connection = await cm_proxy.get(payload=self.configuration_request(cm_provider),
+                                             output_type=output_type)
+
+    def configuration_request(self, cm_provider: str) -> ServiceConfigurationRequest:
+        return ServiceConfigurationRequest(service=self.srv_name, provider=cm_provider)
+
+
+async def setup_connectors_async(cm_proxy: "AsyncConfigurationManagerProxy", cm_provider: str,
+                                 connectors: Sequence[tuple[BaseServiceConnector, Any]], max_concurrency: int = 10):
+    """Set up the connections of several connectors with concurrent Configuration Manager requests.
+    Args:
+        cm_proxy (AsyncConfigurationManagerProxy): The Configuration Manager proxy
+        cm_provider (str): The provider to request the configurations for
+        connectors: Pairs of (connector, output type of its connection)
+        max_concurrency (int, optional): Maximum number of requests in flight. Defaults to 10.
+    """
+    connections = await cm_proxy.get_many(payloads=[c.configuration_request(cm_provider) for c, _ in connectors],
+                                          output_type=[t for _, t in connectors],
+                                          max_concurrency=max_concurrency)
+    for (connector, _), connection in zip(connectors, connections):
+        connector.connection = connection
@@ -0,0 +1,263 @@
+"""
+Dependency-aware startup of the components of a service (providers, connectors, registration).
+
+Components declare the components they depend on. `StartupOrchestrator.start` initializes every
+critical component as soon as its dependencies are ready, independent ones concurrently, so that
+startup takes as long as the longest dependency chain instead of the sum of every handshake.
+Non-critical components are initialized lazily, on their first `get`.
+"""
+import asyncio
+import concurrent.futures
+import enum
+import inspect
+import threading
+import time
+from typing import Any, Awaitable, Callable, Optional, Sequence, Union
+
+from pydantic import BaseModel
+
+from rv16_lib.exceptions import RV16Exception
+from rv16_lib.logger import logger
+
+Initializer = Callable[[], Union[Any, Awaitable[Any]]]
+
+
+class ComponentState(str, enum.Enum):
+    PENDING = "pending"
+    LAZY = "lazy"
+    STARTING = "starting"
+    READY = "ready"
+    FAILED = "failed"
+
+
+class ComponentReadiness(BaseModel):
+    """Readiness of one component.
+    Args:
+        name: Name of the component
+        state: Current state
+        critical: Whether the service is ready only once the component is
+        depends_on: Names of the components it depends on
+        duration: Seconds its initialization took, once finished
+        error: Why its initialization failed
+    """
+    name: str
+    state: ComponentState
+    critical: bool
+    depends_on: list[str]
+    duration: Optional[float] = None
+    error: Optional[str] = None
+
+
+class _Component:
+
+    def __init__(self, name: str, init: Initializer, depends_on: Sequence[str], critical: bool):
+        self.name = name
+        self.init = init
+        self.depends_on = list(depends_on)
+        self.critical = critical
+        self.state = ComponentState.PENDING if critical else ComponentState.LAZY
+        self.value: Any = None
+        self.duration: Optional[float] = None
+        self.error: Optional[str] = None
+        self.lock = threading.Lock()
+
+    def readiness(self) -> ComponentReadiness:
+        return ComponentReadiness(name=self.name, state=self.state, critical=self.critical,
+                                  depends_on=self.depends_on, duration=self.duration, error=self.error)
+
+
+class StartupOrchestrator:
+    """ Initializes named components in dependency order, concurrently where possible."""
+
+    def __init__(self):
+        self._components: dict[str, _Component] = {}
+        # The loop running `start`: lazy coroutine components are initialized on it
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: set[Union[asyncio.Task, concurrent.futures.Future]] = set()
+
+    def add(self, name: str, init: Initializer, depends_on: Sequence[str] = (), critical: bool = True):
+        """Declare a component.
+        Args:
+            name (str): Unique name of the component
+            init (Callable): Builds the component. Coroutine functions are awaited; plain functions run
+                in a worker thread during `start`, so that blocking handshakes overlap.
+            depends_on (Sequence[str]): Components to initialize first
+            critical (bool): If True, the component is initialized by `start` and the service is not
+                ready without it. If False, it is initialized on its first `get`; a coroutine function
+                then runs on the event loop of `start`, which must still be running.
+
+        Raises:
+            ValueError: If the name is already used
+        """
+        if name in self._components:
+            raise ValueError(f"Component {name} is already declared.")
+        self._components[name] = _Component(name, init, depends_on, critical)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._components
+
+    async def start(self):
+        """Initialize every critical component and its dependencies.
+        A component starts as soon as all its dependencies are ready.
+
+        Raises:
+            ValueError: If a dependency is unknown or the dependencies form a cycle
+            RV16Exception: If a critical component failed, after every other one has finished
+        """
+        self._loop = asyncio.get_running_loop()
+        order = self._order()
+        needed = self._with_dependencies([c for c in order if c.critical])
+        tasks: dict[str, asyncio.Task] = {}
+        started = time.perf_counter()
+
+        async def run(component: _Component):
+            # Dependencies already ready, e.g. from a previous start or a lazy `get`, have no task
+            await asyncio.gather(*(tasks[d] for d in component.depends_on if d in tasks), return_exceptions=True)
+            failed = [d for d in component.depends_on if self._components[d].state is not ComponentState.READY]
+            if failed:
+                component.state = ComponentState.FAILED
+                component.error = f"Dependencies not ready: {', '.join(failed)}"
+                return
+            await self._initialize(component)
+
+        # `order` lists dependencies first, so every awaited task exists when created.
+        # Components that failed in a previous start are retried.
+        for component in order:
+            if component.name in needed and component.state is not ComponentState.READY:
+                tasks[component.name] = asyncio.ensure_future(run(component))
+        await asyncio.gather(*tasks.values())
+
+        failed = [c.name for c in needed.values() if c.critical and c.state is ComponentState.FAILED]
+        if failed:
+            raise RV16Exception(status_code=503, message=f"Startup failed for: {', '.join(failed)}")
+        logger.info("Started %s components in %.3fs", len(tasks), time.perf_counter() - started)
+
+    def start_sync(self):
+        """Run `start` from synchronous code, outside of any event loop."""
+        asyncio.run(self.start())
+
+    def get(self, name: str) -> Any:
+        """Return a component, initializing it (and its dependencies) first if it is lazy.
+
+        Raises:
+            KeyError: If the component is not declared
+            RV16Exception: If the component failed, or is asynchronous and still starting or its
+                event loop is not running
+        """
+        component = self._components[name]
+        if component.state is ComponentState.READY:
+            return component.value
+        if component.state is ComponentState.LAZY:
+            self._initialize_lazy(component)
+        if component.state is not ComponentState.READY:
+            raise RV16Exception(status_code=503,
+                                message=f"Component {name} is {component.state.value}: {component.error or ''}")
+        return component.value
+
+    def readiness(self) -> dict[str, ComponentReadiness]:
+        """Return the readiness of every component."""
+        return {name: c.readiness() for name, c in self._components.items()}
+
+    @property
+    def ready(self) -> bool:
+        """True once every critical component is ready."""
+        return all(c.state is ComponentState.READY for c in self._components.values() if c.critical)
+
+    async def _initialize(self, component: _Component):
+        component.state = ComponentState.STARTING
+        component.error = None
+        started = time.perf_counter()
+        try:
+            if inspect.iscoroutinefunction(component.init):
+                component.value = await component.init()
+            else:
+                component.value = await asyncio.get_running_loop().run_in_executor(None, component.init)
+            component.state = ComponentState.READY
+        except Exception as e:
+            component.state = ComponentState.FAILED
+            component.error = f"{type(e).__name__}: {e}"
+            logger.error("Initialization of %s failed: %s", component.name, e)
+        finally:
+            component.duration = time.perf_counter() - started
+        if component.state is ComponentState.READY:
+            logger.info("%s ready in %.3fs", component.name, component.duration)
+
+    def _initialize_lazy(self, component: _Component):
+        for dependency in component.depends_on:
+            self.get(dependency)
+
+        with component.lock:
+            if component.state is not ComponentState.LAZY:
+                return
+            if not inspect.iscoroutinefunction(component.init):
+                component.state = ComponentState.STARTING
+                started = time.perf_counter()
+                try:
+                    component.value = component.init()
+                    component.state = ComponentState.READY
+                except Exception as e:
+                    component.state = ComponentState.FAILED
+                    component.error = f"{type(e).__name__}: {e}"
+                    logger.error("Initialization of %s failed: %s", component.name, e)
+                finally:
+                    component.duration = time.perf_counter() - started
+                return
+
+            # Async clients built by the component are bound to the loop they are created on:
+            # initialize it on the long-lived loop of `start`, not on a temporary one
+            loop = self._loop
+            if loop is None or loop.is_closed() or not loop.is_running():
+                raise RV16Exception(status_code=503,
+                                    message=f"Component {component.name} is asynchronous and can only be "
+                                            f"initialized while the event loop of start() is running")
+            try:
+                running = asyncio.get_running_loop()
+            except RuntimeError:
+                running = None
+
+            component.state = ComponentState.STARTING
+            if running is loop:
+                # Cannot block the loop: initialize in the background, callers get a 503 meanwhile
+                pending = loop.create_task(self._initialize(component))
+            else:
+                pending = asyncio.run_coroutine_threadsafe(self._initialize(component), loop)
+            # Keep a reference until done, the event loop only holds weak ones
+            self._pending.add(pending)
+            pending.add_done_callback(self._pending.discard)
+            if running is None:
+                # A worker thread, e.g. a synchronous endpoint: wait for the initialization
+                pending.result()
+
+    def _with_dependencies(self, components: Sequence[_Component]) -> dict[str, _Component]:
+        result: dict[str, _Component] = {}
+        stack = list(components)
+        while stack:
+            component = stack.pop()
+            if component.name not in result:
+                result[component.name] = component
+                stack.extend(self._components[d] for d in component.depends_on)
+        return result
+
+    def _order(self) -> list[_Component]:
+        """Sort the components so that each one comes after its dependencies."""
+        order: list[_Component] = []
+        visiting: set[str] = set()
+        done: set[str] = set()
+
+        def visit(name: str, path: tuple[str, ...]):
+            if name in done:
+                return
+            if name not in self._components:
+                raise ValueError(f"Unknown dependency {name} of {path[-1]}.")
+            if name in visiting:
+                raise ValueError(f"Dependency cycle: {' -> '.join(path + (name,))}")
+            visiting.add(name)
+            for dependency in self._components[name].depends_on:
+                visit(dependency, path + (name,))
+            visiting.discard(name)
+            done.add(name)
+            order.append(self._components[name])
+
+        for name in self._components:
+            visit(name, ())
+        return order
@@ -0,0 +1,126 @@
+"""
+Hot reloading of YAML configuration files.
+
+A `ConfigWatcher` polls the modification time of a configuration file and, when it changes,
+validates the new content and swaps it in as `current`. An invalid file is logged and ignored:
+the last valid configuration stays in place.
+"""
+import os
+import threading
+from typing import Callable, Generic, Optional, Type
+
+from rv16_lib.logger import get_logger
+from rv16_lib.utils import TConfig, config_path, load_config_file, config_file_version
+
+logger = get_logger("config_watcher")
+
+# Called with the previous and the new configuration object
+ConfigCallback = Callable[[TConfig, TConfig], None]
+
+
+class ConfigWatcher(Generic[TConfig]):
+    """ Keeps a validated configuration object in sync with its YAML file.
+
+    Example:
+        watcher = ConfigWatcher(AppConfig, "app.yaml").start()
+        watcher.subscribe(lambda old, new: logger.info("Log level is now %s", new.log_level))
+        ...
+        watcher.current.log_level
+    """
+
+    def __init__(self, config_model: Type[TConfig], filename: str = "app.yaml", abs_path: bool = False,
+                 interval: float = 1.0):
+        """
+        Args:
+            config_model (Type[Config]): The Pydantic model to validate the configuration against.
+            filename (str): The name of the configuration file.
+            abs_path: If True, the filename is treated as an absolute path. Defaults to False.
+            interval: Seconds between two checks of the file. Defaults to 1.
+
+        Raises:
+            FileNotFoundError: If the configuration file does not exist.
+            pydantic.ValidationError: If the initial configuration is invalid.
+        """
+        self.config_model = config_model
+        self.filepath = config_path(filename, abs_path)
+        self.interval = interval
+        self._version = config_file_version(self.filepath)
+        self._current: TConfig = load_config_file(config_model, self.filepath)
+        self._callbacks: list[ConfigCallback] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def current(self) -> TConfig:
+        """The last valid configuration. Must not be modified."""
+        return self._current
+
+    def subscribe(self, callback: ConfigCallback) -> Callable[[], None]:
+        """Register a callback run, in the watcher thread, after each successful reload.
+
+        Returns:
+            Callable: A function removing the callback.
+        """
+        with self._lock:
+            self._callbacks.append(callback)
+
+        def unsubscribe():
+            with self._lock:
+                if callback in self._callbacks:
+                    self._callbacks.remove(callback)
+
+        return unsubscribe
+
+    def reload(self, force: bool = False) -> bool:
+        """Load the file again if it changed since the last load, or unconditionally if `force` is True.
+
+        Returns:
+            bool: True if a new configuration was swapped in.
+        """
+        try:
+            version = config_file_version(self.filepath)
+        except FileNotFoundError:
+            logger.warning("Configuration file %s disappeared, keeping the current configuration.", self.filepath)
+            return False
+        if version == self._version and not force:
+            return False
+
+        # Record the version first, so that an invalid file is not parsed again on every poll
+        self._version = version
+        try:
+            new = load_config_file(self.config_model, self.filepath)
+        except Exception as e:
+            logger.error("Ignoring invalid configuration %s, keeping the current one: %s", self.filepath, e)
+            return False
+
+        old, self._current = self._current, new
+        with self._lock:
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            try:
+                callback(old, new)
+            except Exception as e:
+                logger.error("Configuration callback %r failed: %s", callback, e)
+        return True
+
+    def start(self) -> "ConfigWatcher[TConfig]":
+        """Start polling the file in a daemon thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"config-watcher-{os.path.basename(self.filepath)}",
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop polling the file."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.reload()
@@ -0,0 +1,119 @@
+import enum
+import threading
+import time
+from typing import Any, Callable, Hashable, Optional
+
+from pydantic import BaseModel
+
+
+class CacheState(str, enum.Enum):
+    FRESH = "fresh"
+    STALE = "stale"
+    MISS = "miss"
+
+
+class CacheEntry:
+    """A cached configuration together with the validator used for conditional fetches."""
+    __slots__ = ("value", "etag", "fetched_at")
+
+    def __init__(self, value: Any, etag: Optional[str], fetched_at: float):
+        self.value = value
+        self.etag = etag
+        self.fetched_at = fetched_at
+
+
+class CacheStats(BaseModel):
+    """Snapshot of the configuration cache counters.
+    Args:
+        hits: Lookups served from a fresh entry
+        stale_hits: Lookups served from a stale entry while it was refreshed in the background
+        misses: Lookups that had to wait for the Configuration Manager
+        not_modified: Fetches answered with 304 Not Modified
+        refresh_errors: Background refreshes that failed
+        size: Number of cached entries
+    """
+    hits: int = 0
+    stale_hits: int = 0
+    misses: int = 0
+    not_modified: int = 0
+    refresh_errors: int = 0
+    size: int = 0
+
+
+class ConfigurationCache:
+    """ In-process TTL cache with stale-while-revalidate semantics for service configurations.
+    An entry is fresh for `ttl` seconds. For the following `stale_ttl` seconds it is still served,
+    while the caller refreshes it in the background. After that, lookups are misses, but the
+    entry is kept so its ETag can be used for a conditional fetch.
+    """
+
+    def __init__(self, ttl: float = 60.0, stale_ttl: float = 300.0, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: dict[Hashable, CacheEntry] = {}
+        self._refreshing: set[Hashable] = set()
+        self._stats = CacheStats()
+
+    def lookup(self, key: Hashable) -> tuple[Optional[CacheEntry], CacheState]:
+        """Look up a key and record the outcome in the cache counters.
+        Args:
+            key (Hashable): The cache key
+
+        Returns:
+            tuple[Optional[CacheEntry], CacheState]: The entry, if any (possibly expired), and its state
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats.misses += 1
+                return None, CacheState.MISS
+
+            age = self._clock() - entry.fetched_at
+            if age < self.ttl:
+                self._stats.hits += 1
+                return entry, CacheState.FRESH
+            if age < self.ttl + self.stale_ttl:
+                self._stats.stale_hits += 1
+                return entry, CacheState.STALE
+            self._stats.misses += 1
+            return entry, CacheState.MISS
+
+    def store(self, key: Hashable, value: Any, etag: Optional[str] = None) -> CacheEntry:
+        entry = CacheEntry(value=value, etag=etag, fetched_at=self._clock())
+        with self._lock:
+            self._entries[key] = entry
+        return entry
+
+    def revalidate(self, key: Hashable, entry: CacheEntry) -> CacheEntry:
+        """Mark an entry as fresh again after the server answered 304 Not Modified."""
+        with self._lock:
+            self._stats.not_modified += 1
+        return self.store(key, entry.value, entry.etag)
+
+    def try_begin_refresh(self, key: Hashable) -> bool:
+        """Claim the background refresh of a key. Returns False if a refresh is already running."""
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            return True
+
+    def end_refresh(self, key: Hashable, failed: bool = False):
+        with self._lock:
+            self._refreshing.discard(key)
+            if failed:
+                self._stats.refresh_errors += 1
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        """Drop a single entry, or every entry if no key is given."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return self._stats.model_copy(update={"size": len(self._entries)})
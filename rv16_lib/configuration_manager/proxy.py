@@ -0,0 +1,309 @@
+import asyncio
+import threading
+from typing import TypeVar, Type, Optional, Union, Hashable, Sequence, NamedTuple
+
+import httpx
+from pydantic import BaseModel
+
+from rv16_lib import json_codec
+from rv16_lib.exceptions import RV16Exception
+from rv16_lib.configuration_manager.cache import ConfigurationCache, CacheEntry, CacheState, CacheStats
+from rv16_lib.configuration_manager.entities import ServiceRegistrationRequest, ServiceConfigurationRequest, \
+    ServicePairingRequest
+from rv16_lib.configuration_manager.exceptions import ConfigurationManagerProxyException
+from rv16_lib.configuration_manager.singleflight import SingleFlight, AsyncSingleFlight
+from rv16_lib.logger import logger
+from rv16_lib.utils import call_srv_sync, call_srv_async
+
+# Create a type variable for the Config model
+TConfig = TypeVar("TConfig", bound=BaseModel)
+
+class _FetchResult(NamedTuple):
+    status_code: int
+    content: bytes
+    etag: Optional[str]
+
+
+class _BaseConfigurationManagerProxy:
+    """ State and helpers shared by the sync and async Configuration Manager proxies."""
+
+    def __init__(self, hostname: str = "srv-configuration-manager", port: int = 8000, register_path: str = "/register-service", get_path: str = "/get-service-configuration",
+                 cache_ttl: Optional[float] = 60.0, cache_stale_ttl: float = 300.0):
+        self.hostname = hostname
+        self.port = port
+        self._register_path = register_path
+        self._get_path = get_path
+        self.cache: Optional[ConfigurationCache] = ConfigurationCache(ttl=cache_ttl, stale_ttl=cache_stale_ttl) if cache_ttl else None
+
+    def cache_stats(self) -> CacheStats:
+        """Return the counters of the configuration cache."""
+        return self.cache.stats() if self.cache else CacheStats()
+
+    def invalidate_cache(self, payload: Optional[ServiceConfigurationRequest] = None, output_type: Optional[Type[TConfig]] = None):
+        """Drop the cached configuration of a service, or every cached configuration if no payload is given."""
+        if self.cache is not None:
+            self.cache.invalidate(self._cache_key(payload, output_type) if payload else None)
+
+    @staticmethod
+    def _cache_key(payload: ServiceConfigurationRequest, output_type: Optional[Type[TConfig]]) -> Hashable:
+        return payload.provider, payload.service, output_type
+
+    @staticmethod
+    def _conditional_headers(previous: Optional[CacheEntry]) -> Optional[dict]:
+        # Conditional fetch: the server answers 304 if the configuration did not change
+        return {"If-None-Match": previous.etag} if previous and previous.etag else None
+
+    def _url(self, path: str) -> str:
+        return f"http://{self.hostname}:{self.port}{path}"
+
+    @staticmethod
+    def _flight_key(path: str, payload: ServiceConfigurationRequest, previous: Optional[CacheEntry]) -> Hashable:
+        # Requests are identical if they share path, payload and conditional header
+        return path, payload.model_dump_json(), previous.etag if previous else None
+
+    def _handle(self, key: Optional[Hashable], fetched: _FetchResult, output_type: Optional[Type[TConfig]], previous: Optional[CacheEntry]) -> Union[dict, TConfig]:
+        if fetched.status_code == 304 and previous is not None:
+            return self.cache.revalidate(key, previous).value
+
+        if fetched.status_code != 200:
+            logger.error("Failed to send request: <Response [%s]> <UNK>", fetched.status_code)
+            raise RV16Exception(status_code=500,
+                                message=f"Failed to send request: <Response [{fetched.status_code}]> <UNK>")
+
+        return self._store(key, fetched.content, fetched.etag, output_type)
+
+    def _store(self, key: Optional[Hashable], content: bytes, etag: Optional[str], output_type: Optional[Type[TConfig]]) -> Union[dict, TConfig]:
+        # The configuration is answered as a JSON-encoded JSON string: the model is validated
+        # straight from the inner document, without building an intermediate dict
+        document = json_codec.loads(content)
+        result = output_type.model_validate_json(document) if output_type else json_codec.loads(document)
+        if self.cache is not None:
+            self.cache.store(key, result, etag)
+        return result
+
+
+class ConfigurationManagerProxy(_BaseConfigurationManagerProxy):
+    """ A proxy client for interacting with the Configuration Manager service.
+    This class provides methods to register services and retrieve service configurations
+    from a remote Configuration Manager service via HTTP requests.
+
+    Retrieved configurations are cached in-process for `cache_ttl` seconds and served stale for
+    `cache_stale_ttl` more seconds while they are refreshed in the background.
+    Set `cache_ttl` to None to disable the cache.
+    Identical requests issued concurrently by several threads are merged into a single call.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._flights = SingleFlight()
+
+    def register(self, request: ServiceRegistrationRequest) -> dict:
+        """Register a service with the Configuration Manager.
+        Args:
+            request (ServiceRegistrationRequest): The service registration request containing
+                service details to be registered
+
+        Returns:
+            dict: The JSON response from the configuration manager
+
+        Raises:
+            ConfigurationManagerProxyException: If the registration fails (non-200 status code)
+            requests.exceptions.RequestException: If the request fails due to network or other issues
+        """
+        response = call_srv_sync(method="POST",
+                                 url=self._url(self._register_path),
+                                 json=request)
+
+        if response.status_code != 200:
+            raise ConfigurationManagerProxyException(status_code=response.status_code, message=response.text)
+
+        return response.json()
+
+
+    def get(self, payload: ServiceConfigurationRequest, output_type: Optional[Type[TConfig]] = None) -> Union[dict, TConfig]:
+        """Retrieve service configuration from the Configuration Manager.
+        Cached configurations are shared between callers and must be treated as read-only.
+        Args:
+            payload (ServiceConfigurationRequest): The service configuration request containing
+                details about the configuration to retrieve
+            output_type (Optional[Type[TConfig]], optional): The Pydantic model type to parse
+                the response into. If None, returns raw JSON. Defaults to None.
+
+        Returns:
+            Union[TConfig, dict]: The configuration data either as the specified model type
+                or as a dictionary if no output_type is provided
+
+        Raises:
+            RV16Exception: If the Configuration Manager answers with an error status
+            requests.exceptions.RequestException: If the request fails due to network or other issues
+        """
+        if self.cache is None:
+            return self._load(None, payload, output_type, None)
+
+        key = self._cache_key(payload, output_type)
+        entry, state = self.cache.lookup(key)
+        if state is CacheState.FRESH:
+            return entry.value
+
+        if state is CacheState.STALE:
+            if self.cache.try_begin_refresh(key):
+                threading.Thread(target=self._refresh, args=(key, payload, output_type, entry), daemon=True).start()
+            return entry.value
+
+        return self._load(key, payload, output_type, entry)
+
+    def _refresh(self, key: Hashable, payload: ServiceConfigurationRequest, output_type: Optional[Type[TConfig]], previous: CacheEntry):
+        failed = False
+        try:
+            self._load(key, payload, output_type, previous)
+        except Exception as e:
+            failed = True
+            logger.warning("Background refresh of configuration %s failed, serving stale value: %s", key, e)
+        finally:
+            self.cache.end_refresh(key, failed=failed)
+
+    def _load(self, key: Optional[Hashable], payload: ServiceConfigurationRequest, output_type: Optional[Type[TConfig]], previous: Optional[CacheEntry]) -> Union[dict, TConfig]:
+        fetched = self._flights.do(self._flight_key(self._get_path, payload, previous),
+                                   lambda: self._fetch(payload, previous))
+        return self._handle(key, fetched, output_type, previous)
+
+    def _fetch(self, payload: ServiceConfigurationRequest, previous: Optional[CacheEntry]) -> _FetchResult:
+        # Reading a configuration has no side effect: the POST can be retried and hedged
+        response = call_srv_sync(method="POST",
+                                  url=self._url(self._get_path),
+                                  json=payload,
+                                  headers=self._conditional_headers(previous),
+                                  idempotent=True)
+        return _FetchResult(response.status_code, response.content, response.headers.get("ETag"))
+
+
+class AsyncConfigurationManagerProxy(_BaseConfigurationManagerProxy):
+    """ An asyncio proxy client for the Configuration Manager service, built on `call_srv_async`.
+    It shares the caching behaviour of `ConfigurationManagerProxy`; stale configurations are
+    refreshed in background tasks of the running event loop.
+    Identical requests awaited concurrently by several coroutines are merged into a single call.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._refresh_tasks: set[asyncio.Task] = set()
+        self._flights = AsyncSingleFlight()
+
+    async def register(self, request: ServiceRegistrationRequest) -> dict:
+        """Register a service with the Configuration Manager.
+        Args:
+            request (ServiceRegistrationRequest): The service registration request containing
+                service details to be registered
+
+        Returns:
+            dict: The JSON response from the configuration manager
+
+        Raises:
+            ConfigurationManagerProxyException: If the registration fails (non-200 status code)
+            httpx.RequestError: If the request fails due to network or other issues
+        """
+        try:
+            response = await call_srv_async(method="POST",
+                                            url=self._url(self._register_path),
+                                            json=request)
+        except httpx.HTTPStatusError as e:
+            raise ConfigurationManagerProxyException(status_code=e.response.status_code, message=e.response.text)
+
+        if response.status_code != 200:
+            raise ConfigurationManagerProxyException(status_code=response.status_code, message=response.text)
+
+        return response.json()
+
+    async def get(self, payload: ServiceConfigurationRequest, output_type: Optional[Type[TConfig]] = None) -> Union[dict, TConfig]:
+        """Retrieve service configuration from the Configuration Manager.
+        Cached configurations are shared between callers and must be treated as read-only.
+        Args:
+            payload (ServiceConfigurationRequest): The service configuration request containing
+                details about the configuration to retrieve
+            output_type (Optional[Type[TConfig]], optional): The Pydantic model type to parse
+                the response into. If None, returns raw JSON. Defaults to None.
+
+        Returns:
+            Union[TConfig, dict]: The configuration data either as the specified model type
+                or as a dictionary if no output_type is provided
+
+        Raises:
+            RV16Exception: If the Configuration Manager answers with an error status
+            httpx.RequestError: If the request fails due to network or other issues
+        """
+        if self.cache is None:
+            return await self._load(None, payload, output_type, None)
+
+        key = self._cache_key(payload, output_type)
+        entry, state = self.cache.lookup(key)
+        if state is CacheState.FRESH:
+            return entry.value
+
+        if state is CacheState.STALE:
+            if self.cache.try_begin_refresh(key):
+                task = asyncio.ensure_future(self._refresh(key, payload, output_type, entry))
+                self._refresh_tasks.add(task)
+                task.add_done_callback(self._refresh_tasks.discard)
+            return entry.value
+
+        return await self._load(key, payload, output_type, entry)
+
+    async def get_many(self, payloads: Sequence[ServiceConfigurationRequest],
+                       output_type: Union[None, Type[TConfig], Sequence[Optional[Type[TConfig]]]] = None,
+                       max_concurrency: int = 10) -> list[Union[dict, TConfig]]:
+        """Retrieve several service configurations concurrently.
+        Args:
+            payloads (Sequence[ServiceConfigurationRequest]): The configuration requests
+            output_type: A single Pydantic model type for every payload, or one type (or None) per payload.
+                Defaults to None.
+            max_concurrency (int, optional): Maximum number of requests in flight. Defaults to 10.
+
+        Returns:
+            list[Union[dict, TConfig]]: The configurations, in the same order as `payloads`
+
+        Raises:
+            ValueError: If the number of output types does not match the number of payloads
+            RV16Exception: If the Configuration Manager answers with an error status
+            httpx.RequestError: If a request fails due to network or other issues
+        """
+        if output_type is None or isinstance(output_type, type):
+            output_types = [output_type] * len(payloads)
+        else:
+            output_types = list(output_type)
+            if len(output_types) != len(payloads):
+                raise ValueError("One output type per payload must be provided.")
+
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def fetch(payload: ServiceConfigurationRequest, payload_type: Optional[Type[TConfig]]):
+            async with semaphore:
+                return await self.get(payload, payload_type)
+
+        return list(await asyncio.gather(*(fetch(p, t) for p, t in zip(payloads, output_types))))
+
+    async def _refresh(self, key: Hashable, payload: ServiceConfigurationRequest, output_type: Optional[Type[TConfig]], previous: CacheEntry):
+        failed = False
+        try:
+            await self._load(key, payload, output_type, previous)
+        except Exception as e:
+            failed = True
+            logger.warning("Background refresh of configuration %s failed, serving stale value: %s", key, e)
+        finally:
+            self.cache.end_refresh(key, failed=failed)
+
+    async def _load(self, key: Optional[Hashable], payload: ServiceConfigurationRequest, output_type: Optional[Type[TConfig]], previous: Optional[CacheEntry]) -> Union[dict, TConfig]:
+        fetched = await self._flights.do(self._flight_key(self._get_path, payload, previous),
+                                         lambda: self._fetch(payload, previous))
+        return self._handle(key, fetched, output_type, previous)
+
+    async def _fetch(self, payload: ServiceConfigurationRequest, previous: Optional[CacheEntry]) -> _FetchResult:
+        try:
+            # Reading a configuration has no side effect: the POST can be retried and hedged
+            response = await call_srv_async(method="POST",
+                                            url=self._url(self._get_path),
+                                            json=payload,
+                                            headers=self._conditional_headers(previous),
+                                            idempotent=True)
+        except httpx.HTTPStatusError as e:
+            response = e.response
+        return _FetchResult(response.status_code, response.content, response.headers.get("ETag"))
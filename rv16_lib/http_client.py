@@ -0,0 +1,249 @@
+"""
+Process-wide HTTP client registry shared by the service call helpers in `rv16_lib.utils`.
+
+The registry keeps one keep-alive `requests.Session` for synchronous calls and one
+`httpx.AsyncClient` per running event loop for asynchronous calls, so consecutive
+service-to-service requests reuse their TCP (and TLS) connections.
+"""
+import asyncio
+import atexit
+import importlib.util
+import threading
+import weakref
+from typing import Optional
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from pydantic import BaseModel
+from requests.adapters import BaseAdapter, HTTPAdapter
+
+from rv16_lib.logger import get_logger
+from rv16_lib.metrics import metrics
+
+logger = get_logger("http_client")
+
+
+class HttpClientSettings(BaseModel):
+    """Settings for the shared HTTP clients.
+    Args:
+        max_connections: Maximum number of open connections of the async client
+        max_keepalive_connections: Maximum number of idle keep-alive connections of the async client
+        keepalive_expiry: Seconds an idle keep-alive connection is kept open by the async client
+        max_connections_per_host: Maximum number of concurrent connections to a single host (async client)
+            and number of keep-alive connections retained per host (sync client)
+        max_hosts: Number of per-host connection pools cached by the sync client
+        http2: Enable HTTP/2 on the async client. Requires the `h2` package (`rv16-lib[http2]`)
+        timeout: Default timeout in seconds, applied when the caller does not pass one
+        connect_timeout: Timeout in seconds for establishing a connection. Defaults to `timeout`
+    """
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 5.0
+    max_connections_per_host: int = 10
+    max_hosts: int = 10
+    http2: bool = False
+    timeout: float = 5.0
+    connect_timeout: Optional[float] = None
+
+    @property
+    def sync_timeout(self) -> tuple[float, float]:
+        """The default timeout in the (connect, read) form accepted by requests."""
+        return self.connect_timeout or self.timeout, self.timeout
+
+
+class _AsyncClientState:
+    """The async client bound to one event loop, together with its per-host limits."""
+
+    def __init__(self, client: httpx.AsyncClient, max_connections_per_host: int):
+        self.client = client
+        self._max_connections_per_host = max_connections_per_host
+        self._host_limits: dict[str, asyncio.Semaphore] = {}
+
+    def host_limit(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        limit = self._host_limits.get(host)
+        if limit is None:
+            limit = asyncio.Semaphore(self._max_connections_per_host)
+            self._host_limits[host] = limit
+        return limit
+
+
+class HttpClientRegistry:
+    """ Registry of the shared, keep-alive HTTP clients used by `call_srv_sync` and `call_srv_async`.
+    Clients are created lazily on first use with the current `HttpClientSettings`.
+    """
+
+    def __init__(self, settings: Optional[HttpClientSettings] = None):
+        self._settings = settings or HttpClientSettings()
+        self._lock = threading.Lock()
+        self._session: Optional[requests.Session] = None
+        self._async_states: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _AsyncClientState]" = \
+            weakref.WeakKeyDictionary()
+        # Async clients replaced by `configure`, closed from their own loop
+        self._retired: list[tuple[weakref.ref, _AsyncClientState]] = []
+        self._closing: set[asyncio.Task] = set()
+        self._adapters: dict[str, BaseAdapter] = {}
+        self._transports: dict[str, httpx.AsyncBaseTransport] = {}
+
+    @property
+    def settings(self) -> HttpClientSettings:
+        return self._settings
+
+    def configure(self, settings: HttpClientSettings):
+        """Replace the client settings. Meant to be called at startup, before the first request.
+        The current sync session is closed. Async clients are re-created on their next use; the replaced
+        ones are closed from their event loop, on its next use of the registry or by `aclose`.
+        Args:
+            settings (HttpClientSettings): The new settings
+        """
+        with self._lock:
+            self._settings = settings
+            session, self._session = self._session, None
+            self._retired.extend((weakref.ref(loop), state) for loop, state in self._async_states.items())
+            self._async_states.clear()
+        if session is not None:
+            session.close()
+
+    def mount(self, prefix: str, adapter: Optional[BaseAdapter] = None,
+              transport: Optional[httpx.AsyncBaseTransport] = None):
+        """Route the requests whose URL starts with `prefix` through a custom adapter (sync session)
+        and/or transport (async clients), e.g. an in-process application in tests and benchmarks.
+        Existing clients are re-created on their next use.
+        Args:
+            prefix (str): The URL prefix, e.g. "http://srv-configuration-manager:8000"
+            adapter (requests.adapters.BaseAdapter, optional): The adapter of the sync session
+            transport (httpx.AsyncBaseTransport, optional): The transport of the async clients
+        """
+        with self._lock:
+            if adapter is not None:
+                self._adapters[prefix] = adapter
+            if transport is not None:
+                self._transports[prefix] = transport
+        self.configure(self._settings)
+
+    def unmount(self, prefix: str):
+        """Remove the adapter and transport mounted on `prefix`."""
+        with self._lock:
+            self._adapters.pop(prefix, None)
+            self._transports.pop(prefix, None)
+        self.configure(self._settings)
+
+    def get_sync_client(self) -> requests.Session:
+        """Return the shared keep-alive session used for synchronous calls."""
+        session = self._session
+        if session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self._build_session()
+                session = self._session
+        return session
+
+    def get_async_client(self) -> httpx.AsyncClient:
+        """Return the shared async client bound to the running event loop."""
+        return self._async_state().client
+
+    def host_limit(self, url: str) -> asyncio.Semaphore:
+        """Return the semaphore capping concurrent async connections to the host of `url`."""
+        return self._async_state().host_limit(url)
+
+    def close(self):
+        """Close the sync session. Async clients must be closed from their loop with `aclose`."""
+        with self._lock:
+            session, self._session = self._session, None
+        if session is not None:
+            session.close()
+            logger.info("Shared HTTP session closed.")
+
+    async def aclose(self):
+        """Close the async clients bound to the running event loop and the sync session."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            state = self._async_states.pop(loop, None)
+        for retired in self._pop_retired(loop):
+            await retired.client.aclose()
+        closing = [task for task in self._closing if task.get_loop() is loop]
+        if closing:
+            await asyncio.gather(*closing)
+        if state is not None:
+            await state.client.aclose()
+            logger.info("Shared async HTTP client closed.")
+        self.close()
+
+    def _async_state(self) -> _AsyncClientState:
+        loop = asyncio.get_running_loop()
+        state = self._async_states.get(loop)
+        if state is None or state.client.is_closed:
+            with self._lock:
+                state = self._async_states.get(loop)
+                if state is None or state.client.is_closed:
+                    state = _AsyncClientState(self._build_async_client(), self._settings.max_connections_per_host)
+                    self._async_states[loop] = state
+                    metrics.register_pool("HttpClientRegistry", f"async-{id(loop):x}", state.client,
+                                          self._async_pool_usage)
+        if self._retired:
+            for retired in self._pop_retired(loop):
+                task = loop.create_task(retired.client.aclose())
+                # Keep a reference until done, the event loop only holds weak ones
+                self._closing.add(task)
+                task.add_done_callback(self._closing.discard)
+        return state
+
+    def _pop_retired(self, loop: asyncio.AbstractEventLoop) -> list[_AsyncClientState]:
+        """Remove and return the retired clients of `loop`. Those of collected loops are dropped."""
+        with self._lock:
+            retired = [state for ref, state in self._retired if ref() is loop]
+            self._retired = [(ref, state) for ref, state in self._retired if ref() is not None and ref() is not loop]
+        return retired
+
+    def _build_session(self) -> requests.Session:
+        settings = self._settings
+        adapter = HTTPAdapter(pool_connections=settings.max_hosts,
+                              pool_maxsize=settings.max_connections_per_host)
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        for prefix, mounted in self._adapters.items():
+            session.mount(prefix, mounted)
+        return session
+
+    def _build_async_client(self) -> httpx.AsyncClient:
+        settings = self._settings
+        http2 = settings.http2
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("HTTP/2 requested but the 'h2' package is not installed, falling back to HTTP/1.1")
+            http2 = False
+
+        limits = httpx.Limits(max_connections=settings.max_connections,
+                              max_keepalive_connections=settings.max_keepalive_connections,
+                              keepalive_expiry=settings.keepalive_expiry)
+        timeout = httpx.Timeout(settings.timeout, connect=settings.connect_timeout or settings.timeout)
+        mounts = {self._transport_pattern(prefix): t for prefix, t in self._transports.items()} or None
+        return httpx.AsyncClient(limits=limits, timeout=timeout, http2=http2, mounts=mounts)
+
+    def _async_pool_usage(self, client: httpx.AsyncClient) -> dict[str, float]:
+        # httpx does not expose its pool: read the httpcore pool of the default transport
+        connections = getattr(getattr(client._transport, "_pool", None), "connections", [])
+        idle = sum(1 for c in connections if c.is_idle())
+        return {"in_use": len(connections) - idle, "idle": idle, "max": self._settings.max_connections}
+
+    @staticmethod
+    def _transport_pattern(prefix: str) -> str:
+        # httpx mount patterns match scheme://host[:port]; a path in the prefix is ignored
+        parts = urlsplit(prefix)
+        return f"{parts.scheme}://{parts.netloc}" if parts.netloc else prefix
+
+
+# The process-wide registry used by default by the service call helpers
+http_clients = HttpClientRegistry()
+atexit.register(http_clients.close)
+
+
+def configure_http_clients(settings: HttpClientSettings):
+    """Configure the process-wide HTTP clients. See `HttpClientRegistry.configure`."""
+    http_clients.configure(settings)
+
+
+async def aclose_http_clients():
+    """Close the process-wide HTTP clients, e.g. from the shutdown hook of the application."""
+    await http_clients.aclose()
@@ -0,0 +1,46 @@
+"""
+JSON encoding of the HTTP helpers and the Configuration Manager proxies.
+
+`dumps` and `loads` use `orjson` when it is installed (`rv16-lib[orjson]`), the standard library
+otherwise. Both backends accept and return the same values: `dumps` falls back to the standard
+library for values `orjson` does not handle, e.g. dictionaries with non-string keys.
+
+`json_body` serializes a request body in one pass: pydantic models with `model_dump_json`, without
+building the intermediate dictionary of `model_dump`, other values with `dumps`.
+"""
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speed-up
+    orjson = None
+
+# Name of the backend in use, e.g. for logs and benchmarks
+BACKEND = "orjson" if orjson is not None else "json"
+
+
+def dumps(value: Any) -> bytes:
+    """Encode a value as compact UTF-8 JSON."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(value)
+        except TypeError:
+            pass
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+    """Decode a JSON document from bytes or text."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(bytes(data) if isinstance(data, memoryview) else data)
+
+
+def json_body(value: Any) -> bytes:
+    """Encode a request body: a pydantic model with `model_dump_json`, any other value with `dumps`."""
+    # Duck-typed, so that pydantic is not imported with the HTTP helpers
+    model_dump_json = getattr(value, "model_dump_json", None)
+    if model_dump_json is not None and not isinstance(value, type):
+        return model_dump_json().encode()
+    return dumps(value)
@@ -1,18 +1,208 @@
+"""
+Logging helpers. Library loggers are children of uvicorn's logger, so that they share its handlers.
+
+`configure_logging` can move the handlers behind a queue, so that records are written by a
+background thread instead of on the request path, and switch them to JSON output.
+`get_logger` can sample or rate-limit the records of hot-path loggers.
+"""
+import atexit
+import json
 import logging
+import threading
+import time
 from typing import Optional
 
 
-def get_logger(name: Optional[str] = None) -> logging.Logger:
+class SamplingFilter(logging.Filter):
+    """ Keep a fixed fraction of the records up to `max_level`; records above it always pass.
+    Sampling is deterministic: with `rate=0.1`, one record in ten is kept.
+    """
+
+    def __init__(self, rate: float, max_level: int = logging.INFO):
+        super().__init__()
+        self.rate = rate
+        self.max_level = max_level
+        self._credit = 1.0
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.max_level:
+            return True
+        with self._lock:
+            self._credit += self.rate
+            if self._credit < 1.0:
+                return False
+            self._credit -= 1.0
+            return True
+
+
+class RateLimitFilter(logging.Filter):
+    """ Let through at most `rate` records per second, with bursts of `burst`, for each message
+    template (the unformatted `msg`) of a logger. The next record let through after some were
+    dropped reports how many were suppressed.
+    """
+
+    def __init__(self, rate: float, burst: int = 10, max_level: int = logging.CRITICAL):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.max_level = max_level
+        # template -> (tokens, last refill, suppressed records)
+        self._buckets: dict[str, tuple[float, float, int]] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.max_level:
+            return True
+
+        template = str(record.msg)
+        now = time.monotonic()
+        with self._lock:
+            tokens, last, suppressed = self._buckets.get(template, (float(self.burst), now, 0))
+            tokens = min(float(self.burst), tokens + (now - last) * self.rate)
+            if tokens < 1.0:
+                self._buckets[template] = (tokens, now, suppressed + 1)
+                return False
+            self._buckets[template] = (tokens - 1.0, now, 0)
+
+        if suppressed:
+            record.suppressed = suppressed
+            record.msg = f"{record.getMessage()} [{suppressed} similar messages suppressed]"
+            record.args = None
+        return True
+
+
+# Attributes of every LogRecord, the others are `extra` fields
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """ Format records as one JSON object per line, with the `extra` fields of the record."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack_info"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+def get_logger(name: Optional[str] = None, sample_rate: Optional[float] = None,
+               rate_limit: Optional[float] = None, burst: int = 10) -> logging.Logger:
     """
     Get a logger instance that uses uvicorn's configuration.
 
     Args:
         name: Optional name for the logger. If None, uses 'uvicorn'
+        sample_rate: Keep only this fraction of the records up to INFO, e.g. 0.01 for hot-path loggers
+        rate_limit: Let through at most this many records per second per message template
+        burst: Number of records let through at once before `rate_limit` applies
     """
     if name:
         # Create a child logger under uvicorn to maintain the same formatting
-        return logging.getLogger(f"uvicorn.{name}")
-    return logging.getLogger("uvicorn")
+        result = logging.getLogger(f"uvicorn.{name}")
+    else:
+        result = logging.getLogger("uvicorn")
+
+    if sample_rate is not None or rate_limit is not None:
+        for existing in [f for f in result.filters if isinstance(f, (SamplingFilter, RateLimitFilter))]:
+            result.removeFilter(existing)
+        if sample_rate is not None:
+            result.addFilter(SamplingFilter(sample_rate))
+        if rate_limit is not None:
+            result.addFilter(RateLimitFilter(rate_limit, burst))
+    return result
+
+
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def configure_logging(queue: bool = True, json_output: bool = False, level: Optional[int] = None,
+                      name: str = "uvicorn"):
+    """
+    Configure the handlers of uvicorn's logger (or of `name`), e.g. in the application startup,
+    after uvicorn has set up its own logging.
+
+    Args:
+        queue: Hand the records to a background thread writing them with the current handlers,
+            so that logging does not block on slow outputs. Defaults to True.
+        json_output: Format records as JSON lines. Defaults to False.
+        level: Level of the logger. Unchanged if None.
+        name: The logger to configure. Defaults to 'uvicorn'.
+
+    Returns:
+        logging.handlers.QueueListener: The background listener, if `queue` is True. It is
+            stopped, flushing pending records, at interpreter exit.
+    """
+    import logging.handlers
+    import queue as queues
+
+    global _listener
+    target = logging.getLogger(name)
+    if level is not None:
+        target.setLevel(level)
+
+    with _listener_lock:
+        if _listener is not None:
+            # Already queued: restore the real handlers before configuring them again
+            _stop(_listener)
+            target.handlers = list(_listener.handlers)
+            _listener = None
+
+        handlers = target.handlers or [logging.StreamHandler()]
+        if json_output:
+            for handler in handlers:
+                handler.setFormatter(JsonFormatter())
+        if not queue:
+            target.handlers = handlers
+            return None
+
+        records = queues.SimpleQueue()
+        _listener = logging.handlers.QueueListener(records, *handlers, respect_handler_level=True)
+        target.handlers = [_LocalQueueHandler(records)]
+        _listener.start()
+        return _listener
+
+
+def _stop(listener):
+    # QueueListener.stop() fails if the listener was already stopped, e.g. by the application
+    if getattr(listener, "_thread", None) is not None:
+        listener.stop()
+
+
+def _stop_listener():
+    with _listener_lock:
+        if _listener is not None:
+            _stop(_listener)
+
+
+atexit.register(_stop_listener)
+
+
+class _LocalQueueHandler(logging.Handler):
+    """ Enqueue records as they are: unlike `logging.handlers.QueueHandler`, the message is not
+    formatted in the calling thread, since the queue does not leave the process.
+    """
+
+    def __init__(self, records):
+        super().__init__()
+        self.records = records
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            self.records.put_nowait(record)
+        except Exception:
+            self.handleError(record)
 
 
 # For convenience, you can also export a default logger
@@ -0,0 +1,327 @@
+"""
+Per-operation metrics of the storage connectors and of the HTTP helpers.
+
+When enabled, every `DatabaseConnector` operation and every `call_srv_sync` / `call_srv_async`
+call records, per component, operation and target:
+  - its latency, in a histogram
+  - its errors, counted by exception type
+  - its payload size: response bytes for HTTP calls, number of returned items for connectors
+Connection pools registered with `register_pool` are sampled when the metrics are exported.
+
+Metrics are disabled by default; the instrumented code then only checks a flag. The module only
+depends on the standard library. OpenTelemetry spans are emitted when enabled with `tracing=True`
+and the `opentelemetry-api` package is installed.
+
+Example:
+    from rv16_lib.metrics import metrics
+    metrics.enable()
+    ...
+    body = metrics.export_prometheus()  # e.g. served on /metrics
+"""
+import bisect
+import functools
+import inspect
+import threading
+import time
+import weakref
+from typing import Any, Callable, Optional, Sequence
+
+from rv16_lib.logger import get_logger
+
+logger = get_logger("metrics")
+
+# Latency buckets in seconds, as in the Prometheus client libraries
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Payload buckets, in bytes or items
+SIZE_BUCKETS = (1, 10, 100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+
+class Histogram:
+    """ A cumulative histogram with fixed buckets."""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        # One count per bucket, plus the +Inf bucket
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile as the upper bound of the bucket it falls in."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return float("inf")
+
+
+class OperationStats:
+    """ Metrics of one (component, operation, target) series."""
+
+    __slots__ = ("latency", "payload", "errors")
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.payload = Histogram(SIZE_BUCKETS)
+        self.errors: dict[str, int] = {}
+
+
+class _Operation:
+    """ Context manager timing one operation and recording it on exit."""
+
+    __slots__ = ("registry", "key", "payload", "_start", "_span")
+
+    def __init__(self, registry: "MetricsRegistry", key: tuple[str, str, str]):
+        self.registry = registry
+        self.key = key
+        # Set by the instrumented code when the size of the result is known
+        self.payload: Optional[int] = None
+        self._span = None
+
+    def __enter__(self) -> "_Operation":
+        tracer = self.registry._tracer
+        if tracer is not None:
+            component, operation, target = self.key
+            self._span = tracer.start_span(f"{component}.{operation}",
+                                           attributes={"rv16.component": component, "rv16.target": target})
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self._start
+        self.registry.record(self.key, elapsed, exc_type.__name__ if exc_type else None, self.payload)
+        if self._span is not None:
+            if exc is not None:
+                self._span.record_exception(exc)
+            self._span.end()
+        return False
+
+
+class _NoOperation:
+    """ Stand-in for `_Operation` when metrics are disabled."""
+
+    payload: Optional[int] = None
+
+    def __enter__(self) -> "_NoOperation":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+# Shared by the instrumented code when metrics are disabled: `with (... if metrics.enabled else NO_OPERATION)`
+NO_OPERATION = _NoOperation()
+
+
+class MetricsRegistry:
+    """ Collects operation metrics and pool gauges, and exports them in the Prometheus text format."""
+
+    def __init__(self):
+        self.enabled = False
+        self._tracer = None
+        self._lock = threading.Lock()
+        self._series: dict[tuple[str, str, str], OperationStats] = {}
+        self._pools: list[tuple[str, str, weakref.ref, Callable[[Any], dict[str, float]]]] = []
+
+    def enable(self, tracing: bool = False):
+        """Start recording. With `tracing`, also emit an OpenTelemetry span per operation."""
+        self._tracer = None
+        if tracing:
+            try:
+                from opentelemetry import trace
+                self._tracer = trace.get_tracer("rv16_lib")
+            except ImportError:
+                logger.warning("Tracing requested but the 'opentelemetry-api' package is not installed.")
+        self.enabled = True
+
+    def disable(self):
+        """Stop recording. Recorded metrics are kept until `reset`."""
+        self.enabled = False
+        self._tracer = None
+
+    def reset(self):
+        """Drop every recorded operation metric."""
+        with self._lock:
+            self._series.clear()
+
+    def operation(self, component: str, operation: str, target: str = "") -> _Operation:
+        """Return a context manager recording the latency and outcome of the operation it wraps."""
+        return _Operation(self, (component, operation, target))
+
+    def record(self, key: tuple[str, str, str], seconds: float, error: Optional[str] = None,
+               payload: Optional[int] = None):
+        """Record one operation of the (component, operation, target) series `key`."""
+        with self._lock:
+            stats = self._series.get(key)
+            if stats is None:
+                stats = self._series[key] = OperationStats()
+            stats.latency.observe(seconds)
+            if payload is not None:
+                stats.payload.observe(payload)
+            if error is not None:
+                stats.errors[error] = stats.errors.get(error, 0) + 1
+
+    def register_pool(self, component: str, target: str, pool: Any, reader: Callable[[Any], dict[str, float]]):
+        """Export the usage of a connection pool, read with `reader(pool)` at export time.
+        The pool is referenced weakly and forgotten once garbage-collected.
+        Args:
+            component (str): The component owning the pool, e.g. "RedisConnector"
+            target (str): The connection target, e.g. "redis:6379/0"
+            pool: The pool object
+            reader (Callable): Returns the number of connections per state, e.g. {"in_use": 3, "idle": 7}
+        """
+        with self._lock:
+            self._pools = [p for p in self._pools
+                           if p[2]() is not None and not (p[0] == component and p[1] == target)]
+            self._pools.append((component, target, weakref.ref(pool), reader))
+
+    def series(self) -> dict[tuple[str, str, str], OperationStats]:
+        """Return a copy of the recorded series, keyed by (component, operation, target)."""
+        with self._lock:
+            return dict(self._series)
+
+    def pool_usage(self) -> dict[tuple[str, str], dict[str, float]]:
+        """Read the registered pools, keyed by (component, target)."""
+        with self._lock:
+            pools = list(self._pools)
+        usage = {}
+        for component, target, ref, reader in pools:
+            pool = ref()
+            if pool is None:
+                continue
+            try:
+                usage[(component, target)] = reader(pool)
+            except Exception as e:
+                logger.debug("Failed to read pool %s %s: %s", component, target, e)
+        return usage
+
+    def export_prometheus(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        with self._lock:
+            series = [(key, stats.latency.counts[:], stats.latency.sum, stats.latency.count,
+                       stats.payload.counts[:], stats.payload.sum, stats.payload.count, dict(stats.errors))
+                      for key, stats in self._series.items()]
+
+        lines = ["# HELP rv16_operation_duration_seconds Latency of connector operations and HTTP calls.",
+                 "# TYPE rv16_operation_duration_seconds histogram"]
+        for key, counts, total, count, *_ in series:
+            lines += _histogram_lines("rv16_operation_duration_seconds", _labels(key), LATENCY_BUCKETS, counts,
+                                      total, count)
+
+        lines += ["# HELP rv16_operation_payload_size Response bytes of HTTP calls, returned items of connector operations.",
+                  "# TYPE rv16_operation_payload_size histogram"]
+        for key, _, _, _, counts, total, count, _ in series:
+            if count:
+                lines += _histogram_lines("rv16_operation_payload_size", _labels(key), SIZE_BUCKETS, counts,
+                                          total, count)
+
+        lines += ["# HELP rv16_operation_errors_total Failed operations, by exception type.",
+                  "# TYPE rv16_operation_errors_total counter"]
+        for key, *_, errors in series:
+            for error, count in sorted(errors.items()):
+                lines.append(f"rv16_operation_errors_total{{{_labels(key)},error=\"{_escape(error)}\"}} {count}")
+
+        lines += ["# HELP rv16_pool_connections Connections of the registered pools, by state.",
+                  "# TYPE rv16_pool_connections gauge"]
+        for (component, target), states in self.pool_usage().items():
+            for state, value in sorted(states.items()):
+                lines.append(f"rv16_pool_connections{{component=\"{_escape(component)}\","
+                             f"target=\"{_escape(target)}\",state=\"{_escape(state)}\"}} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(key: tuple[str, str, str]) -> str:
+    component, operation, target = key
+    return f'component="{_escape(component)}",operation="{_escape(operation)}",target="{_escape(target)}"'
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _histogram_lines(name: str, labels: str, buckets: Sequence[float], counts: list[int], total: float,
+                     count: int) -> list[str]:
+    lines = []
+    cumulative = 0
+    for bound, bucket_count in zip(buckets, counts):
+        cumulative += bucket_count
+        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {count}')
+    lines.append(f"{name}_sum{{{labels}}} {_number(total)}")
+    lines.append(f"{name}_count{{{labels}}} {count}")
+    return lines
+
+
+def _result_size(result: Any) -> Optional[int]:
+    return len(result) if isinstance(result, (list, dict, tuple)) else None
+
+
+def instrument(component: str, operation: str, fn: Callable) -> Callable:
+    """Wrap a connector method so that its calls are recorded as `operation` of `component`, with the
+    `metrics_target` attribute of the instance as target. Coroutine functions get an async wrapper.
+    """
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(self, *args, **kwargs):
+            if not metrics.enabled:
+                return await fn(self, *args, **kwargs)
+            with metrics.operation(component, operation, getattr(self, "metrics_target", "")) as op:
+                result = await fn(self, *args, **kwargs)
+                op.payload = _result_size(result)
+                return result
+        wrapper = async_wrapper
+    else:
+        @functools.wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            if not metrics.enabled:
+                return fn(self, *args, **kwargs)
+            with metrics.operation(component, operation, getattr(self, "metrics_target", "")) as op:
+                result = fn(self, *args, **kwargs)
+                op.payload = _result_size(result)
+                return result
+
+    wrapper.__rv16_instrumented__ = True
+    return wrapper
+
+
+def redis_pool_usage(pool: Any) -> dict[str, float]:
+    """Read the usage of a redis-py (sync or asyncio) connection pool."""
+    in_use = len(getattr(pool, "_in_use_connections", ()))
+    available = getattr(pool, "_available_connections", None)
+    if available is None:
+        # BlockingConnectionPool keeps a queue holding None placeholders for connections not created yet
+        queue = getattr(pool, "pool", None)
+        idle = sum(1 for c in getattr(queue, "queue", getattr(queue, "_queue", ())) if c is not None)
+        in_use = len(getattr(pool, "_connections", ())) - idle
+    else:
+        idle = len(available)
+    return {"in_use": in_use, "idle": idle, "max": getattr(pool, "max_connections", 0)}
+
+
+# The process-wide registry
+metrics = MetricsRegistry()
+
+
+def enable_metrics(tracing: bool = False):
+    """Enable the process-wide metrics. See `MetricsRegistry.enable`."""
+    metrics.enable(tracing)
+
+
+def export_prometheus() -> str:
+    """Render the process-wide metrics in the Prometheus text format."""
+    return metrics.export_prometheus()
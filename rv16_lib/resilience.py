@@ -0,0 +1,486 @@
+"""
+Resilience layer of the service calls made with `call_srv_sync` and `call_srv_async`.
+
+Each call gets:
+  - an optional deadline, capping the timeout of every attempt by the time left
+  - retries with jittered exponential backoff, on network errors and on 502/503/504 answers.
+    Calls that are not idempotent are only retried when the request could not have been sent.
+  - a retry budget per host, so that retries cannot multiply the load of a struggling service
+  - a circuit breaker per host, failing fast while the host keeps failing
+  - optionally, for idempotent calls, a hedged request: if the first attempt has not answered
+    after `hedge_delay` seconds, a second one is sent and the first answer wins
+
+The HTTP library specifics (how to send an attempt, which errors are retryable) are given by the
+callers, see `rv16_lib.utils`.
+"""
+import asyncio
+import concurrent.futures
+import random
+import threading
+import time
+from enum import Enum
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+
+from pydantic import BaseModel, Field
+
+from rv16_lib.exceptions import RV16Exception
+from rv16_lib.logger import get_logger
+
+# Rate-limited: retries come in storms when a downstream service fails
+logger = get_logger("resilience", rate_limit=5, burst=20)
+
+R = TypeVar("R")
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE", "TRACE"})
+
+
+class RetryPolicy(BaseModel):
+    """Retry settings.
+    Args:
+        max_attempts: Maximum number of attempts of a call, the first one included
+        base_delay: Backoff before the first retry, doubled for each following retry, in seconds
+        max_delay: Maximum backoff, in seconds
+        retry_statuses: Response status codes retried for idempotent calls
+    """
+    max_attempts: int = 3
+    base_delay: float = 0.05
+    max_delay: float = 1.0
+    retry_statuses: frozenset[int] = frozenset({502, 503, 504})
+
+    def backoff(self, retry: int) -> float:
+        """Return the delay before the retry number `retry` (0 for the first retry), with full jitter."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry))
+
+
+class RetryBudgetSettings(BaseModel):
+    """Retry budget settings, applied per host.
+    Args:
+        ratio: Retries (and hedged requests) allowed per call, e.g. 0.1 adds at most 10% of load
+        min_per_second: Retries always allowed per second, so that low-traffic hosts can retry
+        max_tokens: Maximum number of retries saved up for bursts. The budget starts full.
+    """
+    ratio: float = 0.1
+    min_per_second: float = 1.0
+    max_tokens: float = 10.0
+
+
+class CircuitBreakerSettings(BaseModel):
+    """Circuit breaker settings, applied per host.
+    Args:
+        failure_threshold: Consecutive failed attempts opening the circuit
+        reset_timeout: Seconds the circuit stays open before a probe request is let through
+        probe_timeout: Seconds after which a probe whose outcome was never recorded is given up,
+            and another probe is let through
+    """
+    failure_threshold: int = 5
+    reset_timeout: float = 30.0
+    probe_timeout: float = 60.0
+
+
+class ResilienceSettings(BaseModel):
+    """Settings of the resilience layer.
+    Args:
+        enabled: If False, every call is a single attempt, without circuit breaker
+        retry: Retry settings
+        budget: Retry budget settings
+        breaker: Circuit breaker settings
+        hedge_delay: Default delay before hedging idempotent calls, in seconds. No hedging if None.
+        deadline: Default deadline of a call, in seconds. No deadline if None.
+    """
+    enabled: bool = True
+    retry: RetryPolicy = Field(default_factory=RetryPolicy)
+    budget: RetryBudgetSettings = Field(default_factory=RetryBudgetSettings)
+    breaker: CircuitBreakerSettings = Field(default_factory=CircuitBreakerSettings)
+    hedge_delay: Optional[float] = None
+    deadline: Optional[float] = None
+
+
+class CircuitOpenError(RV16Exception):
+    """Raised without sending the request while the circuit breaker of the host is open."""
+
+    def __init__(self, host: str):
+        super().__init__(status_code=503, message=f"Circuit breaker open for {host}")
+        self.host = host
+
+
+class RetryBudget:
+    """ Token bucket funding retries: each call deposits `ratio` tokens, each retry withdraws one,
+    and `min_per_second` tokens are added every second.
+    """
+
+    def __init__(self, settings: RetryBudgetSettings):
+        self.settings = settings
+        self._tokens = settings.max_tokens
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.settings.max_tokens, self._tokens + self.settings.ratio)
+
+    def try_withdraw(self) -> bool:
+        with self._lock:
+            self._refill()
+            if self._tokens < 1.0:
+                return False
+            self._tokens -= 1.0
+            return True
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.settings.max_tokens, self._tokens + (now - self._last) * self.settings.min_per_second)
+        self._last = now
+
+
+class CircuitState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """ Consecutive-failure circuit breaker. Once open, a single probe is let through after
+    `reset_timeout`; its success closes the circuit, its failure opens it again. A probe ending
+    without outcome (cancelled, or failing for a reason unrelated to the host) is released, so
+    that the next call probes again.
+    """
+
+    def __init__(self, settings: CircuitBreakerSettings, host: str = ""):
+        self.settings = settings
+        self.host = host
+        self.state = CircuitState.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_started = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state is CircuitState.CLOSED:
+                return True
+            now = time.monotonic()
+            if (self.state is CircuitState.OPEN and now - self._opened_at >= self.settings.reset_timeout
+                    or self.state is CircuitState.HALF_OPEN
+                    and now - self._probe_started >= self.settings.probe_timeout):
+                self.state = CircuitState.HALF_OPEN
+                self._probe_started = now
+                return True
+            return False
+
+    def release(self):
+        """Give up the probe of a half-open circuit without recording an outcome."""
+        with self._lock:
+            if self.state is CircuitState.HALF_OPEN:
+                # Still past reset_timeout: the next call is let through as the new probe
+                self.state = CircuitState.OPEN
+
+    def record_success(self):
+        with self._lock:
+            self.state = CircuitState.CLOSED
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state is CircuitState.HALF_OPEN or self._failures >= self.settings.failure_threshold:
+                if self.state is not CircuitState.OPEN:
+                    logger.warning("Circuit breaker of %s opened after %s consecutive failures", self.host, self._failures)
+                self.state = CircuitState.OPEN
+                self._opened_at = time.monotonic()
+
+
+_TIMEOUT_PHASES = ("connect", "read", "write", "pool")
+
+
+def cap_timeout(timeout: Any, remaining: Optional[float]) -> Any:
+    """Cap a requests/httpx timeout (a number, a (connect, read) tuple, an httpx.Timeout or None)
+    by the time left.
+    """
+    if remaining is None:
+        return timeout
+    if timeout is None:
+        return remaining
+    if isinstance(timeout, (int, float)):
+        return min(timeout, remaining)
+    if isinstance(timeout, tuple):
+        return tuple(remaining if t is None else min(t, remaining) for t in timeout)
+    if all(hasattr(timeout, phase) for phase in _TIMEOUT_PHASES):
+        phases = {phase: getattr(timeout, phase) for phase in _TIMEOUT_PHASES}
+        return type(timeout)(**{phase: remaining if t is None else min(t, remaining) for phase, t in phases.items()})
+    return timeout
+
+
+class _Call:
+    """ Retry, budget and circuit breaker decisions of one call, shared by the sync and async loops."""
+
+    def __init__(self, resilience: "Resilience", host: str, idempotent: bool, deadline: Optional[float],
+                 timeout: Any, retryable_error: Callable[[BaseException, bool], bool],
+                 status_of: Callable[[Any], int], deadline_error: Callable[[str], BaseException]):
+        settings = resilience.settings
+        self.policy = settings.retry
+        self.host = host
+        self.idempotent = idempotent
+        self.timeout = timeout
+        self.retryable_error = retryable_error
+        self.status_of = status_of
+        self.deadline_error = deadline_error
+        self.deadline = deadline if deadline is not None else settings.deadline
+        self.expires = time.monotonic() + self.deadline if self.deadline is not None else None
+        self.breaker = resilience.breaker(host)
+        self.budget = resilience.budget(host)
+        self.attempt = 0
+        self.budget.deposit()
+
+    def remaining(self) -> Optional[float]:
+        return None if self.expires is None else self.expires - time.monotonic()
+
+    def before_attempt(self) -> Any:
+        """Check the deadline and the circuit, and return the timeout of the next attempt."""
+        # The deadline first: once allowed, a probe must reach `failed`, `answered` or `aborted`
+        remaining = self.remaining()
+        if remaining is not None and remaining <= 0:
+            raise self.deadline_error(f"Deadline of {self.deadline}s exceeded calling {self.host}")
+        if not self.breaker.allow():
+            raise CircuitOpenError(self.host)
+        self.attempt += 1
+        return cap_timeout(self.timeout, remaining)
+
+    def failed(self, error: BaseException) -> Optional[float]:
+        """Record a failed attempt. Return the backoff before retrying, or None to give up."""
+        # Only transport failures tell about the health of the host, not e.g. an invalid URL
+        if self.retryable_error(error, True):
+            self.breaker.record_failure()
+        else:
+            self.breaker.release()
+        if not self.retryable_error(error, self.idempotent):
+            return None
+        return self._retry_delay(f"{type(error).__name__}: {error}")
+
+    def aborted(self):
+        """Record an attempt interrupted without outcome, e.g. a cancelled task."""
+        self.breaker.release()
+
+    def answered(self, response: Any) -> Optional[float]:
+        """Record an answered attempt. Return the backoff before retrying, or None to return the response."""
+        status = self.status_of(response)
+        if status >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        if not self.idempotent or status not in self.policy.retry_statuses:
+            return None
+        return self._retry_delay(f"status {status}")
+
+    def _retry_delay(self, reason: str) -> Optional[float]:
+        if self.attempt >= self.policy.max_attempts:
+            return None
+        delay = self.policy.backoff(self.attempt - 1)
+        remaining = self.remaining()
+        if remaining is not None and delay >= remaining:
+            return None
+        if not self.budget.try_withdraw():
+            logger.warning("Retry budget of %s exhausted, not retrying after %s", self.host, reason)
+            return None
+        logger.info("Retrying call to %s in %.3fs after %s (attempt %s)", self.host, delay, reason, self.attempt)
+        return delay
+
+
+class Resilience:
+    """ Holds the resilience settings, and the circuit breakers and retry budgets of every host."""
+
+    def __init__(self, settings: Optional[ResilienceSettings] = None):
+        self._settings = settings or ResilienceSettings()
+        self._lock = threading.Lock()
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._budgets: dict[str, RetryBudget] = {}
+        self._executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+
+    @property
+    def settings(self) -> ResilienceSettings:
+        return self._settings
+
+    def configure(self, settings: ResilienceSettings):
+        """Replace the settings. Circuit breakers and retry budgets start over."""
+        with self._lock:
+            self._settings = settings
+            self._breakers.clear()
+            self._budgets.clear()
+
+    def breaker(self, host: str) -> CircuitBreaker:
+        """Return the circuit breaker of a host."""
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(host, CircuitBreaker(self._settings.breaker, host))
+        return breaker
+
+    def budget(self, host: str) -> RetryBudget:
+        """Return the retry budget of a host."""
+        budget = self._budgets.get(host)
+        if budget is None:
+            with self._lock:
+                budget = self._budgets.setdefault(host, RetryBudget(self._settings.budget))
+        return budget
+
+    def call_sync(self, host: str, attempt: Callable[[Any], R], idempotent: bool, status_of: Callable[[R], int],
+                  retryable_error: Callable[[BaseException, bool], bool],
+                  deadline_error: Callable[[str], BaseException], deadline: Optional[float] = None,
+                  timeout: Any = None, hedge_delay: Optional[float] = None) -> R:
+        """Run `attempt(timeout)` until it succeeds or retrying is not allowed.
+        Args:
+            host (str): The host called, keying the circuit breaker and the retry budget
+            attempt (Callable): Sends the request with the given timeout and returns the response
+            idempotent (bool): Whether the call can be retried after being sent, and hedged
+            status_of (Callable): Returns the status code of a response
+            retryable_error (Callable): Tells if an attempt error can be retried, given `idempotent`
+            deadline_error (Callable): Builds the error raised when the deadline is exceeded
+            deadline (float, optional): Seconds allowed for the whole call. Defaults to the settings.
+            timeout: The timeout of one attempt, capped by the time left before the deadline
+            hedge_delay (float, optional): Hedge idempotent calls after this many seconds.
+                Defaults to the settings.
+
+        Returns:
+            The last response
+
+        Raises:
+            CircuitOpenError: If the circuit breaker of the host is open
+            Exception: The error of the last attempt, or `deadline_error`
+        """
+        if not self._settings.enabled:
+            return attempt(timeout)
+
+        call = _Call(self, host, idempotent, deadline, timeout, retryable_error, status_of, deadline_error)
+        hedge_delay = self._hedge_delay(idempotent, hedge_delay)
+        while True:
+            attempt_timeout = call.before_attempt()
+            try:
+                if hedge_delay is not None:
+                    response = self._hedged_sync(call, attempt, attempt_timeout, hedge_delay)
+                else:
+                    response = attempt(attempt_timeout)
+            except Exception as e:
+                delay = call.failed(e)
+                if delay is None:
+                    raise
+            except BaseException:
+                call.aborted()
+                raise
+            else:
+                delay = call.answered(response)
+                if delay is None:
+                    return response
+                _close(response)
+            time.sleep(delay)
+
+    async def call_async(self, host: str, attempt: Callable[[Any], Awaitable[R]], idempotent: bool,
+                         status_of: Callable[[R], int], retryable_error: Callable[[BaseException, bool], bool],
+                         deadline_error: Callable[[str], BaseException], deadline: Optional[float] = None,
+                         timeout: Any = None, hedge_delay: Optional[float] = None) -> R:
+        """Asyncio counterpart of `call_sync`, awaiting `attempt(timeout)`."""
+        if not self._settings.enabled:
+            return await attempt(timeout)
+
+        call = _Call(self, host, idempotent, deadline, timeout, retryable_error, status_of, deadline_error)
+        hedge_delay = self._hedge_delay(idempotent, hedge_delay)
+        while True:
+            attempt_timeout = call.before_attempt()
+            try:
+                if hedge_delay is not None:
+                    response = await self._hedged_async(call, attempt, attempt_timeout, hedge_delay)
+                else:
+                    response = await attempt(attempt_timeout)
+            except Exception as e:
+                delay = call.failed(e)
+                if delay is None:
+                    raise
+            except BaseException:
+                # e.g. asyncio.CancelledError
+                call.aborted()
+                raise
+            else:
+                delay = call.answered(response)
+                if delay is None:
+                    return response
+            await asyncio.sleep(delay)
+
+    def _hedge_delay(self, idempotent: bool, hedge_delay: Optional[float]) -> Optional[float]:
+        if not idempotent:
+            return None
+        return hedge_delay if hedge_delay is not None else self._settings.hedge_delay
+
+    def _hedged_sync(self, call: _Call, attempt: Callable[[Any], R], timeout: Any, delay: float) -> R:
+        executor = self._hedge_executor()
+        first = executor.submit(attempt, timeout)
+        try:
+            return first.result(timeout=delay)
+        except concurrent.futures.TimeoutError:
+            pass
+        if not call.budget.try_withdraw():
+            return first.result()
+
+        logger.debug("Hedging call to %s after %.3fs", call.host, delay)
+        pending = {first, executor.submit(attempt, timeout)}
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    # The slower attempt completes in the background, its answer is dropped
+                    for other in pending:
+                        other.add_done_callback(_close_future)
+                    return future.result()
+                error = error or future.exception()
+        raise error
+
+    @staticmethod
+    async def _hedged_async(call: _Call, attempt: Callable[[Any], Awaitable[R]], timeout: Any, delay: float) -> R:
+        tasks = {asyncio.ensure_future(attempt(timeout))}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done or not call.budget.try_withdraw():
+                return await next(iter(tasks))
+
+            logger.debug("Hedging call to %s after %.3fs", call.host, delay)
+            tasks.add(asyncio.ensure_future(attempt(timeout)))
+            pending = set(tasks)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def _hedge_executor(self) -> concurrent.futures.ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=32,
+                                                                           thread_name_prefix="rv16-hedge")
+        return self._executor
+
+
+def _close(response: Any):
+    close = getattr(response, "close", None)
+    if close is not None:
+        close()
+
+
+def _close_future(future: concurrent.futures.Future):
+    if future.exception() is None:
+        _close(future.result())
+
+
+# The process-wide resilience layer used by the service call helpers
+resilience = Resilience()
+
+
+def configure_resilience(settings: ResilienceSettings):
+    """Configure the process-wide resilience layer. See `Resilience.configure`."""
+    resilience.configure(settings)
@@ -0,0 +1,49 @@
+"""
+Storage connectors. Each connector, and the optional driver it needs (`rv16-lib[redis]`,
+`rv16-lib[mongo]`), is only imported when it is first accessed.
+"""
+from typing import TYPE_CHECKING
+
+from rv16_lib._lazy import lazy_getattr
+
+if TYPE_CHECKING:
+    from rv16_lib.storage.database_connector import DatabaseConnector, DatabaseElement
+    from rv16_lib.storage.redis_connector import RedisConnector, RedisElement
+    from rv16_lib.storage.async_redis_connector import AsyncRedisConnector
+    from rv16_lib.storage.redis_namespace import RedisNamespace, AsyncRedisNamespace
+    from rv16_lib.storage.mongo_element import MongoElement, MongoIndex, ReadMode
+    from rv16_lib.storage.mongo_profiler import QueryProfiler
+    from rv16_lib.storage.mongo_connector import MongoConnector
+    from rv16_lib.storage.async_mongo_connector import AsyncMongoConnector
+    from rv16_lib.storage.mongo_batch_writer import MongoBatchWriter, BatchWriterSettings
+    from rv16_lib.storage.tiered_cache import TieredCache
+    from rv16_lib.storage.registry import ConnectorRegistry, connectors
+
+__all__ = [
+    "DatabaseConnector", "DatabaseElement",
+    "RedisConnector", "RedisElement", "AsyncRedisConnector", "RedisNamespace", "AsyncRedisNamespace",
+    "MongoElement", "MongoIndex", "ReadMode", "QueryProfiler", "MongoConnector", "AsyncMongoConnector",
+    "MongoBatchWriter", "BatchWriterSettings",
+    "TieredCache", "ConnectorRegistry", "connectors",
+]
+
+__getattr__, __dir__ = lazy_getattr(__name__, {
+    "DatabaseConnector": ".database_connector",
+    "DatabaseElement": ".database_connector",
+    "RedisConnector": ".redis_connector",
+    "RedisElement": ".redis_connector",
+    "AsyncRedisConnector": ".async_redis_connector",
+    "RedisNamespace": ".redis_namespace",
+    "AsyncRedisNamespace": ".redis_namespace",
+    "MongoElement": ".mongo_element",
+    "MongoIndex": ".mongo_element",
+    "ReadMode": ".mongo_element",
+    "QueryProfiler": ".mongo_profiler",
+    "MongoConnector": ".mongo_connector",
+    "AsyncMongoConnector": ".async_mongo_connector",
+    "MongoBatchWriter": ".mongo_batch_writer",
+    "BatchWriterSettings": ".mongo_batch_writer",
+    "TieredCache": ".tiered_cache",
+    "ConnectorRegistry": ".registry",
+    "connectors": ".registry",
+})
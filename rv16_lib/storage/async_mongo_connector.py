@@ -0,0 +1,207 @@
+from typing import Any, Optional, Type, AsyncIterator, Union, Sequence
+
+from bson import ObjectId
+from pymongo import AsyncMongoClient, ASCENDING
+from pymongo.errors import BulkWriteError
+
+from rv16_lib import logger
+from rv16_lib.storage.database_connector import DatabaseConnector
+from rv16_lib.storage.mongo_bulk import MongoOperation, BulkOperationResult, DEFAULT_BULK_CHUNK_SIZE, to_request, \
+    chunked, chunk_results, collection_of
+from rv16_lib.storage.mongo_element import MongoElement, ReadMode, decode_document, decode_documents
+from rv16_lib.storage.mongo_indexes import ensure_indexes_async
+from rv16_lib.storage.mongo_pool import pool_listeners
+from rv16_lib.storage.mongo_profiler import QueryProfiler, NO_PROFILE
+
+
+class AsyncMongoConnector(DatabaseConnector):
+    """ Asyncio counterpart of `MongoConnector`, built on PyMongo's native `AsyncMongoClient`.
+    The client connects lazily; await `connect()` to check the connection at startup.
+    """
+
+    def __init__(self, host: str, port: int, db_name: str, max_pool_size: int = 100, min_pool_size: int = 0,
+                 wait_queue_timeout_ms: Optional[int] = None, elements: Sequence[Type[MongoElement]] = (),
+                 profiler: Optional[QueryProfiler] = None):
+        """
+        Args:
+            elements (Sequence[Type[MongoElement]], optional): Elements whose declared indexes are
+                created, if missing, by `connect()`
+            profiler (QueryProfiler, optional): Logs the slow queries and the collection scans
+        """
+        self.elements = tuple(elements)
+        self.profiler = profiler
+        self.client: AsyncMongoClient = AsyncMongoClient(f'mongodb://{host}:{port}/',
+                                                         maxPoolSize=max_pool_size,
+                                                         minPoolSize=min_pool_size,
+                                                         waitQueueTimeoutMS=wait_queue_timeout_ms,
+                                                         event_listeners=pool_listeners(type(self).__name__,
+                                                                                        f"{host}:{port}"))
+        self.db = self.client[db_name]
+        self.metrics_target = f"{host}:{port}/{db_name}"
+
+    async def connect(self):
+        await self.db.command('ping')
+        logger.info("Connected to MongoDB successfully.")
+        if self.elements:
+            await self.ensure_indexes()
+
+    async def ensure_indexes(self, elements: Optional[Sequence[Type[MongoElement]]] = None) -> dict[str, list[str]]:
+        """Create the indexes declared by `elements` (defaults to the connector elements) if they do not exist."""
+        return await ensure_indexes_async(self.db, self.elements if elements is None else elements)
+
+    def _profile(self, collection, operation: str, query: dict):
+        return NO_PROFILE if self.profiler is None else self.profiler.profile_async(collection, operation, query)
+
+    async def close(self):
+        await self.client.close()
+
+    async def insert_one(self, element: MongoElement, collection_name: Optional[str] = None) -> ObjectId:
+        collection_name = collection_name or element.collection_name
+        if not collection_name:
+            raise ValueError("Collection name must be provided for MongoDB insert operation.")
+
+        collection = self.db[collection_name]
+        result = await collection.insert_one(element.model_dump())
+        return result.inserted_id
+
+
+    async def insert_many(self, elements: list[MongoElement], collection_name: Optional[str] = None,
+                          ordered: bool = True, chunk_size: Optional[int] = None) -> list[ObjectId]:
+        collection_name = collection_name or (elements[0].collection_name if elements else None)
+        if not collection_name:
+            raise ValueError("Collection name must be provided for MongoDB insert operation.")
+
+        collection = self.db[collection_name]
+        docs = [element.model_dump() for element in elements]
+        inserted_ids = []
+        for _, chunk in chunked(docs, chunk_size or len(docs) or 1):
+            result = await collection.insert_many(chunk, ordered=ordered)
+            inserted_ids.extend(result.inserted_ids)
+        return inserted_ids
+
+
+    async def delete(self, query: dict, collection_name: Optional[str] = None,
+                     model_type: Optional[Type[MongoElement]] = None) -> int:
+        collection_name = collection_name or (model_type.collection_name if model_type else None)
+        if not collection_name:
+            raise ValueError("Collection name must be provided for MongoDB delete operation.")
+
+        collection = self.db[collection_name]
+        async with self._profile(collection, "delete", query):
+            result = await collection.delete_many(query)
+        return result.deleted_count
+
+
+    async def update(self, query: dict, element: MongoElement, collection_name: Optional[str] = None, partial: bool = False) -> int:
+        collection_name = collection_name or element.collection_name
+        if not collection_name:
+            raise ValueError("Collection name must be provided for MongoDB update operation.")
+
+        collection = self.db[collection_name]
+
+        # With partial=True only the fields explicitly set on the element are sent
+        data = {"$set": element.model_dump(exclude_unset=partial)}
+        async with self._profile(collection, "update", query):
+            result = await collection.update_many(query, data)
+        return result.modified_count
+
+
+    async def find(self, query: dict, collection_name: Optional[str] = None, model_type: Optional[Type[MongoElement]] = None,
+                   read_mode: ReadMode = ReadMode.VALIDATE) -> list[MongoElement]:
+        collection_name = collection_name or (model_type.collection_name if model_type else None)
+        if not collection_name:
+            raise ValueError("Collection name must be provided for MongoDB find operation.")
+
+        collection = self.db[collection_name]
+        async with self._profile(collection, "find", query):
+            result = [r async for r in collection.find(query)]
+        return decode_documents(result, model_type, read_mode) if model_type else result
+
+
+    async def bulk_write(self, operations: list[MongoOperation], collection_name: Optional[str] = None,
+                         chunk_size: int = DEFAULT_BULK_CHUNK_SIZE) -> list[BulkOperationResult]:
+        """Run mixed inserts, upserts, updates and deletes as unordered bulk writes.
+        See `MongoConnector.bulk_write`.
+        """
+        collection_name = collection_name or collection_of(operations)
+        if not collection_name:
+            raise ValueError("Collection name must be provided for MongoDB bulk write operation.")
+
+        collection = self.db[collection_name]
+        # Invalid operations raise here, before any chunk is written
+        prepared = [to_request(operation) for operation in operations]
+        results: list[BulkOperationResult] = []
+        for offset, chunk in chunked(prepared, chunk_size):
+            requests, documents = zip(*chunk)
+            try:
+                result, error = await collection.bulk_write(list(requests), ordered=False), None
+            except BulkWriteError as e:
+                result, error = None, e
+            results.extend(chunk_results(offset, list(documents), result, error))
+
+        failed = sum(1 for r in results if not r.ok)
+        if failed:
+            logger.warning("Bulk write on %s: %s/%s operations failed", collection_name, failed, len(results))
+        return results
+
+
+    def find_stream(self, query: dict, collection_name: Optional[str] = None, model_type: Optional[Type[MongoElement]] = None,
+                    batch_size: int = 1000, projection: Optional[dict] = None, sort: Optional[list[tuple[str, int]]] = None,
+                    limit: int = 0, after: Any = None, page_size: Optional[int] = None, key_field: str = "_id",
+                    chunk_size: Optional[int] = None, read_mode: ReadMode = ReadMode.VALIDATE) -> AsyncIterator[Union[dict, MongoElement, list]]:
+        """Lazily iterate over the documents matching `query` with `async for`.
+        Accepts the same arguments as `MongoConnector.find_stream`.
+        """
+        collection_name = collection_name or (model_type.collection_name if model_type else None)
+        if not collection_name:
+            raise ValueError("Collection name must be provided for MongoDB find operation.")
+        paginated = after is not None or page_size is not None
+        if paginated and sort:
+            raise ValueError("Keyset pagination sorts by key_field, a custom sort cannot be used.")
+
+        collection = self.db[collection_name]
+        if paginated:
+            documents = self._find_pages(collection, query, projection, limit, batch_size, after, page_size, key_field)
+        else:
+            documents = collection.find(query, projection, sort=sort, limit=limit, batch_size=batch_size)
+        return self._items(documents, model_type, chunk_size, read_mode)
+
+    @staticmethod
+    async def _items(documents: AsyncIterator[dict], model_type: Optional[Type[MongoElement]],
+                     chunk_size: Optional[int], read_mode: ReadMode) -> AsyncIterator[Union[dict, MongoElement, list]]:
+        chunk = []
+        async for document in documents:
+            if not chunk_size:
+                yield decode_document(document, model_type, read_mode) if model_type else document
+                continue
+            chunk.append(document)
+            if len(chunk) >= chunk_size:
+                yield decode_documents(chunk, model_type, read_mode) if model_type else chunk
+                chunk = []
+        if chunk:
+            yield decode_documents(chunk, model_type, read_mode) if model_type else chunk
+
+    @staticmethod
+    async def _find_pages(collection, query: dict, projection: Optional[dict], limit: int, batch_size: int,
+                          after: Any, page_size: Optional[int], key_field: str) -> AsyncIterator[dict]:
+        last = after
+        remaining = limit
+        while True:
+            page_limit = page_size or 0
+            if remaining:
+                page_limit = min(page_limit, remaining) if page_limit else remaining
+
+            page_query = query if last is None else {"$and": [query, {key_field: {"$gt": last}}]}
+            count = 0
+            async for document in collection.find(page_query, projection, sort=[(key_field, ASCENDING)],
+                                                  limit=page_limit, batch_size=batch_size):
+                last = document[key_field]
+                count += 1
+                yield document
+
+            if remaining:
+                remaining -= count
+                if remaining <= 0:
+                    return
+            if not page_size or count < page_limit:
+                return
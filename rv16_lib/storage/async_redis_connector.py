@@ -0,0 +1,313 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Optional, Any, AsyncIterator, Sequence, Type
+
+import redis.asyncio as aioredis
+from pydantic import BaseModel
+
+from rv16_lib.exceptions import RV16Exception
+from rv16_lib.logger import logger
+from rv16_lib.metrics import metrics, redis_pool_usage
+from rv16_lib.storage.codecs import Codec, TModel, decode_hash_fields, encode_hash_fields, model_to_hash
+from rv16_lib.storage.database_connector import DatabaseConnector
+from rv16_lib.storage.redis_connector import RedisElement, DEFAULT_CHUNK_SIZE, DEFAULT_SCAN_COUNT, _chunked, \
+    _throttle_delay, binary_pool, escape_pattern
+
+
+class AsyncRedisConnector(DatabaseConnector):
+    """
+    Asyncio counterpart of `RedisConnector`, built on `redis.asyncio`.
+
+    Connections are taken from an explicitly sized pool. When every connection is busy,
+    callers wait up to `pool_timeout` seconds for one to be released instead of opening
+    more. Nothing is sent to Redis until the first command, or until `connect()` is awaited.
+    """
+
+    def __init__(self, host: str, port: int, db: int, max_connections: int = 50, pool_timeout: float = 5.0,
+                 health_check_interval: int = 30, socket_timeout: Optional[float] = 5.0,
+                 socket_connect_timeout: Optional[float] = 5.0, codec: Optional[Codec] = None):
+        """
+        Initializes the connection pool and the client, without connecting.
+        With a `codec`, element values are encoded and decoded as in `RedisConnector`.
+        """
+        self.codec = codec
+        self._binary_client: Optional[aioredis.Redis] = None
+        self.pool = aioredis.BlockingConnectionPool(host=host, port=port, db=db,
+                                                    max_connections=max_connections,
+                                                    timeout=pool_timeout,
+                                                    health_check_interval=health_check_interval,
+                                                    socket_timeout=socket_timeout,
+                                                    socket_connect_timeout=socket_connect_timeout,
+                                                    decode_responses=True)
+        self.client: aioredis.Redis = aioredis.Redis(connection_pool=self.pool)
+        self.metrics_target = f"{host}:{port}/{db}"
+        metrics.register_pool(type(self).__name__, self.metrics_target, self.pool, redis_pool_usage)
+
+
+    async def connect(self):
+        """
+        Checks the connection with a ping. Optional: connections are opened lazily on first use.
+        """
+        try:
+            await self.client.ping()
+            logger.info("Connected to Redis successfully.")
+        except aioredis.ConnectionError as e:
+            logger.error("Failed to connect to Redis: %s", e)
+            raise RV16Exception(status_code=500,
+                                message="Failed to connect to Redis")
+
+
+    async def close(self):
+        """
+        Closes the client and disconnects every pooled connection.
+        """
+        await self.client.aclose()
+        await self.pool.aclose()
+        if self._binary_client is not None:
+            await self._binary_client.aclose()
+            await self._binary_client.connection_pool.aclose()
+            self._binary_client = None
+
+
+    @property
+    def binary_client(self) -> aioredis.Redis:
+        """A client on the same server whose responses are bytes, created on first use."""
+        if self._binary_client is None:
+            self._binary_client = aioredis.Redis(connection_pool=binary_pool(self.client.connection_pool))
+            metrics.register_pool(f"{type(self).__name__}.binary", self.metrics_target,
+                                  self._binary_client.connection_pool, redis_pool_usage)
+        return self._binary_client
+
+    @property
+    def _values(self) -> aioredis.Redis:
+        return self.client if self.codec is None else self.binary_client
+
+    def _encode(self, value: Any) -> Any:
+        return value if self.codec is None else self.codec.encode(value)
+
+    def _decode(self, data: Any) -> Any:
+        return data if self.codec is None or data is None else self.codec.decode(data)
+
+
+    async def insert_one(self, element: RedisElement):
+        """
+        Inserts a single key-value pair into Redis.
+        """
+        try:
+            await self._values.set(element.key, self._encode(element.value))
+            logger.debug("Successfully inserted key: %s", element.key)
+            return True
+        except Exception as e:
+            logger.error("Error inserting key %s: %s", element.key, e)
+            raise RV16Exception(status_code=500,
+                                message=f"Error inserting key {element.key}")
+
+
+    async def delete(self, element: RedisElement):
+        """
+        Deletes a single key-value pair from Redis.
+        """
+        try:
+            await self.client.delete(element.key)
+            logger.debug("Successfully deleted key: %s", element.key)
+            return True
+        except Exception as e:
+            logger.error("Error deleting key %s: %s", element.key, e)
+            raise RV16Exception(status_code=500,
+                                message=f"Error deleting key {element.key}")
+
+
+    async def delete_prefix(self, prefix: str, batch_size: int = DEFAULT_SCAN_COUNT,
+                            max_keys_per_second: Optional[float] = None) -> int:
+        """
+        Deletes every key starting with `prefix` with incremental SCAN steps and UNLINK,
+        like `RedisConnector.delete_prefix`. Returns the number of keys deleted.
+        """
+        deleted = 0
+        started = time.monotonic()
+        batch: list[str] = []
+        try:
+            async for key in self.client.scan_iter(match=escape_pattern(prefix) + "*", count=batch_size):
+                batch.append(key)
+                if len(batch) >= batch_size:
+                    deleted += await self.client.unlink(*batch)
+                    batch = []
+                    await asyncio.sleep(_throttle_delay(deleted, started, max_keys_per_second))
+            if batch:
+                deleted += await self.client.unlink(*batch)
+        except Exception as e:
+            logger.error("Error deleting prefix %s after %s keys: %s", prefix, deleted, e)
+            raise RV16Exception(status_code=500,
+                                message=f"Error deleting prefix {prefix}")
+
+        logger.debug("Deleted %s keys with prefix %s", deleted, prefix)
+        return deleted
+
+
+    async def update(self, element: RedisElement):
+        """
+        Updates the value of a single key in Redis.
+        """
+        try:
+            await self._values.set(element.key, self._encode(element.value))
+            logger.debug("Successfully updated key: %s", element.key)
+            return True
+        except Exception as e:
+            logger.error("Error updating key %s: %s", element.key, e)
+            raise RV16Exception(status_code=500,
+                                message=f"Error updating key {element.key}")
+
+
+    async def find(self, element: RedisElement) -> Any:
+        """
+        Finds a single key's value in Redis, decoded by the codec if any.
+        """
+        try:
+            value = await self._values.get(element.key)
+        except Exception as e:
+            logger.error("Error finding key %s: %s", element.key, e)
+            raise RV16Exception(status_code=500,
+                                message=f"Error finding key '{element.key}")
+
+        if value is None:
+            logger.debug("Key not found: %s", element.key)
+            raise RV16Exception(status_code=500,
+                                message=f"Key '{element.key}' not found")
+        return self._decode(value)
+
+
+    @asynccontextmanager
+    async def pipeline(self, transaction: bool = False, binary: bool = False) -> AsyncIterator[aioredis.client.Pipeline]:
+        """
+        Yields a pipeline whose queued commands are sent in a single round-trip when the block exits.
+        With `transaction=True` the commands are wrapped in MULTI/EXEC. To read the results,
+        await `execute()` on the pipeline inside the block. With `binary=True` the pipeline
+        runs on `binary_client`.
+        """
+        try:
+            async with (self.binary_client if binary else self.client).pipeline(transaction=transaction) as pipe:
+                yield pipe
+                if len(pipe):
+                    await pipe.execute()
+        except RV16Exception:
+            raise
+        except Exception as e:
+            logger.error("Error executing Redis pipeline: %s", e)
+            raise RV16Exception(status_code=500,
+                                message="Error executing Redis pipeline")
+
+
+    async def insert_many(self, elements: Sequence[RedisElement], chunk_size: int = DEFAULT_CHUNK_SIZE) -> dict[str, bool]:
+        """
+        Inserts many key-value pairs, one pipelined round-trip per chunk of `chunk_size` keys.
+        Returns whether each key was written, instead of raising on the first failure.
+        """
+        results: dict[str, bool] = {}
+        for chunk in _chunked(elements, chunk_size):
+            async with self.pipeline(binary=self.codec is not None) as pipe:
+                for element in chunk:
+                    pipe.set(element.key, self._encode(element.value))
+                replies = await pipe.execute(raise_on_error=False)
+            for element, reply in zip(chunk, replies):
+                results[element.key] = reply is True
+
+        logger.debug("Inserted %s/%s keys", sum(results.values()), len(results))
+        return results
+
+
+    async def find_many(self, elements: Sequence[RedisElement], chunk_size: int = DEFAULT_CHUNK_SIZE) -> dict[str, Optional[Any]]:
+        """
+        Finds many keys' values with one MGET per chunk of `chunk_size` keys.
+        Missing keys are reported as None instead of raising.
+        """
+        results: dict[str, Optional[Any]] = {}
+        try:
+            for chunk in _chunked(elements, chunk_size):
+                keys = [element.key for element in chunk]
+                results.update(zip(keys, map(self._decode, await self._values.mget(keys))))
+        except Exception as e:
+            logger.error("Error finding %s keys: %s", len(elements), e)
+            raise RV16Exception(status_code=500,
+                                message=f"Error finding {len(elements)} keys")
+        return results
+
+
+    async def delete_many(self, elements: Sequence[RedisElement], chunk_size: int = DEFAULT_CHUNK_SIZE) -> dict[str, bool]:
+        """
+        Deletes many keys, one pipelined round-trip per chunk of `chunk_size` keys.
+        Returns whether each key existed and was deleted.
+        """
+        results: dict[str, bool] = {}
+        for chunk in _chunked(elements, chunk_size):
+            async with self.pipeline() as pipe:
+                for element in chunk:
+                    pipe.delete(element.key)
+                replies = await pipe.execute(raise_on_error=False)
+            for element, reply in zip(chunk, replies):
+                results[element.key] = reply == 1
+
+        logger.debug("Deleted %s/%s keys", sum(results.values()), len(results))
+        return results
+
+    async def insert_hash(self, key: str, model: BaseModel, ex: Optional[int] = None):
+        """
+        Stores a model as a hash, one JSON-encoded field per attribute, like `RedisConnector.insert_hash`.
+        """
+        try:
+            async with self.pipeline(transaction=True) as pipe:
+                pipe.delete(key)
+                pipe.hset(key, mapping=model_to_hash(model))
+                if ex is not None:
+                    pipe.expire(key, ex)
+            logger.debug("Successfully inserted hash: %s", key)
+            return True
+        except RV16Exception:
+            raise
+        except Exception as e:
+            logger.error("Error inserting hash %s: %s", key, e)
+            raise RV16Exception(status_code=500,
+                                message=f"Error inserting hash {key}")
+
+
+    async def find_hash(self, key: str, model_type: Type[TModel]) -> Optional[TModel]:
+        """
+        Reads a model stored with `insert_hash`. Returns None if the key does not exist.
+        """
+        try:
+            fields = await self.client.hgetall(key)
+        except Exception as e:
+            logger.error("Error finding hash %s: %s", key, e)
+            raise RV16Exception(status_code=500,
+                                message=f"Error finding hash '{key}'")
+        return model_type.model_validate(decode_hash_fields(fields)) if fields else None
+
+
+    async def find_hash_fields(self, key: str, *fields: str) -> dict[str, Any]:
+        """
+        Reads some attributes of a model stored with `insert_hash`. Missing fields are left out.
+        """
+        try:
+            values = await self.client.hmget(key, fields)
+        except Exception as e:
+            logger.error("Error finding fields of hash %s: %s", key, e)
+            raise RV16Exception(status_code=500,
+                                message=f"Error finding fields of hash '{key}'")
+        return decode_hash_fields(dict(zip(fields, values)))
+
+
+    async def update_hash_fields(self, key: str, values: dict[str, Any]):
+        """
+        Writes some attributes of a model stored with `insert_hash`. Values must be JSON-compatible.
+        """
+        try:
+            await self.client.hset(key, mapping=encode_hash_fields(values))
+            logger.debug("Successfully updated %s fields of hash: %s", len(values), key)
+            return True
+        except Exception as e:
+            logger.error("Error updating hash %s: %s", key, e)
+            raise RV16Exception(status_code=500,
+                                message=f"Error updating hash {key}")
+
+    def execute_query(self, *args, **kwargs) -> Any:
+        raise NotImplementedError("Redis does not support arbitrary queries.")
@@ -0,0 +1,152 @@
+"""
+Value codecs of the Redis connectors: how values are turned into the bytes stored in Redis.
+
+A connector created with a `codec` stores `RedisElement.value` as `codec.encode(value)` through a
+client that does not decode responses, and decodes what it reads with `codec.decode`:
+  - `JsonCodec`: JSON-compatible values, with `orjson` when installed
+  - `MsgpackCodec`: the same values in the more compact MessagePack format (`rv16-lib[msgpack]`)
+  - `RawCodec`: bytes as they are, strings as UTF-8
+  - `ModelCodec`: pydantic models, as JSON or through another codec
+  - `CompressedCodec`: wraps another codec and compresses the values larger than a threshold
+
+`model_to_hash` and `decode_hash_fields` map a model to a Redis hash, one JSON-encoded field per
+attribute, so that single fields can be read or written without moving the whole value.
+"""
+import zlib
+from abc import ABC, abstractmethod
+from typing import Any, Mapping, Optional, Type, TypeVar, Union
+
+from pydantic import BaseModel
+
+from rv16_lib import json_codec
+
+TModel = TypeVar("TModel", bound=BaseModel)
+
+
+class Codec(ABC):
+    """ Converts values to and from the bytes stored in Redis."""
+
+    @abstractmethod
+    def encode(self, value: Any) -> bytes:
+        raise NotImplementedError("Subclasses must implement this method")
+
+    @abstractmethod
+    def decode(self, data: bytes) -> Any:
+        raise NotImplementedError("Subclasses must implement this method")
+
+
+class JsonCodec(Codec):
+    """ Compact JSON, encoded with `orjson` if it is installed, with the standard library otherwise."""
+
+    def encode(self, value: Any) -> bytes:
+        return json_codec.dumps(value)
+
+    def decode(self, data: Union[bytes, str]) -> Any:
+        return json_codec.loads(data)
+
+
+class MsgpackCodec(Codec):
+    """ MessagePack: smaller than JSON and faster to decode. Requires the `msgpack` package."""
+
+    def __init__(self):
+        try:
+            import msgpack
+        except ImportError:
+            raise ImportError("MsgpackCodec requires the 'msgpack' package: pip install rv16-lib[msgpack]")
+        self._packb = msgpack.packb
+        self._unpackb = msgpack.unpackb
+
+    def encode(self, value: Any) -> bytes:
+        return self._packb(value, use_bin_type=True)
+
+    def decode(self, data: bytes) -> Any:
+        return self._unpackb(data, raw=False)
+
+
+class RawCodec(Codec):
+    """ Bytes stored as they are; strings are encoded as UTF-8 and read back as bytes."""
+
+    def encode(self, value: Union[bytes, str]) -> bytes:
+        return value.encode() if isinstance(value, str) else bytes(value)
+
+    def decode(self, data: bytes) -> bytes:
+        return data
+
+
+class ModelCodec(Codec):
+    """ Pydantic models of `model_type`, as JSON, or as their JSON-compatible dump encoded by `codec`.
+    Args:
+        model_type (Type[BaseModel]): The model of the values
+        codec (Codec, optional): E.g. a `MsgpackCodec`. Defaults to the model JSON serialization.
+    """
+
+    def __init__(self, model_type: Type[TModel], codec: Optional[Codec] = None):
+        self.model_type = model_type
+        self.codec = codec
+
+    def encode(self, value: BaseModel) -> bytes:
+        if self.codec is None:
+            return value.model_dump_json().encode()
+        return self.codec.encode(value.model_dump(mode="json"))
+
+    def decode(self, data: bytes) -> TModel:
+        if self.codec is None:
+            return self.model_type.model_validate_json(data)
+        return self.model_type.model_validate(self.codec.decode(data))
+
+
+# Header byte of the values written by CompressedCodec
+_PLAIN = b"\x00"
+_ZLIB = b"\x01"
+
+
+class CompressedCodec(Codec):
+    """ Compresses the values encoded by `codec` with zlib when they are larger than `threshold` bytes.
+    Every value is prefixed with one byte telling whether it is compressed, so values written before
+    the threshold changed stay readable. Values written without this codec are not.
+    Args:
+        codec (Codec): Encodes the values before compression
+        threshold (int, optional): Minimum size in bytes of the values to compress. Defaults to 1024.
+        level (int, optional): zlib compression level, from 1 (fastest) to 9 (smallest). Defaults to 6.
+    """
+
+    def __init__(self, codec: Codec, threshold: int = 1024, level: int = 6):
+        self.codec = codec
+        self.threshold = threshold
+        self.level = level
+
+    def encode(self, value: Any) -> bytes:
+        data = self.codec.encode(value)
+        if len(data) >= self.threshold:
+            compressed = zlib.compress(data, self.level)
+            # Incompressible values are kept as they are
+            if len(compressed) < len(data):
+                return _ZLIB + compressed
+        return _PLAIN + data
+
+    def decode(self, data: bytes) -> Any:
+        header, body = data[:1], data[1:]
+        if header == _ZLIB:
+            return self.codec.decode(zlib.decompress(body))
+        if header == _PLAIN:
+            return self.codec.decode(body)
+        raise ValueError(f"Unknown compression header {header!r}")
+
+
+_field_codec = JsonCodec()
+
+
+def encode_hash_fields(values: Mapping[str, Any]) -> dict[str, bytes]:
+    """Encode JSON-compatible values as hash fields, one JSON value per field."""
+    return {name: _field_codec.encode(value) for name, value in values.items()}
+
+
+def model_to_hash(model: BaseModel) -> dict[str, bytes]:
+    """Return the fields of a Redis hash storing `model`, one per attribute."""
+    return encode_hash_fields(model.model_dump(mode="json"))
+
+
+def decode_hash_fields(mapping: Mapping[Any, Any]) -> dict[str, Any]:
+    """Decode fields read from a hash written with `encode_hash_fields`. None values (missing fields) are skipped."""
+    return {name.decode() if isinstance(name, bytes) else name: _field_codec.decode(value)
+            for name, value in mapping.items() if value is not None}
@@ -1,8 +1,10 @@
 from abc import ABC, abstractmethod
-from typing import Any, Optional, Type, TypeVar
+from typing import Any, ClassVar, Optional, Type, TypeVar
 
 from pydantic import BaseModel
 
+from rv16_lib.metrics import instrument
+
 
 class DatabaseElement(BaseModel):
     ...
@@ -10,7 +12,22 @@ class DatabaseElement(BaseModel):
 TConfig = TypeVar("TConfig", bound=DatabaseElement)
 
 class DatabaseConnector(ABC):
-    # ...
+    # Methods recorded by `rv16_lib.metrics` when metrics are enabled, in every subclass defining them
+    INSTRUMENTED_OPERATIONS: ClassVar[tuple[str, ...]] = ("insert_one", "insert_many", "delete", "delete_many",
+                                                          "delete_prefix", "update", "find", "find_many",
+                                                          "bulk_write", "execute_query", "insert_hash", "find_hash",
+                                                          "find_hash_fields", "update_hash_fields")
+    # Connection target of the instance in the metrics, e.g. "redis:6379/0"
+    metrics_target: str = ""
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for name in cls.INSTRUMENTED_OPERATIONS:
+            method = cls.__dict__.get(name)
+            if callable(method) and not getattr(method, "__isabstractmethod__", False) \
+                    and not getattr(method, "__rv16_instrumented__", False):
+                setattr(cls, name, instrument(cls.__name__, name, method))
+
     @abstractmethod
     def insert_one(self, *args, **kwargs) -> Any:
         raise NotImplementedError("Subclasses must implement this method")
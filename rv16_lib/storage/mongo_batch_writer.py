@@ -0,0 +1,367 @@
+"""
+Write-behind batching of MongoDB inserts.
+
+`MongoBatchWriter` accepts single elements from any thread (`submit`) or coroutine (`submit_async`)
+and a background thread writes them with unordered `insert_many` calls, one per batch. A batch is
+sent once it holds `max_batch_size` elements or its oldest element has waited `max_delay` seconds.
+
+Documents get their `_id` when submitted, so a batch retried after a network error cannot insert
+a document twice: on a retry, documents already written are rejected as duplicates of their own
+`_id` and counted as written. Elements still failing after `max_retries`, or rejected by the server
+(e.g. a unique index violation, or an `_id` that already existed before the first attempt), are
+handed to `on_error`. Elements that cannot be encoded to BSON are rejected by `submit` itself.
+
+Example:
+    with MongoBatchWriter(connector, "events") as writer:
+        for event in events:
+            writer.submit(event)   # blocks while the queue is full
+    # every submitted element is written (or reported as failed) when the block exits
+"""
+import asyncio
+import atexit
+import queue
+import threading
+import time
+import weakref
+from typing import Callable, Optional
+
+import bson
+from bson import ObjectId
+from bson.errors import InvalidDocument
+from pydantic import BaseModel
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from rv16_lib.exceptions import RV16Exception
+from rv16_lib.logger import logger
+from rv16_lib.metrics import metrics, NO_OPERATION
+from rv16_lib.storage.mongo_connector import MongoConnector
+from rv16_lib.storage.mongo_element import MongoElement
+
+# Server error code of a duplicate key
+_DUPLICATE_KEY = 11000
+# Seconds the writer thread waits on the queue before checking whether it is closed
+_POLL_INTERVAL = 0.1
+
+
+class BatchWriterSettings(BaseModel):
+    """Settings of a `MongoBatchWriter`.
+    Args:
+        max_batch_size: Number of elements sent by a single insert_many
+        max_delay: Seconds the oldest element of a batch waits before the batch is sent
+        max_queue_size: Number of elements waiting to be written before `submit` blocks
+        submit_timeout: Seconds `submit` blocks on a full queue before raising; None waits indefinitely
+        max_retries: Number of times a batch failing with a network or server error is sent again
+        retry_delay: Seconds before the first retry, doubled at each attempt
+    """
+    max_batch_size: int = 1000
+    max_delay: float = 0.05
+    max_queue_size: int = 10_000
+    submit_timeout: Optional[float] = None
+    max_retries: int = 3
+    retry_delay: float = 0.1
+
+
+class BatchWriterStats(BaseModel):
+    """Counters of a `MongoBatchWriter`.
+    Args:
+        submitted: Elements accepted by submit
+        written: Elements inserted
+        failed: Elements handed to on_error
+        batches: insert_many calls, retries included
+        retries: Batches sent again after an error
+    """
+    submitted: int = 0
+    written: int = 0
+    failed: int = 0
+    batches: int = 0
+    retries: int = 0
+
+
+# Writers flushed at interpreter exit, if not closed before
+_open_writers: "weakref.WeakSet[MongoBatchWriter]" = weakref.WeakSet()
+
+
+class MongoBatchWriter:
+    """ Buffers elements and inserts them in batches from a background thread.
+    Args:
+        connector (MongoConnector): The connector whose database is written to
+        collection_name (str, optional): The collection. Defaults to the `collection_name` of the elements.
+        settings (BatchWriterSettings, optional): Batching, backpressure and retry settings
+        on_error (Callable, optional): Called from the writer thread with the elements that could not
+            be written and the error. Defaults to logging them.
+    """
+
+    def __init__(self, connector: MongoConnector, collection_name: Optional[str] = None,
+                 settings: Optional[BatchWriterSettings] = None,
+                 on_error: Optional[Callable[[list[MongoElement], Exception], None]] = None):
+        self.connector = connector
+        self.collection_name = collection_name
+        self.settings = settings or BatchWriterSettings()
+        self.on_error = on_error or self._log_error
+        self._queue: queue.Queue = queue.Queue(maxsize=self.settings.max_queue_size)
+        self._stats = BatchWriterStats()
+        self._stats_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.start()
+
+    def start(self) -> "MongoBatchWriter":
+        """Start the writer thread. Called by the constructor."""
+        if self._thread is None or not self._thread.is_alive():
+            self._closed.clear()
+            self._thread = threading.Thread(target=self._run, name="mongo-batch-writer", daemon=True)
+            self._thread.start()
+            _open_writers.add(self)
+        return self
+
+    def submit(self, element: MongoElement, timeout: Optional[float] = None):
+        """Queue an element, blocking while the queue is full.
+        Args:
+            element (MongoElement): The element to insert. Its `id` is generated if not set.
+            timeout (float, optional): Seconds to wait for room in the queue. Defaults to `submit_timeout`.
+
+        Raises:
+            RV16Exception: 503 if the queue stayed full, 500 if the writer is closed,
+                400 if the element cannot be encoded to BSON
+        """
+        item = self._prepare(element)
+        try:
+            self._queue.put(item, timeout=self.settings.submit_timeout if timeout is None else timeout)
+        except queue.Full:
+            raise RV16Exception(status_code=503, message="MongoDB batch writer queue is full")
+        self._check_not_closed(item)
+        self._count(submitted=1)
+
+    async def submit_async(self, element: MongoElement, timeout: Optional[float] = None):
+        """Queue an element from a coroutine, waiting without blocking the event loop while the queue is full.
+        See `submit`.
+        """
+        item = self._prepare(element)
+        timeout = self.settings.submit_timeout if timeout is None else timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        pause = min(self.settings.max_delay, 0.01) or 0.001
+        while True:
+            try:
+                self._queue.put_nowait(item)
+                break
+            except queue.Full:
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise RV16Exception(status_code=503, message="MongoDB batch writer queue is full")
+                await asyncio.sleep(pause)
+        self._check_not_closed(item)
+        self._count(submitted=1)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every element submitted so far is written or reported as failed.
+        Returns False if `timeout` seconds passed first.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def close(self, timeout: Optional[float] = None):
+        """Write every queued element, then stop the writer thread. Further submits raise."""
+        self._closed.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                logger.warning("MongoDB batch writer closed with %s elements still queued", self._queue.qsize())
+                _open_writers.discard(self)
+                return
+            self._thread = None
+        # Elements queued by a submit racing with close() were not taken by the writer thread
+        self._fail_queued()
+        _open_writers.discard(self)
+
+    def stats(self) -> BatchWriterStats:
+        """Return a copy of the counters."""
+        with self._stats_lock:
+            return self._stats.model_copy()
+
+    def __enter__(self) -> "MongoBatchWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def _prepare(self, element: MongoElement) -> tuple[MongoElement, dict]:
+        if self._closed.is_set():
+            raise RV16Exception(status_code=500, message="MongoDB batch writer is closed")
+        document = element.model_dump()
+        # A client-side _id makes the retries idempotent
+        document["_id"] = element.id or ObjectId()
+        try:
+            # Fail the caller now rather than the whole batch in the writer thread
+            bson.encode(document)
+        except (InvalidDocument, TypeError, OverflowError) as e:
+            raise RV16Exception(status_code=400, message=f"Element cannot be encoded to BSON: {e}")
+        if element.id is None:
+            # Let the caller know the id of what it submitted
+            element.id = document["_id"]
+        return element, document
+
+    def _check_not_closed(self, item: tuple[MongoElement, dict]):
+        """Fail the submit of `item` if close() ran between `_prepare` and the put, and the writer thread
+        stopped without taking it.
+        """
+        if not self._closed.is_set():
+            return
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            # The thread stops once the queue is empty: wait for it to either take the item or stop
+            thread.join(self.settings.submit_timeout)
+            if thread.is_alive():
+                return
+        if any(queued is item for queued in self._fail_queued(item)):
+            raise RV16Exception(status_code=500, message="MongoDB batch writer is closed")
+
+    def _fail_queued(self, own: Optional[tuple[MongoElement, dict]] = None) -> list[tuple[MongoElement, dict]]:
+        """Remove the elements left in the queue after the writer thread stopped, and report them as failed.
+        `own`, the item of the calling submit, is left to the caller. Returns the removed items.
+        """
+        items = []
+        while True:
+            try:
+                items.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        others = [item for item in items if item is not own]
+        if others:
+            self._fail(others, RV16Exception(status_code=500, message="MongoDB batch writer is closed"))
+        for _ in items:
+            self._queue.task_done()
+        return items
+
+    def _count(self, **deltas: int):
+        with self._stats_lock:
+            for name, delta in deltas.items():
+                setattr(self._stats, name, getattr(self._stats, name) + delta)
+
+    def _run(self):
+        while True:
+            try:
+                first = self._queue.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                if self._closed.is_set():
+                    return
+                continue
+
+            batch = [first]
+            deadline = time.monotonic() + self.settings.max_delay
+            while len(batch) < self.settings.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining > 0 and not self._closed.is_set():
+                        # Wake up regularly, so that close() does not wait for max_delay
+                        batch.append(self._queue.get(timeout=min(remaining, _POLL_INTERVAL)))
+                    else:
+                        batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    if remaining <= _POLL_INTERVAL or self._closed.is_set():
+                        break
+
+            try:
+                self._write(batch)
+            except Exception as e:
+                # Never let the writer thread die with elements still queued
+                logger.error("Unexpected error in the MongoDB batch writer: %s", e)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write(self, batch: list[tuple[MongoElement, dict]]):
+        collection_name = self.collection_name or batch[0][0].collection_name
+        if not collection_name:
+            self._fail(batch, ValueError("Collection name must be provided for MongoDB insert operation."))
+            return
+
+        collection = self.connector.db[collection_name]
+        pending = batch
+        for attempt in range(self.settings.max_retries + 1):
+            if attempt:
+                self._count(retries=1)
+                time.sleep(self.settings.retry_delay * 2 ** (attempt - 1))
+            self._count(batches=1)
+            try:
+                with (metrics.operation("MongoBatchWriter", "insert_many", self.connector.metrics_target)
+                      if metrics.enabled else NO_OPERATION) as op:
+                    if metrics.enabled:
+                        op.payload = len(pending)
+                    collection.insert_many([document for _, document in pending], ordered=False)
+                self._count(written=len(pending))
+                return
+            except BulkWriteError as e:
+                pending, error = self._bulk_failures(pending, e, attempt)
+                if not pending:
+                    return
+            except PyMongoError as e:
+                error = e
+                logger.warning("MongoDB batch insert of %s elements into %s failed (attempt %s): %s",
+                               len(pending), collection_name, attempt + 1, e)
+            except Exception as e:
+                # Not a server or network error: sending the batch again would fail the same way
+                self._fail(pending, e)
+                return
+        self._fail(pending, error)
+
+    def _bulk_failures(self, pending: list[tuple[MongoElement, dict]], error: BulkWriteError,
+                       attempt: int) -> tuple[list[tuple[MongoElement, dict]], Exception]:
+        """Sort the failed documents of an unordered insert_many: returns those to retry.
+        From the second attempt on, every pending document was sent before.
+        """
+        failed_at = {}
+        for write_error in error.details.get("writeErrors", []):
+            failed_at[write_error["index"]] = write_error
+
+        retry, rejected, written = [], [], 0
+        for index, item in enumerate(pending):
+            write_error = failed_at.get(index)
+            if write_error is None:
+                written += 1
+            elif attempt and _is_id_duplicate(write_error):
+                # Written by a previous attempt of this batch
+                written += 1
+            elif write_error.get("code") == _DUPLICATE_KEY:
+                rejected.append(item)
+            else:
+                retry.append(item)
+
+        self._count(written=written)
+        if rejected:
+            self._fail(rejected, error)
+        return retry, error
+
+    def _fail(self, items: list[tuple[MongoElement, dict]], error: Exception):
+        self._count(failed=len(items))
+        try:
+            self.on_error([element for element, _ in items], error)
+        except Exception as e:
+            logger.error("MongoDB batch writer error handler failed: %s", e)
+
+    @staticmethod
+    def _log_error(elements: list[MongoElement], error: Exception):
+        logger.error("Failed to write %s elements: %s", len(elements), error)
+
+
+def _is_id_duplicate(write_error: dict) -> bool:
+    """Whether a write error is a duplicate of the `_id` of the document."""
+    if write_error.get("code") != _DUPLICATE_KEY:
+        return False
+    if "keyPattern" in write_error:
+        return list(write_error["keyPattern"]) == ["_id"]
+    # Servers before 4.4 only name the index in the message
+    return " index: _id_ " in write_error.get("errmsg", "")
+
+
+def _close_open_writers():
+    for writer in list(_open_writers):
+        writer.close()
+
+
+atexit.register(_close_open_writers)
@@ -0,0 +1,151 @@
+from typing import Any, Optional, Union, Sequence, Iterator
+
+from bson import ObjectId
+from pydantic import BaseModel, ConfigDict
+from pymongo import InsertOne, UpdateOne, UpdateMany, DeleteOne, DeleteMany
+from pymongo.errors import BulkWriteError
+from pymongo.results import BulkWriteResult
+
+from rv16_lib.storage.mongo_element import MongoElement
+
+# Number of operations sent in a single bulk_write call
+DEFAULT_BULK_CHUNK_SIZE = 1000
+
+# Fields that identify a document and must never be part of a $set
+_IDENTITY_FIELDS = ("_id", "id")
+
+
+class MongoInsert(BaseModel):
+    """Insert a new document.
+    Args:
+        element: The element to insert
+    """
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+    element: MongoElement
+
+
+class MongoUpsert(BaseModel):
+    """Update the document matching the key fields of the element, inserting it if it does not exist.
+    Args:
+        element: The element to write
+        key_fields: The fields of the element identifying the document
+        partial: If True, only the fields explicitly set on the element are written
+    """
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+    element: MongoElement
+    key_fields: list[str]
+    partial: bool = False
+
+
+class MongoUpdate(BaseModel):
+    """Update the document(s) matching a query.
+    Args:
+        query: The filter
+        element: The element holding the new values
+        partial: If True, only the fields explicitly set on the element are written
+        many: If True, update every matching document instead of the first one
+    """
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+    query: dict
+    element: MongoElement
+    partial: bool = False
+    many: bool = False
+
+
+class MongoDelete(BaseModel):
+    """Delete the document(s) matching a query.
+    Args:
+        query: The filter
+        many: If True, delete every matching document instead of the first one
+    """
+    query: dict
+    many: bool = False
+
+
+MongoOperation = Union[MongoInsert, MongoUpsert, MongoUpdate, MongoDelete]
+
+
+class BulkOperationResult(BaseModel):
+    """Outcome of a single operation of a bulk write.
+    Args:
+        index: Position of the operation in the submitted list
+        ok: Whether the operation succeeded
+        inserted_id: The id of the inserted document (inserts only)
+        upserted_id: The id of the document created by an upsert, if one was created
+        error: The server error message, if the operation failed
+    """
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+    index: int
+    ok: bool = True
+    inserted_id: Optional[ObjectId] = None
+    upserted_id: Optional[Any] = None
+    error: Optional[str] = None
+
+
+def set_document(element: MongoElement, partial: bool) -> dict:
+    """Build the $set document of an element, without its identity fields."""
+    data = element.model_dump(exclude_unset=partial)
+    for field in _IDENTITY_FIELDS:
+        data.pop(field, None)
+    return data
+
+
+def to_request(operation: MongoOperation) -> tuple[Union[InsertOne, UpdateOne, UpdateMany, DeleteOne, DeleteMany], Optional[dict]]:
+    """Convert an operation to its pymongo request, together with the inserted document (inserts only)."""
+    if isinstance(operation, MongoInsert):
+        document = operation.element.model_dump()
+        return InsertOne(document), document
+    if isinstance(operation, MongoUpsert):
+        data = operation.element.model_dump()
+        missing = [field for field in operation.key_fields if field not in data]
+        if missing:
+            raise ValueError(f"Upsert key fields {missing} are not fields of {type(operation.element).__name__}.")
+        key = {field: data[field] for field in operation.key_fields}
+        return UpdateOne(key, {"$set": set_document(operation.element, operation.partial)}, upsert=True), None
+    if isinstance(operation, MongoUpdate):
+        update_type = UpdateMany if operation.many else UpdateOne
+        return update_type(operation.query, {"$set": set_document(operation.element, operation.partial)}), None
+    if isinstance(operation, MongoDelete):
+        return (DeleteMany(operation.query) if operation.many else DeleteOne(operation.query)), None
+    raise TypeError(f"Unsupported bulk operation: {type(operation).__name__}")
+
+
+def collection_of(operations: Sequence[MongoOperation]) -> Optional[str]:
+    """Return the `collection_name` declared by the element of the first operation holding one."""
+    for operation in operations:
+        element = getattr(operation, "element", None)
+        if element is not None and element.collection_name:
+            return element.collection_name
+    return None
+
+
+def chunked(operations: Sequence[Any], size: int) -> Iterator[tuple[int, Sequence[Any]]]:
+    """Yield (offset, chunk) pairs of at most `size` items."""
+    for start in range(0, len(operations), size):
+        yield start, operations[start:start + size]
+
+
+def chunk_results(offset: int, documents: list[Optional[dict]], result: Optional[BulkWriteResult],
+                  error: Optional[BulkWriteError]) -> list[BulkOperationResult]:
+    """Build the per-operation results of a bulk_write chunk from its result or its error.
+    `documents` holds the inserted document of each insert of the chunk, and None for other operations.
+    """
+    results = [BulkOperationResult(index=offset + i) for i in range(len(documents))]
+
+    if error is not None:
+        details = error.details or {}
+        upserted = {item["index"]: item["_id"] for item in details.get("upserted", [])}
+        for write_error in details.get("writeErrors", []):
+            item = results[write_error["index"]]
+            item.ok = False
+            item.error = write_error.get("errmsg")
+    else:
+        upserted = result.upserted_ids or {}
+
+    for i, document in enumerate(documents):
+        if i in upserted:
+            results[i].upserted_id = upserted[i]
+        if document is not None and results[i].ok:
+            # The driver assigns the _id of inserted documents client-side
+            results[i].inserted_id = document.get("_id")
+    return results
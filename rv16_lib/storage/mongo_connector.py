@@ -1,40 +1,58 @@
-from typing import Any, Optional, Type
+from typing import Any, Optional, Type, Iterator, Union, Sequence
 
 from bson import ObjectId
-from pydantic import Field, ConfigDict, model_validator
-from pymongo import MongoClient
+from pymongo import MongoClient, ASCENDING
+from pymongo.errors import BulkWriteError
 
 from rv16_lib import logger
 from rv16_lib.storage.database_connector import DatabaseConnector, DatabaseElement, TConfig
+from rv16_lib.storage.mongo_bulk import MongoOperation, BulkOperationResult, DEFAULT_BULK_CHUNK_SIZE, to_request, \
+    chunked, chunk_results, collection_of
+from rv16_lib.storage.mongo_element import MongoElement, ReadMode, decode_document, decode_documents
+from rv16_lib.storage.mongo_indexes import ensure_indexes
+from rv16_lib.storage.mongo_pool import pool_listeners
+from rv16_lib.storage.mongo_profiler import QueryProfiler, NO_PROFILE
 
 
-class MongoElement(DatabaseElement):
-    model_config = ConfigDict(arbitrary_types_allowed=True)
-    id: Optional[ObjectId] = Field(alias="_id", default=None)
-
-    def model_dump(self, **kwargs):
-        data = super().model_dump(**kwargs)
-        if self.id:
-            data["id"] = str(self.id)
-        return data
-
-    @model_validator(mode='before')
-    def preprocess_id(cls, data: Any):
-        if isinstance(data, dict):
-            if 'id' in data and isinstance(data["id"], str):
-                data['_id'] = ObjectId(data["id"])
-        return data
-
 class MongoConnector(DatabaseConnector):
 
-    def __init__(self, host: str, port: int, db_name: str):
-        self.client: MongoClient = MongoClient(f'mongodb://{host}:{port}/')
+    def __init__(self, host: str, port: int, db_name: str, client: Optional[MongoClient] = None, ping: bool = True,
+                 elements: Sequence[Type[MongoElement]] = (), profiler: Optional[QueryProfiler] = None,
+                 create_indexes: bool = True):
+        """
+        Args:
+            client (MongoClient, optional): A shared client to use instead of creating one,
+                e.g. from `rv16_lib.storage.registry`
+            ping (bool, optional): Check the connection before returning. Defaults to True.
+            elements (Sequence[Type[MongoElement]], optional): Elements whose declared indexes are
+                created, if missing, before returning
+            profiler (QueryProfiler, optional): Logs the slow queries and the collection scans
+            create_indexes (bool, optional): Create the indexes of `elements` before returning. If False,
+                they are created by a later call to `ensure_indexes`. Defaults to True.
+        """
+        self.elements = tuple(elements)
+        self.profiler = profiler
+        self.client: MongoClient = client or MongoClient(f'mongodb://{host}:{port}/',
+                                                         event_listeners=pool_listeners(type(self).__name__,
+                                                                                        f"{host}:{port}"))
         self.db = self.client[db_name]
+        self.metrics_target = f"{host}:{port}/{db_name}"
 
-        self.db.command('ping')
-        logger.info("Connected to MongoDB successfully.")
+        if ping:
+            self.db.command('ping')
+            logger.info("Connected to MongoDB successfully.")
+        if self.elements and create_indexes:
+            self.ensure_indexes()
+
+    def ensure_indexes(self, elements: Optional[Sequence[Type[MongoElement]]] = None) -> dict[str, list[str]]:
+        """Create the indexes declared by `elements` (defaults to the connector elements) if they do not exist."""
+        return ensure_indexes(self.db, self.elements if elements is None else elements)
+
+    def _profile(self, collection, operation: str, query: dict):
+        return NO_PROFILE if self.profiler is None else self.profiler.profile(collection, operation, query)
 
     def insert_one(self, element: MongoElement, collection_name: Optional[str] = None) -> ObjectId:
+        collection_name = collection_name or element.collection_name
         if not collection_name:
             raise ValueError("Collection name must be provided for MongoDB insert operation.")
 
@@ -43,42 +61,173 @@ class MongoConnector(DatabaseConnector):
         return result.inserted_id
 
 
-    def insert_many(self, elements: list[MongoElement], collection_name: Optional[str] = None) -> list[ObjectId]:
+    def insert_many(self, elements: list[MongoElement], collection_name: Optional[str] = None,
+                    ordered: bool = True, chunk_size: Optional[int] = None) -> list[ObjectId]:
+        collection_name = collection_name or (elements[0].collection_name if elements else None)
         if not collection_name:
             raise ValueError("Collection name must be provided for MongoDB insert operation.")
 
         collection = self.db[collection_name]
         docs = [element.model_dump() for element in elements]
-        result = collection.insert_many(docs)
-        return result.inserted_ids
+        inserted_ids = []
+        for _, chunk in chunked(docs, chunk_size or len(docs) or 1):
+            result = collection.insert_many(chunk, ordered=ordered)
+            inserted_ids.extend(result.inserted_ids)
+        return inserted_ids
 
 
-    def delete(self, query: dict, collection_name: Optional[str] = None) -> int:
+    def delete(self, query: dict, collection_name: Optional[str] = None,
+               model_type: Optional[Type[MongoElement]] = None) -> int:
+        collection_name = collection_name or (model_type.collection_name if model_type else None)
         if not collection_name:
             raise ValueError("Collection name must be provided for MongoDB insert operation.")
 
         collection = self.db[collection_name]
-        result = collection.delete_many(query)
+        with self._profile(collection, "delete", query):
+            result = collection.delete_many(query)
         return result.deleted_count
 
 
-    def update(self, query: dict, element: MongoElement, collection_name: Optional[str] = None) -> int:
+    def update(self, query: dict, element: MongoElement, collection_name: Optional[str] = None, partial: bool = False) -> int:
+        collection_name = collection_name or element.collection_name
         if not collection_name:
             raise ValueError("Collection name must be provided for MongoDB insert operation.")
 
         collection = self.db[collection_name]
 
-        data = {"$set": element.model_dump()}
-        result = collection.update_many(query, data)
+        # With partial=True only the fields explicitly set on the element are sent
+        data = {"$set": element.model_dump(exclude_unset=partial)}
+        with self._profile(collection, "update", query):
+            result = collection.update_many(query, data)
         return result.modified_count
 
 
-    def find(self, query: dict, collection_name: Optional[str] = None, model_type: Optional[Type[MongoElement]] = None) -> list[MongoElement]:
+    def find(self, query: dict, collection_name: Optional[str] = None, model_type: Optional[Type[MongoElement]] = None,
+             read_mode: ReadMode = ReadMode.VALIDATE) -> list[MongoElement]:
+        collection_name = collection_name or (model_type.collection_name if model_type else None)
         if not collection_name:
             raise ValueError("Collection name must be provided for MongoDB insert operation.")
 
-        result = self.db[collection_name].find(query)
-        if not result:
-            return []
+        collection = self.db[collection_name]
+        with self._profile(collection, "find", query):
+            # The query runs while the cursor is consumed
+            result = collection.find(query)
+            if not result:
+                return []
+            return decode_documents(result, model_type, read_mode) if model_type else list(result)
+
+
+    def bulk_write(self, operations: list[MongoOperation], collection_name: Optional[str] = None,
+                   chunk_size: int = DEFAULT_BULK_CHUNK_SIZE) -> list[BulkOperationResult]:
+        """Run mixed inserts, upserts, updates and deletes as unordered bulk writes.
+        Args:
+            operations (list[MongoOperation]): The operations to run
+            collection_name (str): The collection to write to
+            chunk_size (int, optional): Number of operations per bulk_write call. Defaults to 1000.
+
+        Returns:
+            list[BulkOperationResult]: One result per operation, in the order of `operations`.
+                Failed operations are reported there instead of raising.
+
+        Raises:
+            ValueError, TypeError: If an operation is invalid, before anything is written
+        """
+        collection_name = collection_name or collection_of(operations)
+        if not collection_name:
+            raise ValueError("Collection name must be provided for MongoDB bulk write operation.")
 
-        return [model_type(**r) for r in result] if model_type else list(result)
+        collection = self.db[collection_name]
+        # Invalid operations raise here, before any chunk is written
+        prepared = [to_request(operation) for operation in operations]
+        results: list[BulkOperationResult] = []
+        for offset, chunk in chunked(prepared, chunk_size):
+            requests, documents = zip(*chunk)
+            try:
+                result, error = collection.bulk_write(list(requests), ordered=False), None
+            except BulkWriteError as e:
+                result, error = None, e
+            results.extend(chunk_results(offset, list(documents), result, error))
+
+        failed = sum(1 for r in results if not r.ok)
+        if failed:
+            logger.warning("Bulk write on %s: %s/%s operations failed", collection_name, failed, len(results))
+        return results
+
+
+    def find_stream(self, query: dict, collection_name: Optional[str] = None, model_type: Optional[Type[MongoElement]] = None,
+                    batch_size: int = 1000, projection: Optional[dict] = None, sort: Optional[list[tuple[str, int]]] = None,
+                    limit: int = 0, after: Any = None, page_size: Optional[int] = None, key_field: str = "_id",
+                    chunk_size: Optional[int] = None, read_mode: ReadMode = ReadMode.VALIDATE) -> Iterator[Union[dict, MongoElement, list]]:
+        """Lazily iterate over the documents matching `query`, holding at most one batch in memory.
+        Args:
+            query (dict): The filter
+            collection_name (str): The collection to read from
+            model_type (Type[MongoElement], optional): Validate each document into this model. Yields raw dicts if None.
+            batch_size (int, optional): Number of documents per cursor batch. Defaults to 1000.
+            projection (dict, optional): Fields to return. Must include `key_field` when paginating.
+            sort (list[tuple[str, int]], optional): Sort specification. Not allowed when paginating.
+            limit (int, optional): Maximum number of documents, 0 for no limit. Defaults to 0.
+            after (Any, optional): Keyset pagination: only return documents whose `key_field` is greater than this value
+            page_size (int, optional): Keyset pagination: read `page_size` documents per query, resuming after the
+                last key, instead of keeping one cursor open for the whole iteration
+            key_field (str, optional): The unique, indexed field used for keyset pagination. Defaults to "_id".
+            chunk_size (int, optional): Yield lists of up to `chunk_size` items instead of single items
+            read_mode (ReadMode, optional): How documents are turned into `model_type`. Batch validation
+                applies to whole chunks. Defaults to ReadMode.VALIDATE.
+
+        Returns:
+            Iterator[Union[dict, MongoElement, list]]: The documents, models, or chunks of them
+        """
+        collection_name = collection_name or (model_type.collection_name if model_type else None)
+        if not collection_name:
+            raise ValueError("Collection name must be provided for MongoDB find operation.")
+        paginated = after is not None or page_size is not None
+        if paginated and sort:
+            raise ValueError("Keyset pagination sorts by key_field, a custom sort cannot be used.")
+
+        collection = self.db[collection_name]
+        if paginated:
+            documents = self._find_pages(collection, query, projection, limit, batch_size, after, page_size, key_field)
+        else:
+            documents = collection.find(query, projection, sort=sort, limit=limit, batch_size=batch_size)
+
+        if chunk_size:
+            chunks = _chunks(documents, chunk_size)
+            return (decode_documents(c, model_type, read_mode) for c in chunks) if model_type else chunks
+        return (decode_document(d, model_type, read_mode) for d in documents) if model_type else iter(documents)
+
+    @staticmethod
+    def _find_pages(collection, query: dict, projection: Optional[dict], limit: int, batch_size: int,
+                    after: Any, page_size: Optional[int], key_field: str) -> Iterator[dict]:
+        last = after
+        remaining = limit
+        while True:
+            page_limit = page_size or 0
+            if remaining:
+                page_limit = min(page_limit, remaining) if page_limit else remaining
+
+            page_query = query if last is None else {"$and": [query, {key_field: {"$gt": last}}]}
+            count = 0
+            for document in collection.find(page_query, projection, sort=[(key_field, ASCENDING)],
+                                            limit=page_limit, batch_size=batch_size):
+                last = document[key_field]
+                count += 1
+                yield document
+
+            if remaining:
+                remaining -= count
+                if remaining <= 0:
+                    return
+            if not page_size or count < page_limit:
+                return
+
+
+def _chunks(items: Iterator[Any], size: int) -> Iterator[list]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
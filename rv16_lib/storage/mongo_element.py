@@ -0,0 +1,147 @@
+import enum
+import functools
+from typing import Any, ClassVar, Optional, Iterable, Type, TypeVar, Union
+
+from bson import ObjectId
+from pydantic import BaseModel, Field, ConfigDict, TypeAdapter, model_validator
+from pymongo import IndexModel
+
+from rv16_lib.storage.database_connector import DatabaseElement
+
+
+class MongoIndex(BaseModel):
+    """An index of the collection of a `MongoElement`.
+    Args:
+        keys: (field, direction) pairs, e.g. [("tenant", 1), ("created_at", -1)] for a compound index.
+            The direction can also be "text", "hashed" or "2dsphere".
+        name: Defaults to MongoDB's name, e.g. "tenant_1_created_at_-1"
+        unique: Reject documents with duplicate keys
+        sparse: Skip documents without the indexed fields
+        expire_after_seconds: TTL index: delete documents this long after the date of the (single) field
+        partial_filter: Only index the documents matching this filter
+    """
+    keys: list[tuple[str, Union[int, str]]]
+    name: Optional[str] = None
+    unique: bool = False
+    sparse: bool = False
+    expire_after_seconds: Optional[int] = None
+    partial_filter: Optional[dict] = None
+
+    def to_index_model(self) -> IndexModel:
+        options: dict[str, Any] = {}
+        if self.name:
+            options["name"] = self.name
+        if self.unique:
+            options["unique"] = True
+        if self.sparse:
+            options["sparse"] = True
+        if self.expire_after_seconds is not None:
+            options["expireAfterSeconds"] = self.expire_after_seconds
+        if self.partial_filter is not None:
+            options["partialFilterExpression"] = self.partial_filter
+        return IndexModel(self.keys, **options)
+
+
+class MongoElement(DatabaseElement):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+    id: Optional[ObjectId] = Field(alias="_id", default=None)
+
+    # Collection of the elements, used by the connectors when no collection name is given
+    collection_name: ClassVar[Optional[str]] = None
+    # Indexes created by `ensure_indexes` when a connector starts
+    indexes: ClassVar[tuple[MongoIndex, ...]] = ()
+
+    def model_dump(self, **kwargs):
+        data = super().model_dump(**kwargs)
+        if self.id:
+            data["id"] = str(self.id)
+        return data
+
+    @model_validator(mode='before')
+    def preprocess_id(cls, data: Any):
+        if isinstance(data, dict):
+            if 'id' in data and isinstance(data["id"], str):
+                data['_id'] = ObjectId(data["id"])
+        return data
+
+
+TElement = TypeVar("TElement", bound=MongoElement)
+
+
+class ReadMode(str, enum.Enum):
+    """How documents read from MongoDB are turned into models.
+    VALIDATE: validate each document on its own with `model_validate` (default)
+    BATCH: validate whole batches at once through a cached list TypeAdapter
+    TRUSTED: build models without validation. Only for collections written through the same model.
+    """
+    VALIDATE = "validate"
+    BATCH = "batch"
+    TRUSTED = "trusted"
+
+
+@functools.lru_cache(maxsize=None)
+def list_adapter(model_type: Type[TElement]) -> TypeAdapter:
+    """Return the cached TypeAdapter validating a list of `model_type`."""
+    return TypeAdapter(list[model_type])
+
+
+@functools.lru_cache(maxsize=None)
+def _trusted_layout(model_type: Type[TElement]) -> Optional[tuple]:
+    """Precompute the alias renames and optional fields of a model, or None if it needs `model_construct`."""
+    if model_type.__pydantic_post_init__ or model_type.__private_attributes__ or model_type.model_config.get("extra") == "allow":
+        return None
+    fields = model_type.model_fields
+    renames = tuple((field.alias, name) for name, field in fields.items() if field.alias and field.alias != name)
+    optional = tuple((name, field) for name, field in fields.items() if not field.is_required())
+    return renames, frozenset(fields), optional
+
+
+def construct_trusted(model_type: Type[TElement], document: dict) -> TElement:
+    """Build a model from a trusted document without validation.
+    Equivalent to `model_construct`, which is slower than validation on wide models,
+    with the alias and default handling precomputed once per model type.
+    """
+    stored_id = document.get("id")
+    if isinstance(stored_id, str):
+        # Same precedence as `MongoElement.preprocess_id`: a stored "id" wins over "_id"
+        document = {**document, "_id": ObjectId(stored_id)}
+
+    layout = _trusted_layout(model_type)
+    if layout is None:
+        return model_type.model_construct(**document)
+
+    renames, names, optional = layout
+    values = dict(document)
+    for alias, name in renames:
+        if alias in values:
+            values[name] = values.pop(alias)
+    if not names.issuperset(values):
+        for key in values.keys() - names:
+            del values[key]
+
+    fields_set = set(values)
+    if len(values) != len(names):
+        for name, field in optional:
+            if name not in values:
+                values[name] = field.get_default(call_default_factory=True, validated_data=values)
+
+    element = model_type.__new__(model_type)
+    object.__setattr__(element, "__dict__", values)
+    object.__setattr__(element, "__pydantic_fields_set__", fields_set)
+    object.__setattr__(element, "__pydantic_extra__", None)
+    object.__setattr__(element, "__pydantic_private__", None)
+    return element
+
+
+def decode_document(document: dict, model_type: Type[TElement], read_mode: ReadMode = ReadMode.VALIDATE) -> TElement:
+    if read_mode is ReadMode.TRUSTED:
+        return construct_trusted(model_type, document)
+    return model_type.model_validate(document)
+
+
+def decode_documents(documents: Iterable[dict], model_type: Type[TElement], read_mode: ReadMode = ReadMode.VALIDATE) -> list[TElement]:
+    if read_mode is ReadMode.TRUSTED:
+        return [construct_trusted(model_type, document) for document in documents]
+    if read_mode is ReadMode.BATCH:
+        return list_adapter(model_type).validate_python(list(documents))
+    return [model_type.model_validate(document) for document in documents]
@@ -0,0 +1,74 @@
+"""
+Creation of the indexes declared by `MongoElement` subclasses.
+
+`createIndexes` is idempotent: an index already existing with the same keys and options is left
+untouched, so the declared indexes can be ensured every time a connector starts. An existing index
+with the same name or keys but different options is not replaced: the conflict is reported and the
+index must be migrated by hand.
+"""
+from typing import Iterable, Type
+
+from pymongo.errors import OperationFailure
+
+from rv16_lib.exceptions import RV16Exception
+from rv16_lib.logger import logger
+from rv16_lib.storage.mongo_element import MongoElement
+
+
+def _declared(element_types: Iterable[Type[MongoElement]]) -> dict[str, list]:
+    """Group the declared indexes by collection."""
+    indexes: dict[str, list] = {}
+    for element_type in element_types:
+        if not element_type.indexes:
+            continue
+        if not element_type.collection_name:
+            raise ValueError(f"{element_type.__name__} declares indexes but no collection_name.")
+        indexes.setdefault(element_type.collection_name, []).extend(i.to_index_model()
+                                                                    for i in element_type.indexes)
+    return indexes
+
+
+def _failed(failures: list[str]):
+    if failures:
+        raise RV16Exception(status_code=500,
+                            message=f"Failed to create indexes: {'; '.join(failures)}")
+
+
+def ensure_indexes(db, element_types: Iterable[Type[MongoElement]]) -> dict[str, list[str]]:
+    """Create the indexes declared by `element_types` in the database `db`, if they do not exist.
+    Args:
+        db (pymongo.database.Database): The database
+        element_types (Iterable[Type[MongoElement]]): Elements declaring `collection_name` and `indexes`
+
+    Returns:
+        dict[str, list[str]]: The names of the indexes of each collection
+
+    Raises:
+        RV16Exception: If some indexes conflict with existing ones, after the others were created
+    """
+    created: dict[str, list[str]] = {}
+    failures: list[str] = []
+    for collection_name, models in _declared(element_types).items():
+        try:
+            created[collection_name] = db[collection_name].create_indexes(models)
+        except OperationFailure as e:
+            logger.error("Failed to create the indexes of %s: %s", collection_name, e)
+            failures.append(f"{collection_name}: {e}")
+    _failed(failures)
+    logger.debug("Ensured indexes %s", created)
+    return created
+
+
+async def ensure_indexes_async(db, element_types: Iterable[Type[MongoElement]]) -> dict[str, list[str]]:
+    """Asyncio counterpart of `ensure_indexes`, for a database of an `AsyncMongoClient`."""
+    created: dict[str, list[str]] = {}
+    failures: list[str] = []
+    for collection_name, models in _declared(element_types).items():
+        try:
+            created[collection_name] = await db[collection_name].create_indexes(models)
+        except OperationFailure as e:
+            logger.error("Failed to create the indexes of %s: %s", collection_name, e)
+            failures.append(f"{collection_name}: {e}")
+    _failed(failures)
+    logger.debug("Ensured indexes %s", created)
+    return created
@@ -0,0 +1,72 @@
+"""
+Connection pool usage of the MongoDB clients, exported through `rv16_lib.metrics`.
+
+PyMongo does not expose its pools, so their usage is tracked with a pool event listener. The
+listener must be given to the client at creation, and is only added when metrics are enabled.
+"""
+import threading
+
+from pymongo import monitoring
+
+from rv16_lib.metrics import metrics
+
+
+class MongoPoolUsage(monitoring.ConnectionPoolListener):
+    """ Counts the open and checked-out connections of a client, over all its servers."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.open = 0
+        self.in_use = 0
+
+    def usage(self) -> dict[str, float]:
+        return {"in_use": self.in_use, "idle": self.open - self.in_use}
+
+    def _add(self, open_delta: int = 0, in_use_delta: int = 0):
+        with self._lock:
+            self.open += open_delta
+            self.in_use += in_use_delta
+
+    def connection_created(self, event):
+        self._add(open_delta=1)
+
+    def connection_closed(self, event):
+        self._add(open_delta=-1)
+
+    def connection_checked_out(self, event):
+        self._add(in_use_delta=1)
+
+    def connection_checked_in(self, event):
+        self._add(in_use_delta=-1)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        pass
+
+
+def pool_listeners(component: str, target: str) -> list[monitoring.ConnectionPoolListener]:
+    """Return the event listeners to pass to a new client: a `MongoPoolUsage` registered in the
+    metrics when they are enabled, nothing otherwise.
+    """
+    if not metrics.enabled:
+        return []
+    listener = MongoPoolUsage()
+    metrics.register_pool(component, target, listener, MongoPoolUsage.usage)
+    return [listener]
@@ -0,0 +1,171 @@
+"""
+Optional query profiling of the MongoDB connectors.
+
+A connector given a `QueryProfiler` times its `find`, `update` and `delete` calls and logs those
+slower than `slow_ms`. A sample of the queries is also explained (`queryPlanner` verbosity, which
+does not run the query), in the background, and queries whose plan scans the whole collection are
+logged once per query shape. Shapes replace the values of a query with "?", so no data is logged.
+The filter is explained as a find: updates and deletes select their documents with the same plan.
+"""
+import asyncio
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Iterator, Optional
+
+from rv16_lib.logger import get_logger
+
+logger = get_logger("mongo.profiler", rate_limit=1, burst=10)
+
+
+def query_shape(query: Any) -> str:
+    """Return the shape of a query: its fields and operators, with every value replaced by "?"."""
+    return json.dumps(_shape(query), sort_keys=True)
+
+
+def _shape(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {key: _shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)) and any(isinstance(item, dict) for item in value):
+        # e.g. the clauses of $and / $or
+        return [_shape(item) for item in value]
+    return "?"
+
+
+def plan_stages(plan: Any) -> set[str]:
+    """Return the stages of an explained plan, at any depth."""
+    stages = set()
+    if isinstance(plan, dict):
+        if isinstance(plan.get("stage"), str):
+            stages.add(plan["stage"])
+        for item in plan.values():
+            stages |= plan_stages(item)
+    elif isinstance(plan, list):
+        for item in plan:
+            stages |= plan_stages(item)
+    return stages
+
+
+class _NoProfile:
+    """ Stand-in for the profiling context managers when a connector has no profiler."""
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    async def __aenter__(self):
+        return None
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+
+NO_PROFILE = _NoProfile()
+
+
+class QueryProfiler:
+    """ Logs slow queries and, for a sample of the queries, collection scans.
+    Args:
+        sample_rate (float, optional): Fraction of the queries explained. Defaults to 0.01.
+        slow_ms (float, optional): Queries taking longer are logged. Defaults to 100.
+        max_shapes (int, optional): Number of query shapes remembered as already explained. Defaults to 1024.
+    """
+
+    def __init__(self, sample_rate: float = 0.01, slow_ms: float = 100.0, max_shapes: int = 1024):
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.max_shapes = max_shapes
+        self.slow_queries = 0
+        self.collection_scans = 0
+        self.explained = 0
+        self._shapes: set[tuple[str, str]] = set()
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._tasks: set[asyncio.Task] = set()
+
+    @contextmanager
+    def profile(self, collection, operation: str, query: dict) -> Iterator[None]:
+        """Time the block running `query` on a PyMongo collection, and maybe explain the query."""
+        started = time.perf_counter()
+        yield
+        self._check_duration(collection, operation, query, started)
+        key = self._sample(collection, query)
+        if key is not None:
+            if self._executor is None:
+                with self._lock:
+                    if self._executor is None:
+                        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mongo-explain")
+            self._executor.submit(self._explain, collection, operation, query, key)
+
+    @asynccontextmanager
+    async def profile_async(self, collection, operation: str, query: dict) -> AsyncIterator[None]:
+        """Asyncio counterpart of `profile`, for a collection of an `AsyncMongoClient`."""
+        started = time.perf_counter()
+        yield
+        self._check_duration(collection, operation, query, started)
+        key = self._sample(collection, query)
+        if key is not None:
+            task = asyncio.ensure_future(self._explain_async(collection, operation, query, key))
+            # Keep a reference until done, the event loop only holds weak ones
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def close(self):
+        """Stop the background explain thread."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def _check_duration(self, collection, operation: str, query: dict, started: float):
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if elapsed_ms >= self.slow_ms:
+            self.slow_queries += 1
+            logger.warning("Slow %s on %s: %.1f ms for %s", operation, collection.full_name, elapsed_ms,
+                           query_shape(query))
+
+    def _sample(self, collection, query: dict) -> Optional[tuple[str, str]]:
+        """Return the key of the query shape if it is sampled and was not explained yet."""
+        if random.random() >= self.sample_rate:
+            return None
+        key = (collection.full_name, query_shape(query))
+        with self._lock:
+            if key in self._shapes:
+                return None
+            if len(self._shapes) >= self.max_shapes:
+                self._shapes.clear()
+            self._shapes.add(key)
+        return key
+
+    @staticmethod
+    def _explain_command(collection, query: dict) -> dict:
+        return {"explain": {"find": collection.name, "filter": query}, "verbosity": "queryPlanner"}
+
+    def _explain(self, collection, operation: str, query: dict, key: tuple[str, str]):
+        try:
+            result = collection.database.command(self._explain_command(collection, query))
+        except Exception as e:
+            logger.debug("Failed to explain %s on %s: %s", operation, collection.full_name, e)
+            return
+        self._report(operation, result, key)
+
+    async def _explain_async(self, collection, operation: str, query: dict, key: tuple[str, str]):
+        try:
+            result = await collection.database.command(self._explain_command(collection, query))
+        except Exception as e:
+            logger.debug("Failed to explain %s on %s: %s", operation, collection.full_name, e)
+            return
+        self._report(operation, result, key)
+
+    def _report(self, operation: str, result: dict, key: tuple[str, str]):
+        self.explained += 1
+        stages = plan_stages(result.get("queryPlanner", {}).get("winningPlan", {}))
+        if "COLLSCAN" in stages:
+            self.collection_scans += 1
+            collection_name, shape = key
+            logger.warning("Collection scan on %s for %s %s: add an index to its MongoElement", collection_name,
+                           operation, shape)
@@ -1,39 +1,138 @@
 import json
+import threading
+import time
 import redis
-from typing import Optional, Any
+from contextlib import contextmanager
+from typing import Optional, Any, Iterator, Sequence, Type, TypeVar
+
+from pydantic import BaseModel
 
 from rv16_lib.exceptions import RV16Exception
 from rv16_lib.logger import logger
+from rv16_lib.metrics import metrics, redis_pool_usage
+from rv16_lib.storage.codecs import Codec, TModel, decode_hash_fields, encode_hash_fields, model_to_hash
 from rv16_lib.storage.database_connector import DatabaseConnector, DatabaseElement
 
 
+# Number of keys sent in a single round-trip by the bulk operations
+DEFAULT_CHUNK_SIZE = 500
+# Number of keys examined by each SCAN/SSCAN step of the prefix deletions
+DEFAULT_SCAN_COUNT = 500
+
+T = TypeVar("T")
+
+
 class RedisElement(DatabaseElement):
     key: str
-    value: Optional[str] = None
+    # A string, or any value the codec of the connector encodes
+    value: Optional[Any] = None
+
+
+def _chunked(items: Sequence[T], size: int) -> Iterator[Sequence[T]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def escape_pattern(text: str) -> str:
+    """Escape the glob characters of `text`, so that it matches literally in a SCAN/KEYS pattern."""
+    return "".join("\\" + c if c in "*?[]\\" else c for c in text)
+
+
+def _throttle_delay(deleted: int, started: float, max_keys_per_second: Optional[float]) -> float:
+    """Seconds to wait before the next batch so that `deleted` keys took at least `deleted / rate` seconds."""
+    if not max_keys_per_second:
+        return 0.0
+    return max(0.0, deleted / max_keys_per_second - (time.monotonic() - started))
+
+
+def _scan_batches(keys: Iterator[str], size: int) -> Iterator[list[str]]:
+    batch = []
+    for key in keys:
+        batch.append(key)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def binary_pool(pool):
+    """Return a new pool connecting like `pool` (sync or asyncio) whose connections do not decode responses."""
+    kwargs = dict(pool.connection_kwargs, decode_responses=False)
+    if hasattr(pool, "timeout"):
+        # BlockingConnectionPool
+        kwargs["timeout"] = pool.timeout
+    return type(pool)(connection_class=pool.connection_class, max_connections=pool.max_connections, **kwargs)
 
 
 class RedisConnector(DatabaseConnector):
 
-    def __init__(self, host: str, port: int, db: int):
+    def __init__(self, host: str, port: int, db: int, client: Optional[redis.Redis] = None, ping: bool = True,
+                 codec: Optional[Codec] = None, binary_client: Optional[redis.Redis] = None):
         """
         Initializes the Redis client using environment variables for configuration.
+        A shared `client` (e.g. from `rv16_lib.storage.registry`) can be passed instead,
+        and `ping=False` skips the connection check.
+        With a `codec` (see `rv16_lib.storage.codecs`), element values are stored as
+        `codec.encode(value)` and read back decoded, through a second client that does not decode
+        responses: `binary_client` if given, otherwise one created on first use.
         """
 
+        self.codec = codec
+        self._binary_client: Optional[redis.Redis] = binary_client
+        self._owns_binary_client = binary_client is None
+        self._binary_lock = threading.Lock()
         try:
-            self.client: redis.Redis = redis.Redis(host=host, port=port, db=db, decode_responses=True)
-            # A simple ping to check for connection
-            self.client.ping()
-            logger.info("Connected to Redis successfully.")
+            self.client: redis.Redis = client or redis.Redis(host=host, port=port, db=db, decode_responses=True)
+            self.metrics_target = f"{host}:{port}/{db}"
+            metrics.register_pool(type(self).__name__, self.metrics_target, self.client.connection_pool,
+                                  redis_pool_usage)
+            if ping:
+                # A simple ping to check for connection
+                self.client.ping()
+                logger.info("Connected to Redis successfully.")
         except redis.exceptions.ConnectionError as e:
-            logger.error(f"Failed to connect to Redis: {e}")
+            logger.error("Failed to connect to Redis: %s", e)
             raise RV16Exception(status_code=500,
                                 message=f"Failed to connect to Redis")
         except Exception as e:
-            logger.error(f"An unexpected error occurred during Redis connection: {e}")
+            logger.error("An unexpected error occurred during Redis connection: %s", e)
             raise RV16Exception(status_code=500,
                                 message="An unexpected error occurred during Redis connection")
 
 
+    @property
+    def binary_client(self) -> redis.Redis:
+        """A client on the same server whose responses are bytes, created on first use."""
+        if self._binary_client is None:
+            with self._binary_lock:
+                if self._binary_client is None:
+                    self._binary_client = redis.Redis(connection_pool=binary_pool(self.client.connection_pool))
+                    metrics.register_pool(f"{type(self).__name__}.binary", self.metrics_target,
+                                          self._binary_client.connection_pool, redis_pool_usage)
+        return self._binary_client
+
+    @property
+    def _values(self) -> redis.Redis:
+        # The client element values go through
+        return self.client if self.codec is None else self.binary_client
+
+    def _encode(self, value: Any) -> Any:
+        return value if self.codec is None else self.codec.encode(value)
+
+    def _decode(self, data: Any) -> Any:
+        return data if self.codec is None or data is None else self.codec.decode(data)
+
+    def close(self):
+        """
+        Releases the connections of the binary client created by the connector. The clients passed
+        to the constructor are left to their owner.
+        """
+        if self._binary_client is not None and self._owns_binary_client:
+            self._binary_client.connection_pool.disconnect()
+            self._binary_client = None
+
+
     def insert_one(self, element: RedisElement):
         """
         Inserts a single key-value pair into Redis.
@@ -43,16 +142,16 @@ class RedisConnector(DatabaseConnector):
                                 message="Redis client not initialized")
 
         try:
-            self.client.set(element.key, element.value)
-            logger.info(f"Successfully inserted key: {element.key}")
+            self._values.set(element.key, self._encode(element.value))
+            logger.debug("Successfully inserted key: %s", element.key)
             return True
 
         except (ValueError, TypeError) as e:
-            logger.error(f"Error serializing value for key {element.key}: {e}")
+            logger.error("Error serializing value for key %s: %s", element.key, e)
             raise RV16Exception(status_code=500,
                                 message=f"Error serializing value for key {element.key}")
         except Exception as e:
-            logger.error(f"Error inserting key {element.key}: {e}")
+            logger.error("Error inserting key %s: %s", element.key, e)
             raise RV16Exception(status_code=500,
                                 message=f"Error inserting key {element.key}")
 
@@ -60,21 +159,50 @@ class RedisConnector(DatabaseConnector):
     def delete(self, element: RedisElement):
         """
         Deletes a single key-value pair from Redis.
+        The key is taken literally: use `delete_prefix` to delete every key starting with a prefix.
         """
         if not self.client:
             raise RV16Exception(status_code=500,
                                 message="Redis client not initialized")
 
         try:
-            self.client.delete(element.key + ":*")
-            logger.info(f"Successfully deleted key: {element.key}")
+            self.client.delete(element.key)
+            logger.debug("Successfully deleted key: %s", element.key)
             return True
         except Exception as e:
-            logger.error(f"Error deleting key {element.key}: {e}")
+            logger.error("Error deleting key %s: %s", element.key, e)
             raise RV16Exception(status_code=500,
                                 message=f"Error deleting key {element.key}")
 
 
+    def delete_prefix(self, prefix: str, batch_size: int = DEFAULT_SCAN_COUNT,
+                      max_keys_per_second: Optional[float] = None) -> int:
+        """
+        Deletes every key starting with `prefix`, without blocking Redis: keys are found with
+        incremental SCAN steps of `batch_size` and removed with UNLINK, which frees their memory
+        in the background. `max_keys_per_second` spreads the deletions over time.
+        Keys written during the scan may be missed. Returns the number of keys deleted.
+        """
+        if not self.client:
+            raise RV16Exception(status_code=500,
+                                message="Redis client not initialized")
+
+        deleted = 0
+        started = time.monotonic()
+        try:
+            for keys in _scan_batches(self.client.scan_iter(match=escape_pattern(prefix) + "*", count=batch_size),
+                                      batch_size):
+                deleted += self.client.unlink(*keys)
+                time.sleep(_throttle_delay(deleted, started, max_keys_per_second))
+        except Exception as e:
+            logger.error("Error deleting prefix %s after %s keys: %s", prefix, deleted, e)
+            raise RV16Exception(status_code=500,
+                                message=f"Error deleting prefix {prefix}")
+
+        logger.debug("Deleted %s keys with prefix %s", deleted, prefix)
+        return deleted
+
+
     def update(self, element: RedisElement):
         """
         Updates the value of a single key in Redis.
@@ -84,36 +212,178 @@ class RedisConnector(DatabaseConnector):
                                 message="Redis client not initialized")
 
         try:
-            self.client.set(element.key, element.value)
-            logger.info(f"Successfully updated key: {element.key}")
+            self._values.set(element.key, self._encode(element.value))
+            logger.debug("Successfully updated key: %s", element.key)
             return True
         except Exception as e:
-            logger.error(f"Error updating key {element.key}: {e}")
+            logger.error("Error updating key %s: %s", element.key, e)
             raise RV16Exception(status_code=500,
                                 message=f"Error updating key {element.key}")
 
 
-    def find(self, element: RedisElement) -> str:
+    def find(self, element: RedisElement) -> Any:
         """
-        Finds a single key's value in Redis.
+        Finds a single key's value in Redis, decoded by the codec if any.
         """
         if not self.client:
             raise RV16Exception(status_code=500,
                                 message="Redis client not initialized")
 
         try:
-            value = self.client.get(element.key)
-            if value:
-                # Assuming the value is a JSON string
-                return value
+            value = self._values.get(element.key)
+            if value is not None:
+                return self._decode(value)
             else:
-                logger.warning(f"Key not found: {element.key}")
+                logger.debug("Key not found: %s", element.key)
                 raise RV16Exception(status_code=500,
                                     message=f"Key '{element.key}' not found")
+        except RV16Exception:
+            raise
         except Exception as e:
-            logger.error(f"Error finding key {element.key}: {e}")
+            logger.error("Error finding key %s: %s", element.key, e)
             raise RV16Exception(status_code=500,
                                 message=f"Error finding key '{element.key}")
 
+    @contextmanager
+    def pipeline(self, transaction: bool = False, binary: bool = False) -> Iterator[redis.client.Pipeline]:
+        """
+        Yields a pipeline whose queued commands are sent in a single round-trip when the block exits.
+        With `transaction=True` the commands are wrapped in MULTI/EXEC. To read the results,
+        call `execute()` on the pipeline inside the block. With `binary=True` the pipeline
+        runs on `binary_client`.
+        """
+        if not self.client:
+            raise RV16Exception(status_code=500,
+                                message="Redis client not initialized")
+
+        try:
+            with (self.binary_client if binary else self.client).pipeline(transaction=transaction) as pipe:
+                yield pipe
+                if len(pipe):
+                    pipe.execute()
+        except RV16Exception:
+            raise
+        except Exception as e:
+            logger.error("Error executing Redis pipeline: %s", e)
+            raise RV16Exception(status_code=500,
+                                message="Error executing Redis pipeline")
+
+
+    def insert_many(self, elements: Sequence[RedisElement], chunk_size: int = DEFAULT_CHUNK_SIZE) -> dict[str, bool]:
+        """
+        Inserts many key-value pairs, one pipelined round-trip per chunk of `chunk_size` keys.
+        Returns whether each key was written, instead of raising on the first failure.
+        """
+        results: dict[str, bool] = {}
+        for chunk in _chunked(elements, chunk_size):
+            with self.pipeline(binary=self.codec is not None) as pipe:
+                for element in chunk:
+                    pipe.set(element.key, self._encode(element.value))
+                replies = pipe.execute(raise_on_error=False)
+            for element, reply in zip(chunk, replies):
+                results[element.key] = reply is True
+
+        logger.debug("Inserted %s/%s keys", sum(results.values()), len(results))
+        return results
+
+
+    def find_many(self, elements: Sequence[RedisElement], chunk_size: int = DEFAULT_CHUNK_SIZE) -> dict[str, Optional[Any]]:
+        """
+        Finds many keys' values with one MGET per chunk of `chunk_size` keys.
+        Missing keys are reported as None instead of raising.
+        """
+        if not self.client:
+            raise RV16Exception(status_code=500,
+                                message="Redis client not initialized")
+
+        results: dict[str, Optional[Any]] = {}
+        try:
+            for chunk in _chunked(elements, chunk_size):
+                keys = [element.key for element in chunk]
+                results.update(zip(keys, map(self._decode, self._values.mget(keys))))
+        except Exception as e:
+            logger.error("Error finding %s keys: %s", len(elements), e)
+            raise RV16Exception(status_code=500,
+                                message=f"Error finding {len(elements)} keys")
+        return results
+
+
+    def delete_many(self, elements: Sequence[RedisElement], chunk_size: int = DEFAULT_CHUNK_SIZE) -> dict[str, bool]:
+        """
+        Deletes many keys, one pipelined round-trip per chunk of `chunk_size` keys.
+        Returns whether each key existed and was deleted.
+        """
+        results: dict[str, bool] = {}
+        for chunk in _chunked(elements, chunk_size):
+            with self.pipeline() as pipe:
+                for element in chunk:
+                    pipe.delete(element.key)
+                replies = pipe.execute(raise_on_error=False)
+            for element, reply in zip(chunk, replies):
+                results[element.key] = reply == 1
+
+        logger.debug("Deleted %s/%s keys", sum(results.values()), len(results))
+        return results
+
+    def insert_hash(self, key: str, model: BaseModel, ex: Optional[int] = None):
+        """
+        Stores a model as a hash, one JSON-encoded field per attribute, replacing the previous one.
+        Single attributes can then be read with `find_hash_fields` and written with `update_hash_fields`.
+        """
+        try:
+            with self.pipeline(transaction=True) as pipe:
+                pipe.delete(key)
+                pipe.hset(key, mapping=model_to_hash(model))
+                if ex is not None:
+                    pipe.expire(key, ex)
+            logger.debug("Successfully inserted hash: %s", key)
+            return True
+        except RV16Exception:
+            raise
+        except Exception as e:
+            logger.error("Error inserting hash %s: %s", key, e)
+            raise RV16Exception(status_code=500,
+                                message=f"Error inserting hash {key}")
+
+
+    def find_hash(self, key: str, model_type: Type[TModel]) -> Optional[TModel]:
+        """
+        Reads a model stored with `insert_hash`. Returns None if the key does not exist.
+        """
+        try:
+            fields = self.client.hgetall(key)
+        except Exception as e:
+            logger.error("Error finding hash %s: %s", key, e)
+            raise RV16Exception(status_code=500,
+                                message=f"Error finding hash '{key}'")
+        return model_type.model_validate(decode_hash_fields(fields)) if fields else None
+
+
+    def find_hash_fields(self, key: str, *fields: str) -> dict[str, Any]:
+        """
+        Reads some attributes of a model stored with `insert_hash`. Missing fields are left out.
+        """
+        try:
+            values = self.client.hmget(key, fields)
+        except Exception as e:
+            logger.error("Error finding fields of hash %s: %s", key, e)
+            raise RV16Exception(status_code=500,
+                                message=f"Error finding fields of hash '{key}'")
+        return decode_hash_fields(dict(zip(fields, values)))
+
+
+    def update_hash_fields(self, key: str, values: dict[str, Any]):
+        """
+        Writes some attributes of a model stored with `insert_hash`. Values must be JSON-compatible.
+        """
+        try:
+            self.client.hset(key, mapping=encode_hash_fields(values))
+            logger.debug("Successfully updated %s fields of hash: %s", len(values), key)
+            return True
+        except Exception as e:
+            logger.error("Error updating hash %s: %s", key, e)
+            raise RV16Exception(status_code=500,
+                                message=f"Error updating hash {key}")
+
     def execute_query(self, *args, **kwargs) -> Any:
         raise NotImplementedError("Redis does not support arbitrary queries.")
\ No newline at end of file
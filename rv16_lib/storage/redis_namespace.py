@@ -0,0 +1,163 @@
+"""
+Namespaced Redis keys, invalidated together without blocking Redis.
+
+Every key of a `RedisNamespace` is prefixed with `<name>:`. `clear` removes them all with batched,
+optionally rate-limited UNLINKs: found by incremental SCAN steps, or, for an indexed namespace, read
+from an index set holding its keys, which costs O(keys of the namespace) instead of a scan of the
+whole keyspace. The index is maintained by the namespace methods: keys written directly with the
+client are not indexed. Keys expiring by TTL stay in the index until the namespace is cleared.
+"""
+import asyncio
+import time
+from typing import TYPE_CHECKING, Optional
+
+from rv16_lib.exceptions import RV16Exception
+from rv16_lib.logger import logger
+from rv16_lib.storage.redis_connector import DEFAULT_SCAN_COUNT, _throttle_delay
+
+if TYPE_CHECKING:
+    from rv16_lib.storage.redis_connector import RedisConnector
+    from rv16_lib.storage.async_redis_connector import AsyncRedisConnector
+
+
+class _Namespace:
+
+    def __init__(self, name: str, indexed: bool = False, separator: str = ":"):
+        self.name = name
+        self.indexed = indexed
+        self.prefix = f"{name}{separator}"
+        # Inside the namespace, so that a scan-based clear also removes it
+        self.index_key = f"{self.prefix}__index__"
+
+    def key(self, key: str) -> str:
+        """Return the full Redis key of `key`."""
+        return self.prefix + key
+
+
+class RedisNamespace(_Namespace):
+    """ A set of keys sharing the prefix `<name>:`, cleared with `clear`.
+    Args:
+        connector (RedisConnector): The connector whose client is used
+        name (str): The namespace, e.g. "users-cache"
+        indexed (bool, optional): Track the keys in an index set, so that `clear` does not scan. Defaults to False.
+        separator (str, optional): Between the namespace and the keys. Defaults to ":".
+    """
+
+    def __init__(self, connector: "RedisConnector", name: str, indexed: bool = False, separator: str = ":"):
+        super().__init__(name, indexed, separator)
+        self.connector = connector
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the value of `key`, or None if it does not exist."""
+        return self.connector.client.get(self.key(key))
+
+    def set(self, key: str, value: str, ex: Optional[int] = None):
+        """Write `key`, expiring after `ex` seconds if given, and add it to the index."""
+        with self.connector.pipeline() as pipe:
+            pipe.set(self.key(key), value, ex=ex)
+            if self.indexed:
+                pipe.sadd(self.index_key, self.key(key))
+
+    def delete(self, *keys: str) -> int:
+        """Delete keys of the namespace. Returns the number of keys that existed."""
+        if not keys:
+            return 0
+        full_keys = [self.key(key) for key in keys]
+        with self.connector.pipeline() as pipe:
+            pipe.unlink(*full_keys)
+            if self.indexed:
+                pipe.srem(self.index_key, *full_keys)
+            replies = pipe.execute()
+        return replies[0]
+
+    def clear(self, batch_size: int = DEFAULT_SCAN_COUNT, max_keys_per_second: Optional[float] = None) -> int:
+        """Delete every key of the namespace, `batch_size` keys per UNLINK, at most `max_keys_per_second`.
+        Returns the number of keys deleted.
+        """
+        if not self.indexed:
+            return self.connector.delete_prefix(self.prefix, batch_size, max_keys_per_second)
+
+        client = self.connector.client
+        deleted = 0
+        started = time.monotonic()
+        try:
+            while True:
+                # Members are removed from the index as they are deleted: keys added meanwhile are kept
+                members = client.srandmember(self.index_key, batch_size)
+                if not members:
+                    break
+                with self.connector.pipeline() as pipe:
+                    pipe.unlink(*members)
+                    pipe.srem(self.index_key, *members)
+                    replies = pipe.execute()
+                deleted += replies[0]
+                time.sleep(_throttle_delay(deleted, started, max_keys_per_second))
+        except RV16Exception:
+            raise
+        except Exception as e:
+            logger.error("Error clearing namespace %s after %s keys: %s", self.name, deleted, e)
+            raise RV16Exception(status_code=500,
+                                message=f"Error clearing namespace {self.name}")
+
+        logger.debug("Cleared %s keys of namespace %s", deleted, self.name)
+        return deleted
+
+
+class AsyncRedisNamespace(_Namespace):
+    """ Asyncio counterpart of `RedisNamespace`, on an `AsyncRedisConnector`."""
+
+    def __init__(self, connector: "AsyncRedisConnector", name: str, indexed: bool = False, separator: str = ":"):
+        super().__init__(name, indexed, separator)
+        self.connector = connector
+
+    async def get(self, key: str) -> Optional[str]:
+        """Return the value of `key`, or None if it does not exist."""
+        return await self.connector.client.get(self.key(key))
+
+    async def set(self, key: str, value: str, ex: Optional[int] = None):
+        """Write `key`, expiring after `ex` seconds if given, and add it to the index."""
+        async with self.connector.pipeline() as pipe:
+            pipe.set(self.key(key), value, ex=ex)
+            if self.indexed:
+                pipe.sadd(self.index_key, self.key(key))
+
+    async def delete(self, *keys: str) -> int:
+        """Delete keys of the namespace. Returns the number of keys that existed."""
+        if not keys:
+            return 0
+        full_keys = [self.key(key) for key in keys]
+        async with self.connector.pipeline() as pipe:
+            pipe.unlink(*full_keys)
+            if self.indexed:
+                pipe.srem(self.index_key, *full_keys)
+            replies = await pipe.execute()
+        return replies[0]
+
+    async def clear(self, batch_size: int = DEFAULT_SCAN_COUNT, max_keys_per_second: Optional[float] = None) -> int:
+        """Delete every key of the namespace, like `RedisNamespace.clear`. Returns the number of keys deleted."""
+        if not self.indexed:
+            return await self.connector.delete_prefix(self.prefix, batch_size, max_keys_per_second)
+
+        client = self.connector.client
+        deleted = 0
+        started = time.monotonic()
+        try:
+            while True:
+                members = await client.srandmember(self.index_key, batch_size)
+                if not members:
+                    break
+                async with self.connector.pipeline() as pipe:
+                    pipe.unlink(*members)
+                    pipe.srem(self.index_key, *members)
+                    replies = await pipe.execute()
+                deleted += replies[0]
+                await asyncio.sleep(_throttle_delay(deleted, started, max_keys_per_second))
+        except RV16Exception:
+            raise
+        except Exception as e:
+            logger.error("Error clearing namespace %s after %s keys: %s", self.name, deleted, e)
+            raise RV16Exception(status_code=500,
+                                message=f"Error clearing namespace {self.name}")
+
+        logger.debug("Cleared %s keys of namespace %s", deleted, self.name)
+        return deleted
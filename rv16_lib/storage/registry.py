@@ -0,0 +1,231 @@
+"""
+Process-wide registry of storage clients.
+
+Connectors built through the registry share one client (and so one connection pool) per
+connection target, connect lazily and are closed together at shutdown.
+"""
+import atexit
+import threading
+from typing import TYPE_CHECKING, Any, Optional, Hashable, Sequence, Type
+
+from pydantic import BaseModel, Field
+
+from rv16_lib.logger import logger
+from rv16_lib.utils import get_object_from_config
+
+if TYPE_CHECKING:
+    from rv16_lib.storage.codecs import Codec
+    from rv16_lib.storage.mongo_element import MongoElement
+    from rv16_lib.storage.mongo_profiler import QueryProfiler
+
+
+class MongoPoolSettings(BaseModel):
+    """Pool settings of the shared MongoDB clients.
+    Args:
+        max_pool_size: Maximum number of connections per server
+        min_pool_size: Number of connections kept open per server
+        wait_queue_timeout_ms: How long an operation waits for a free connection. No limit if None.
+        connect_timeout_ms: Timeout for establishing a connection
+        server_selection_timeout_ms: How long an operation waits for a suitable server
+    """
+    max_pool_size: int = 100
+    min_pool_size: int = 0
+    wait_queue_timeout_ms: Optional[int] = None
+    connect_timeout_ms: int = 20000
+    server_selection_timeout_ms: int = 30000
+
+
+class RedisPoolSettings(BaseModel):
+    """Pool settings of the shared Redis clients.
+    Args:
+        max_connections: Maximum number of connections of the pool
+        pool_timeout: How long a command waits for a free connection, in seconds
+        socket_timeout: Timeout of a command, in seconds
+        socket_connect_timeout: Timeout for establishing a connection, in seconds
+        health_check_interval: Seconds of idleness after which a connection is checked before use
+    """
+    max_connections: int = 50
+    pool_timeout: float = 5.0
+    socket_timeout: Optional[float] = 5.0
+    socket_connect_timeout: Optional[float] = 5.0
+    health_check_interval: int = 30
+
+
+class ConnectorRegistrySettings(BaseModel):
+    """Settings of the connector registry, e.g. the `storage` section of the service configuration.
+    Args:
+        mongo: Pool settings of the MongoDB clients
+        redis: Pool settings of the Redis clients
+        warm_up: Connect every client, and create the indexes of the Mongo connectors, in a background
+            thread as soon as they are created
+    """
+    mongo: MongoPoolSettings = Field(default_factory=MongoPoolSettings)
+    redis: RedisPoolSettings = Field(default_factory=RedisPoolSettings)
+    warm_up: bool = False
+
+
+class ConnectorRegistry:
+    """ Hands out connectors sharing one client per connection target.
+    Clients are created on first request, without blocking on the network.
+    """
+
+    def __init__(self, settings: Optional[ConnectorRegistrySettings] = None):
+        self.settings = settings or ConnectorRegistrySettings()
+        self._lock = threading.Lock()
+        self._clients: dict[Hashable, Any] = {}
+        # Mongo connectors whose declared indexes are not created yet
+        self._pending_indexes: list[Any] = []
+
+    @classmethod
+    def from_config(cls, filename: str = "storage.yaml", abs_path: bool = False) -> "ConnectorRegistry":
+        """Build a registry from a YAML file, loaded with `get_object_from_config`."""
+        return cls(get_object_from_config(ConnectorRegistrySettings, filename=filename, abs_path=abs_path))
+
+    def mongo_client(self, host: str, port: int):
+        """Return the shared MongoClient of a server."""
+        return self._get_or_create(("mongo", host, port), lambda: self._build_mongo_client(host, port))
+
+    def redis_client(self, host: str, port: int, db: int, binary: bool = False):
+        """Return the shared Redis client of a database. With `binary`, its responses are not decoded."""
+        target = ("redis", host, port, db, "binary") if binary else ("redis", host, port, db)
+        return self._get_or_create(target, lambda: self._build_redis_client(host, port, db, not binary))
+
+    def mongo_connector(self, host: str, port: int, db_name: str, elements: Sequence[Type["MongoElement"]] = (),
+                        profiler: Optional["QueryProfiler"] = None):
+        """Return a MongoConnector on the shared client of the server, without blocking on the network.
+        The indexes declared by `elements` are created, if missing, by `warm_up` (or in the background
+        with the `warm_up` setting), not before returning.
+        """
+        from rv16_lib.storage.mongo_connector import MongoConnector
+
+        connector = MongoConnector(host, port, db_name, client=self.mongo_client(host, port), ping=False,
+                                   elements=elements, profiler=profiler, create_indexes=False)
+        if connector.elements:
+            if self.settings.warm_up:
+                threading.Thread(target=self._create_indexes, args=([connector],), daemon=True).start()
+            else:
+                with self._lock:
+                    self._pending_indexes.append(connector)
+        return connector
+
+    def redis_connector(self, host: str, port: int, db: int, codec: Optional["Codec"] = None):
+        """Return a RedisConnector on the shared clients of the database, encoding values with `codec` if given."""
+        from rv16_lib.storage.redis_connector import RedisConnector
+
+        return RedisConnector(host, port, db, client=self.redis_client(host, port, db), ping=False, codec=codec,
+                              binary_client=self.redis_client(host, port, db, binary=True) if codec else None)
+
+    def warm_up(self, background: bool = True) -> Optional[threading.Thread]:
+        """Connect every registered client, then create the indexes declared by the Mongo connectors,
+        in a daemon thread unless `background` is False.
+        """
+        with self._lock:
+            targets = list(self._clients.items())
+            pending, self._pending_indexes = self._pending_indexes, []
+
+        def run():
+            for target, client in targets:
+                self._ping(target, client)
+            self._create_indexes(pending)
+
+        if not background:
+            run()
+            return None
+
+        thread = threading.Thread(target=run, name="connector-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def close(self):
+        """Close every client. Connectors obtained from the registry must not be used afterwards."""
+        with self._lock:
+            clients, self._clients = self._clients, {}
+            self._pending_indexes = []
+        for target, client in clients.items():
+            try:
+                client.close()
+                if target[0] == "redis":
+                    # Redis.close() leaves a pool passed to the client open
+                    client.connection_pool.disconnect()
+            except Exception as e:
+                logger.warning("Failed to close client %s: %s", target, e)
+        if clients:
+            logger.info("Closed %s storage clients.", len(clients))
+
+    def _get_or_create(self, target: Hashable, factory):
+        client = self._clients.get(target)
+        if client is not None:
+            return client
+
+        with self._lock:
+            client = self._clients.get(target)
+            if client is None:
+                client = factory()
+                self._clients[target] = client
+                created = True
+            else:
+                created = False
+
+        if created and self.settings.warm_up:
+            threading.Thread(target=self._ping, args=(target, client), daemon=True).start()
+        return client
+
+    @staticmethod
+    def _ping(target: Hashable, client: Any):
+        try:
+            if target[0] == "mongo":
+                client.admin.command("ping")
+            else:
+                client.ping()
+            logger.info("Storage client %s connected.", target)
+        except Exception as e:
+            logger.warning("Warm-up of storage client %s failed: %s", target, e)
+
+    def _create_indexes(self, connectors: Sequence[Any]):
+        for connector in connectors:
+            try:
+                connector.ensure_indexes()
+            except Exception as e:
+                logger.warning("Index creation of %s failed, retried by the next warm-up: %s",
+                               connector.metrics_target, e)
+                with self._lock:
+                    self._pending_indexes.append(connector)
+
+    def _build_mongo_client(self, host: str, port: int):
+        from pymongo import MongoClient
+        from rv16_lib.storage.mongo_pool import pool_listeners
+
+        settings = self.settings.mongo
+        return MongoClient(f'mongodb://{host}:{port}/',
+                           connect=False,
+                           maxPoolSize=settings.max_pool_size,
+                           minPoolSize=settings.min_pool_size,
+                           waitQueueTimeoutMS=settings.wait_queue_timeout_ms,
+                           connectTimeoutMS=settings.connect_timeout_ms,
+                           serverSelectionTimeoutMS=settings.server_selection_timeout_ms,
+                           event_listeners=pool_listeners("ConnectorRegistry", f"{host}:{port}"))
+
+    def _build_redis_client(self, host: str, port: int, db: int, decode_responses: bool = True):
+        import redis
+
+        settings = self.settings.redis
+        pool = redis.BlockingConnectionPool(host=host, port=port, db=db,
+                                            max_connections=settings.max_connections,
+                                            timeout=settings.pool_timeout,
+                                            socket_timeout=settings.socket_timeout,
+                                            socket_connect_timeout=settings.socket_connect_timeout,
+                                            health_check_interval=settings.health_check_interval,
+                                            decode_responses=decode_responses)
+        return redis.Redis(connection_pool=pool)
+
+
+# The process-wide registry
+connectors = ConnectorRegistry()
+atexit.register(connectors.close)
+
+
+def configure_connectors(settings: ConnectorRegistrySettings):
+    """Replace the settings of the process-wide registry. Meant to be called at startup,
+    before the first connector is created: existing clients keep their settings.
+    """
+    connectors.settings = settings
@@ -0,0 +1,274 @@
+import functools
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Type
+
+from pydantic import BaseModel, computed_field
+
+from rv16_lib.logger import logger
+from rv16_lib.storage.redis_connector import RedisConnector
+
+_MISSING = object()
+
+# Backoff of the invalidation listener between two subscription attempts, in seconds
+_LISTENER_MIN_BACKOFF = 0.5
+_LISTENER_MAX_BACKOFF = 30.0
+
+
+class TierStats(BaseModel):
+    """Counters of a single cache tier.
+    Args:
+        hits: Lookups answered by the tier
+        misses: Lookups the tier could not answer
+        evictions: Entries dropped because the tier was full or the entry expired. None for the Redis tier:
+            Redis evicts and expires keys on its own without telling its clients, and its `INFO stats`
+            counters cover the whole server rather than the namespace of the cache
+    """
+    hits: int = 0
+    misses: int = 0
+    evictions: Optional[int] = 0
+
+    @computed_field
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class LocalCache:
+    """ Thread-safe, bounded in-process LRU cache whose entries expire after `ttl` seconds."""
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = 30.0, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple[Any, float]]" = OrderedDict()
+        self._stats = TierStats()
+
+    def get(self, key: str) -> Any:
+        """Return the cached value, or the `_MISSING` sentinel."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats.misses += 1
+                return _MISSING
+
+            value, expires_at = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                self._stats.evictions += 1
+                self._stats.misses += 1
+                return _MISSING
+
+            self._entries.move_to_end(key)
+            self._stats.hits += 1
+            return value
+
+    def set(self, key: str, value: Any):
+        expires_at = self._clock() + self.ttl if self.ttl else float("inf")
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._stats.evictions += 1
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> TierStats:
+        with self._lock:
+            return self._stats.model_copy()
+
+
+class TieredCache:
+    """ Read-through cache with a bounded in-process tier in front of Redis.
+
+    Lookups are answered by the local tier, then by Redis, then by the loader, whose result
+    is written back to both tiers. Invalidations are published on a Redis channel, so that
+    every replica running `start_invalidation_listener` drops its local copy.
+    Values are stored in Redis through `serializer`/`deserializer` (JSON by default, or the
+    JSON form of `model_type` if given).
+    """
+
+    def __init__(self, redis: RedisConnector, namespace: str, local_maxsize: int = 1024,
+                 local_ttl: Optional[float] = 30.0, redis_ttl: Optional[int] = 300,
+                 model_type: Optional[Type[BaseModel]] = None,
+                 serializer: Optional[Callable[[Any], str]] = None,
+                 deserializer: Optional[Callable[[str], Any]] = None):
+        self.redis = redis
+        self.namespace = namespace
+        self.redis_ttl = redis_ttl
+        self.local = LocalCache(maxsize=local_maxsize, ttl=local_ttl)
+        self.channel = f"{namespace}:__invalidate__"
+
+        if model_type is not None:
+            self._serialize = serializer or (lambda value: value.model_dump_json())
+            self._deserialize = deserializer or model_type.model_validate_json
+        else:
+            self._serialize = serializer or json.dumps
+            self._deserialize = deserializer or json.loads
+
+        self._redis_stats = TierStats(evictions=None)
+        self._stats_lock = threading.Lock()
+        self._origin = uuid.uuid4().hex
+        self._listener: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def get(self, key: str, loader: Optional[Callable[[], Any]] = None) -> Any:
+        """Return the value of `key`, loading and caching it with `loader` on a miss.
+        Args:
+            key (str): The key, without namespace
+            loader (Callable[[], Any], optional): Loads the value on a miss. A None result is not cached.
+
+        Returns:
+            Any: The value, or None if it is neither cached nor loadable
+        """
+        value = self.local.get(key)
+        if value is not _MISSING:
+            return value
+
+        value = self._redis_get(key)
+        if value is not _MISSING:
+            self.local.set(key, value)
+            return value
+
+        if loader is None:
+            return None
+
+        value = loader()
+        if value is not None:
+            self.set(key, value)
+        return value
+
+    def set(self, key: str, value: Any):
+        """Write a value to both tiers."""
+        self.local.set(key, value)
+        try:
+            self.redis.client.set(self._redis_key(key), self._serialize(value), ex=self.redis_ttl)
+        except Exception as e:
+            logger.warning("Failed to write key %s to Redis cache: %s", key, e)
+
+    def invalidate(self, *keys: str):
+        """Drop keys from both tiers and from the local tier of every other replica.
+        Without keys, the whole namespace is dropped from Redis and the whole local tier of every
+        replica is cleared.
+        """
+        if keys:
+            for key in keys:
+                self.local.delete(key)
+        else:
+            self.local.clear()
+
+        try:
+            if keys:
+                self.redis.client.delete(*(self._redis_key(key) for key in keys))
+            else:
+                self.redis.delete_prefix(self._redis_key(""))
+            self.redis.client.publish(self.channel, json.dumps({"origin": self._origin, "keys": list(keys)}))
+        except Exception as e:
+            logger.warning("Failed to propagate invalidation of %s keys: %s", len(keys), e)
+
+    def cached(self, key: Callable[..., str]):
+        """Decorator turning a loader function into a read-through cached function.
+        Args:
+            key (Callable[..., str]): Builds the cache key from the arguments of the decorated function
+        """
+        def decorator(fn: Callable[..., Any]):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                return self.get(key(*args, **kwargs), lambda: fn(*args, **kwargs))
+            return wrapper
+        return decorator
+
+    def stats(self) -> dict[str, TierStats]:
+        """Return the counters of each tier."""
+        with self._stats_lock:
+            redis_stats = self._redis_stats.model_copy()
+        return {"local": self.local.stats(), "redis": redis_stats}
+
+    def start_invalidation_listener(self):
+        """Start a daemon thread applying the invalidations published by other replicas.
+        The thread subscribes again, with backoff, whenever the connection to Redis is lost.
+        """
+        if self._listener is not None and self._listener.is_alive():
+            return
+        self._stop.clear()
+        self._listener = threading.Thread(target=self._listen, name=f"cache-invalidation-{self.namespace}", daemon=True)
+        self._listener.start()
+
+    def stop_invalidation_listener(self, timeout: Optional[float] = None):
+        self._stop.set()
+        if self._listener is not None:
+            self._listener.join(timeout)
+            self._listener = None
+
+    def _listen(self):
+        backoff = _LISTENER_MIN_BACKOFF
+        disconnected = False
+        while not self._stop.is_set():
+            pubsub = self.redis.client.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(self.channel)
+                if disconnected:
+                    # Invalidations published while disconnected were missed
+                    self.local.clear()
+                    logger.info("Cache invalidation listener for %s subscribed again", self.namespace)
+                    disconnected = False
+                backoff = _LISTENER_MIN_BACKOFF
+                while not self._stop.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message is not None:
+                        self._apply_invalidation(message["data"])
+            except Exception as e:
+                disconnected = True
+                logger.warning("Cache invalidation listener for %s disconnected, subscribing again in %.1fs: %s",
+                               self.namespace, backoff, e)
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, _LISTENER_MAX_BACKOFF)
+            finally:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+
+    def _apply_invalidation(self, data: str):
+        try:
+            message = json.loads(data)
+        except (TypeError, ValueError):
+            logger.warning("Ignoring malformed invalidation message on %s", self.channel)
+            return
+
+        if message.get("origin") == self._origin:
+            return
+        keys = message.get("keys") or []
+        if not keys:
+            self.local.clear()
+        for key in keys:
+            self.local.delete(key)
+
+    def _redis_get(self, key: str) -> Any:
+        try:
+            raw = self.redis.client.get(self._redis_key(key))
+        except Exception as e:
+            logger.warning("Failed to read key %s from Redis cache: %s", key, e)
+            raw = None
+
+        with self._stats_lock:
+            if raw is None:
+                self._redis_stats.misses += 1
+            else:
+                self._redis_stats.hits += 1
+        return _MISSING if raw is None else self._deserialize(raw)
+
+    def _redis_key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
@@ -1,27 +1,61 @@
 import json
 import os
-from typing import TypeVar, Type, Optional
-
-import httpx
-import requests
-import yaml
-from httpx import Response
-from pydantic import BaseModel
+import threading
+from typing import Any, TypeVar, Type, Optional, TYPE_CHECKING
+from urllib.parse import urlsplit
 
+from rv16_lib.json_codec import json_body
 from rv16_lib.logger import get_logger
+from rv16_lib.metrics import metrics, NO_OPERATION
+
+# httpx, requests, PyYAML and pydantic are imported where they are used,
+# so that importing this module stays cheap
+if TYPE_CHECKING:
+    import httpx
+    import requests
+    from httpx import Response
+    from pydantic import BaseModel
 
 # Create a type variable for the Config model
-TConfig = TypeVar("TConfig", bound=BaseModel)
+TConfig = TypeVar("TConfig", bound="BaseModel")
 logger = get_logger("utils")
 
-async def call_srv_async(method: str, url: str, **kwargs) -> Response:
-    """ Send an asynchronous HTTP POST request to the specified URL.
+
+def _encode_json(kwargs: dict, body_arg: str) -> dict:
+    """Replace the `json` argument of a request by its encoded body, sent as `body_arg`."""
+    if kwargs.get("json") is None:
+        kwargs.pop("json", None)
+        return kwargs
+    kwargs[body_arg] = json_body(kwargs.pop("json"))
+    headers = dict(kwargs.get("headers") or {})
+    if not any(name.lower() == "content-type" for name in headers):
+        headers["Content-Type"] = "application/json"
+    kwargs["headers"] = headers
+    return kwargs
+
+
+async def call_srv_async(method: str, url: str, client: Optional["httpx.AsyncClient"] = None,
+                         idempotent: Optional[bool] = None, deadline: Optional[float] = None,
+                         hedge_delay: Optional[float] = None, **kwargs) -> "Response":
+    """ Send an asynchronous HTTP request to the specified URL.
+   Network errors and 502/503/504 answers are retried with backoff, within the retry budget and
+   circuit breaker of the host (see `rv16_lib.resilience`).
    Args:
        method (str): The HTTP method to use (e.g., 'POST', 'GET')
        url (str): The target URL for the request
+       client (httpx.AsyncClient, optional): The client to send the request with. Defaults to the
+           shared keep-alive client of `rv16_lib.http_client`.
+       idempotent (bool, optional): Whether the request can safely be sent twice, allowing retries
+           after it was sent and hedging. Defaults to True for GET, HEAD, OPTIONS, PUT, DELETE and TRACE.
+       deadline (float, optional): Seconds allowed for the whole call, retries included.
+           Defaults to the resilience settings.
+       hedge_delay (float, optional): Send a second request if an idempotent call has not answered
+           after this many seconds. Defaults to the resilience settings.
+       json (Any, optional): The JSON body. Pydantic models are serialized with `model_dump_json`,
+           other values with `rv16_lib.json_codec` (orjson when installed). Defaults to None.
        data (dict, optional): The data to send in the request body. Defaults to None.
        files (dict, optional): Files to send with the request. Defaults to None.
-       timeout (int, optional): Request timeout in seconds. Defaults to 5.
+       timeout (int, optional): Request timeout in seconds. Defaults to the shared client settings.
 
    Returns:
        httpx.Response: The HTTP response object
@@ -29,31 +63,91 @@ async def call_srv_async(method: str, url: str, **kwargs) -> Response:
    Raises:
        httpx.RequestError: If the request fails due to network or other issues
        httpx.HTTPStatusError: If the response status indicates an error (raised by raise_for_status())
+       CircuitOpenError: If the circuit breaker of the host is open
    """
+    import httpx
+    from rv16_lib.http_client import http_clients
+    from rv16_lib.resilience import resilience, IDEMPOTENT_METHODS
+
+    host = urlsplit(url).netloc
+    kwargs = _encode_json(kwargs, "content")
+    timeout = kwargs.pop("timeout", (client if client is not None else http_clients.get_async_client()).timeout)
+
+    async def attempt(attempt_timeout) -> "Response":
+        with (metrics.operation("http", method.upper(), host) if metrics.enabled else NO_OPERATION) as op:
+            if client is not None:
+                response = await client.request(method=method, url=url, timeout=attempt_timeout, **kwargs)
+            else:
+                async with http_clients.host_limit(url):
+                    response = await http_clients.get_async_client().request(method=method, url=url,
+                                                                             timeout=attempt_timeout, **kwargs)
+            if metrics.enabled:
+                op.payload = _response_size(response)
+        return response
+
     try:
-        async with httpx.AsyncClient() as client:
-            logger.info(f"Sending request to {url}...")
-            response = await client.request(method=method, url=url, **kwargs)
+        logger.debug("Sending request to %s...", url)
+        response = await resilience.call_async(host, attempt,
+                                               idempotent=method.upper() in IDEMPOTENT_METHODS if idempotent is None else idempotent,
+                                               status_of=lambda r: r.status_code,
+                                               retryable_error=_httpx_retryable,
+                                               deadline_error=httpx.TimeoutException,
+                                               deadline=deadline, timeout=timeout, hedge_delay=hedge_delay)
+        # 304 Not Modified is the expected answer to a conditional request, not an error
+        if response.status_code != 304:
             response.raise_for_status()
-            logger.info("Request successful! ✅")
-            return response
+        logger.debug("Request successful! ✅")
+        return response
     except httpx.RequestError as e:
-        logger.error(f"Failed to send request: {e} ❌")
+        logger.error("Failed to send request: %s ❌", e)
         raise e
     except Exception as e:
-        logger.error(f"Failed to send request: {e} ❌")
+        logger.error("Failed to send request: %s ❌", e)
         raise e
 
 
-def call_srv_sync(method: str, url: str, **kwargs) -> Response:
+def _response_size(response: Any, streamed: bool = False) -> Optional[int]:
+    """Body size recorded by the metrics: the Content-Length header if any, so that the body of a
+    streamed response is not read, else the length of the body already read.
+    """
+    length = response.headers.get("Content-Length")
+    if length is not None and length.isdigit():
+        return int(length)
+    return None if streamed else len(response.content)
+
+
+def _httpx_retryable(error: BaseException, idempotent: bool) -> bool:
+    import httpx
+
+    # The request was not sent: safe to retry whatever the method
+    if isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)):
+        return True
+    return idempotent and isinstance(error, (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError))
+
+
+def call_srv_sync(method: str, url: str, session: Optional["requests.Session"] = None,
+                  idempotent: Optional[bool] = None, deadline: Optional[float] = None,
+                  hedge_delay: Optional[float] = None, **kwargs) -> "requests.Response":
     """ Send a synchronous HTTP request to the specified URL using the requests library.
+   Network errors and 502/503/504 answers are retried with backoff, within the retry budget and
+   circuit breaker of the host (see `rv16_lib.resilience`).
 
    Args:
        method (str): The HTTP method to use (e.g., 'POST', 'GET', 'PUT', 'DELETE')
        url (str): The target URL for the request
+       session (requests.Session, optional): The session to send the request with. Defaults to the
+           shared keep-alive session of `rv16_lib.http_client`.
+       idempotent (bool, optional): Whether the request can safely be sent twice, allowing retries
+           after it was sent and hedging. Defaults to True for GET, HEAD, OPTIONS, PUT, DELETE and TRACE.
+       deadline (float, optional): Seconds allowed for the whole call, retries included.
+           Defaults to the resilience settings.
+       hedge_delay (float, optional): Send a second request if an idempotent call has not answered
+           after this many seconds. Defaults to the resilience settings.
+       json (Any, optional): The JSON body. Pydantic models are serialized with `model_dump_json`,
+           other values with `rv16_lib.json_codec` (orjson when installed). Defaults to None.
        data (dict, optional): The data to send in the request body. Defaults to None.
        files (dict, optional): Files to send with the request (for multipart/form-data). Defaults to None.
-       timeout (int, optional): Request timeout in seconds. Defaults to 5.
+       timeout (int, optional): Request timeout in seconds. Defaults to the shared client settings.
 
    Returns:
        requests.Response: The HTTP response object
@@ -61,65 +155,168 @@ def call_srv_sync(method: str, url: str, **kwargs) -> Response:
    Raises:
        requests.exceptions.RequestException: If the request fails due to network, timeout, or other issues.
        requests.exceptions.HTTPError: If the response status indicates an error (raised by raise_for_status()).
+       CircuitOpenError: If the circuit breaker of the host is open
    """
-    try:
-        logger.info(f"Sending request to {url}...")
+    import requests
+    from rv16_lib.http_client import http_clients
+    from rv16_lib.resilience import resilience, IDEMPOTENT_METHODS
+
+    host = urlsplit(url).netloc
+    kwargs = _encode_json(kwargs, "data")
+    if session is None:
+        session = http_clients.get_sync_client()
+    # Without a timeout, requests waits forever on an unresponsive server
+    timeout = kwargs.pop("timeout", http_clients.settings.sync_timeout)
+
+    def attempt(attempt_timeout) -> "requests.Response":
+        # Use Session.request for a generic method call
+        with (metrics.operation("http", method.upper(), host) if metrics.enabled else NO_OPERATION) as op:
+            response = session.request(
+                method=method,
+                url=url,
+                timeout=attempt_timeout,
+                **kwargs
+            )
+            if metrics.enabled:
+                op.payload = _response_size(response, streamed=kwargs.get("stream", False))
+        return response
 
-        # Use requests.request for a generic method call
-        response = requests.request(
-            method=method,
-            url=url,
-            **kwargs
-        )
+    try:
+        logger.debug("Sending request to %s...", url)
+        response = resilience.call_sync(host, attempt,
+                                        idempotent=method.upper() in IDEMPOTENT_METHODS if idempotent is None else idempotent,
+                                        status_of=lambda r: r.status_code,
+                                        retryable_error=_requests_retryable,
+                                        deadline_error=requests.exceptions.Timeout,
+                                        deadline=deadline, timeout=timeout, hedge_delay=hedge_delay)
 
         # raise_for_status checks for bad status codes (4xx or 5xx)
-        logger.info("Request successful! ✅")
+        logger.debug("Request successful! ✅")
         return response
 
     # Catching the base exception for requests errors, which includes
     # ConnectionError, Timeout, TooManyRedirects, and HTTPError
     except requests.exceptions.RequestException as e:
-        logger.error(f"Failed to send request: {e} ❌")
+        logger.error("Failed to send request: %s ❌", e)
         # requests.exceptions.HTTPError is a subclass of requests.exceptions.RequestException,
         # so this block handles both connection/timeout and HTTP status errors.
         raise e
     except Exception as e:
         # Catch any other unexpected exceptions
-        logger.error(f"An unexpected error occurred: {e} ❌")
+        logger.error("An unexpected error occurred: %s ❌", e)
         raise e
 
-def get_object_from_config(config_model: Type[TConfig], filename: str = "app.yaml", abs_path: bool = False) -> TConfig:
+
+def _requests_retryable(error: BaseException, idempotent: bool) -> bool:
+    import requests
+    from urllib3.exceptions import NewConnectionError
+
+    # The request was not sent: safe to retry whatever the method
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    if isinstance(error, requests.exceptions.ConnectionError) and isinstance(reason, NewConnectionError):
+        return True
+    return idempotent and isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
+def config_path(filename: str = "app.yaml", abs_path: bool = False) -> str:
+    """Resolve a configuration filename against the CONFIG_DIR environment variable ("config" by default)."""
+    if abs_path:
+        return filename
+    return os.path.join(os.getenv("CONFIG_DIR", "config"), filename)
+
+
+def _yaml_loader():
+    import yaml
+
+    # The libyaml bindings are an order of magnitude faster than the pure-Python loader
+    return getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def config_file_version(filepath: str) -> tuple[int, int]:
+    """Identify the content version of a file by its modification time and size."""
+    stat = os.stat(filepath)
+    return stat.st_mtime_ns, stat.st_size
+
+
+# (file path, model type) -> (file version, validated object)
+_config_cache: dict[tuple[str, type], tuple[tuple[int, int], Any]] = {}
+_config_cache_lock = threading.Lock()
+
+
+def clear_config_cache():
+    """Drop every configuration object cached by `get_object_from_config`."""
+    with _config_cache_lock:
+        _config_cache.clear()
+
+
+def load_config_file(config_model: Type[TConfig], filepath: str) -> TConfig:
     """
-    Loads a YAML configuration file from the specified path and returns it as a Pydantic object.
+    Reads and validates a YAML configuration file, bypassing the cache of `get_object_from_config`.
 
     Args:
-        filename (str): The name of the configuration file.
         config_model (Type[Config]): The Pydantic model to validate the configuration against.
-        abs_path: If True, the filename is treated as an absolute path. Defaults to False.
+        filepath (str): The path of the configuration file.
 
     Returns:
         Config: An instance of the Pydantic model populated with the configuration data.
     """
-    if not abs_path:
-        filepath = os.path.join(os.getenv("CONFIG_DIR", "config"), filename)
-    else:
-        filepath = filename
+    import yaml
 
-    logger.info(f"Loading configuration from {filepath}")
+    logger.info("Loading configuration from %s", filepath)
 
     try:
         with open(filepath, 'r') as file:
-            config_dict = yaml.safe_load(file)
+            config_dict = yaml.load(file, Loader=_yaml_loader())
     except FileNotFoundError:
-        logger.error(f"Configuration file not found: {filepath}")
+        logger.error("Configuration file not found: %s", filepath)
         raise
 
     # Use the Pydantic model to validate and parse the dictionary
     try:
         result = config_model(**config_dict)
     except Exception as e:
-        logger.error(f"Failed to validate configuration from {filepath}: {e}")
+        logger.error("Failed to validate configuration from %s: %s", filepath, e)
         raise
 
     logger.info("Configuration loaded successfully.")
     return result
+
+
+def get_object_from_config(config_model: Type[TConfig], filename: str = "app.yaml", abs_path: bool = False,
+                           use_cache: bool = True) -> TConfig:
+    """
+    Loads a YAML configuration file from the specified path and returns it as a Pydantic object.
+
+    The object is cached by file path, file modification time and model type: later calls only
+    stat the file, and load it again once it changed. Cached objects are shared between callers
+    and must not be modified. To be notified of changes, see `rv16_lib.config_watcher.ConfigWatcher`.
+
+    Args:
+        filename (str): The name of the configuration file.
+        config_model (Type[Config]): The Pydantic model to validate the configuration against.
+        abs_path: If True, the filename is treated as an absolute path. Defaults to False.
+        use_cache: If False, the file is always read and validated again. Defaults to True.
+
+    Returns:
+        Config: An instance of the Pydantic model populated with the configuration data.
+    """
+    filepath = config_path(filename, abs_path)
+    if not use_cache:
+        return load_config_file(config_model, filepath)
+
+    try:
+        version = config_file_version(filepath)
+    except FileNotFoundError:
+        logger.error("Configuration file not found: %s", filepath)
+        raise
+
+    key = (os.path.abspath(filepath), config_model)
+    cached = _config_cache.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    result = load_config_file(config_model, filepath)
+    with _config_cache_lock:
+        _config_cache[key] = (version, result)
+    return result
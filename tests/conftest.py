@@ -0,0 +1,73 @@
+"""
+Shared fixtures and helpers. Services are replaced by the in-process stand-ins of `benchmarks.standins`,
+so the tests run offline: the benchmarks package is a test dependency, shared rather than duplicated here,
+and `rv16-lib[test]` installs what it needs. Tests use the stand-ins through these fixtures only.
+"""
+import time
+
+import httpx
+import pytest
+
+from benchmarks.standins import ConfigurationManagerApp, ASGIAdapter, fake_mongo_connector
+from rv16_lib.http_client import http_clients
+from rv16_lib.resilience import configure_resilience, ResilienceSettings
+
+CM_HOST = "cm-test"
+CM_PORT = 8000
+CM_URL = f"http://{CM_HOST}:{CM_PORT}"
+
+
+class CountingConfigurationManagerApp(ConfigurationManagerApp):
+    """ Configuration Manager stand-in counting the requests it answers."""
+
+    def __init__(self):
+        super().__init__()
+        self.requests = 0
+
+    def _handle(self, path: str, request: dict, headers: dict):
+        self.requests += 1
+        return super()._handle(path, request, headers)
+
+
+class FakeClock:
+    """ Manually advanced replacement of `time.monotonic`."""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+def wait_until(condition, timeout: float = 5.0, interval: float = 0.001):
+    """Poll `condition` until it is true, failing the test after `timeout` seconds."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not met in time"
+        time.sleep(interval)
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+    return FakeClock()
+
+
+@pytest.fixture
+def configuration_manager():
+    """Serve `CM_URL` from a Configuration Manager stand-in holding the configuration of test/service."""
+    app = CountingConfigurationManagerApp()
+    app.set_configuration("test", "service", {"hostname": "host", "port": 8000})
+    http_clients.mount(CM_URL, adapter=ASGIAdapter(app), transport=httpx.ASGITransport(app=app))
+    # Circuit breakers and retry budgets start over
+    configure_resilience(ResilienceSettings())
+    yield app
+    http_clients.unmount(CM_URL)
+
+
+@pytest.fixture
+def mongo_connector():
+    """A MongoConnector on an in-memory mongomock client."""
+    return fake_mongo_connector("test")
@@ -0,0 +1,153 @@
+import threading
+
+import pytest
+from pydantic import BaseModel
+
+from rv16_lib.configuration_manager import ConfigurationManagerProxy, ServiceConfigurationRequest
+from rv16_lib.configuration_manager.cache import ConfigurationCache, CacheState
+from rv16_lib.exceptions import RV16Exception
+from tests.conftest import CM_HOST, CM_PORT, wait_until
+
+PAYLOAD = ServiceConfigurationRequest(provider="test", service="service")
+
+
+class ServiceConfig(BaseModel):
+    hostname: str
+    port: int
+
+
+def test_entry_is_fresh_then_stale_then_missed(clock):
+    cache = ConfigurationCache(ttl=10, stale_ttl=20, clock=clock)
+    assert cache.lookup("k") == (None, CacheState.MISS)
+
+    cache.store("k", "value", etag='"v1"')
+    entry, state = cache.lookup("k")
+    assert (entry.value, state) == ("value", CacheState.FRESH)
+
+    clock.advance(10)
+    assert cache.lookup("k")[1] is CacheState.STALE
+
+    clock.advance(20)
+    entry, state = cache.lookup("k")
+    # Expired entries are kept for their ETag
+    assert state is CacheState.MISS and entry.etag == '"v1"'
+
+    stats = cache.stats()
+    assert (stats.hits, stats.stale_hits, stats.misses, stats.size) == (1, 1, 2, 1)
+
+
+def test_revalidate_makes_the_entry_fresh_again(clock):
+    cache = ConfigurationCache(ttl=10, stale_ttl=20, clock=clock)
+    entry = cache.store("k", "value", etag='"v1"')
+    clock.advance(15)
+
+    cache.revalidate("k", entry)
+
+    assert cache.lookup("k")[1] is CacheState.FRESH
+    assert cache.stats().not_modified == 1
+
+
+def test_only_one_refresh_is_claimed_per_key(clock):
+    cache = ConfigurationCache(clock=clock)
+
+    assert cache.try_begin_refresh("k")
+    assert not cache.try_begin_refresh("k")
+    assert cache.try_begin_refresh("other")
+
+    cache.end_refresh("k", failed=True)
+    assert cache.try_begin_refresh("k")
+    assert cache.stats().refresh_errors == 1
+
+
+def test_invalidate(clock):
+    cache = ConfigurationCache(clock=clock)
+    cache.store("a", 1)
+    cache.store("b", 2)
+
+    cache.invalidate("a")
+    assert cache.lookup("a")[1] is CacheState.MISS
+    assert cache.lookup("b")[1] is CacheState.FRESH
+
+    cache.invalidate()
+    assert cache.stats().size == 0
+
+
+def test_proxy_serves_fresh_entries_from_the_cache(configuration_manager):
+    proxy = ConfigurationManagerProxy(hostname=CM_HOST, port=CM_PORT, cache_ttl=60)
+
+    first = proxy.get(PAYLOAD, ServiceConfig)
+    second = proxy.get(PAYLOAD, ServiceConfig)
+
+    assert first == ServiceConfig(hostname="host", port=8000)
+    assert second is first
+    assert configuration_manager.requests == 1
+
+
+def test_proxy_serves_stale_entries_while_refreshing_in_the_background(configuration_manager, clock):
+    proxy = ConfigurationManagerProxy(hostname=CM_HOST, port=CM_PORT)
+    proxy.cache = ConfigurationCache(ttl=10, stale_ttl=60, clock=clock)
+    first = proxy.get(PAYLOAD, ServiceConfig)
+    configuration_manager.set_configuration("test", "service", {"hostname": "new-host", "port": 8000})
+
+    clock.advance(15)
+    assert proxy.get(PAYLOAD, ServiceConfig) is first
+
+    wait_until(lambda: proxy.cache.lookup(proxy._cache_key(PAYLOAD, ServiceConfig))[1] is CacheState.FRESH)
+    assert proxy.get(PAYLOAD, ServiceConfig).hostname == "new-host"
+
+
+def test_proxy_revalidates_expired_entries_with_their_etag(configuration_manager, clock):
+    proxy = ConfigurationManagerProxy(hostname=CM_HOST, port=CM_PORT)
+    proxy.cache = ConfigurationCache(ttl=10, stale_ttl=0, clock=clock)
+    first = proxy.get(PAYLOAD, ServiceConfig)
+
+    clock.advance(15)
+
+    assert proxy.get(PAYLOAD, ServiceConfig) is first
+    assert proxy.cache_stats().not_modified == 1
+    assert configuration_manager.requests == 2
+
+
+def test_failed_background_refresh_keeps_serving_the_stale_entry(configuration_manager, clock):
+    proxy = ConfigurationManagerProxy(hostname=CM_HOST, port=CM_PORT)
+    proxy.cache = ConfigurationCache(ttl=10, stale_ttl=60, clock=clock)
+    first = proxy.get(PAYLOAD, ServiceConfig)
+    configuration_manager.configurations.clear()
+
+    clock.advance(15)
+    refreshed = threading.Event()
+    end_refresh = proxy.cache.end_refresh
+
+    def on_end_refresh(key, failed=False):
+        end_refresh(key, failed)
+        refreshed.set()
+
+    proxy.cache.end_refresh = on_end_refresh
+    assert proxy.get(PAYLOAD, ServiceConfig) is first
+    assert refreshed.wait(5)
+
+    assert proxy.cache_stats().refresh_errors == 1
+    assert proxy.get(PAYLOAD, ServiceConfig) is first
+
+
+def test_proxy_without_cache_always_fetches(configuration_manager):
+    proxy = ConfigurationManagerProxy(hostname=CM_HOST, port=CM_PORT, cache_ttl=None)
+
+    proxy.get(PAYLOAD, ServiceConfig)
+    proxy.get(PAYLOAD, ServiceConfig)
+
+    assert configuration_manager.requests == 2
+    assert proxy.cache_stats().hits == 0
+
+
+def test_proxy_returns_a_dict_without_output_type(configuration_manager):
+    proxy = ConfigurationManagerProxy(hostname=CM_HOST, port=CM_PORT)
+
+    assert proxy.get(PAYLOAD) == {"hostname": "host", "port": 8000}
+
+
+def test_proxy_raises_on_error_status(configuration_manager):
+    proxy = ConfigurationManagerProxy(hostname=CM_HOST, port=CM_PORT)
+
+    with pytest.raises(RV16Exception):
+        proxy.get(ServiceConfigurationRequest(provider="test", service="unknown"), ServiceConfig)
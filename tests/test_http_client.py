@@ -0,0 +1,24 @@
+import asyncio
+
+import httpx
+
+from rv16_lib.http_client import HttpClientRegistry, HttpClientSettings
+
+
+def test_replaced_async_clients_are_closed_on_their_loop():
+    registry = HttpClientRegistry()
+
+    async def main():
+        first = registry.get_async_client()
+        registry.mount("http://in-process", transport=httpx.MockTransport(lambda request: httpx.Response(200)))
+        second = registry.get_async_client()
+        await asyncio.sleep(0)
+        assert second is not first and first.is_closed
+
+        registry.configure(HttpClientSettings(timeout=1.0))
+        third = registry.get_async_client()
+        await registry.aclose()
+        return second, third
+
+    second, third = asyncio.run(main())
+    assert second.is_closed and third.is_closed
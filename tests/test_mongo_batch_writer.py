@@ -0,0 +1,264 @@
+import asyncio
+import threading
+from typing import Optional
+
+import pytest
+from bson import ObjectId
+from bson.errors import InvalidDocument
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+from rv16_lib.exceptions import RV16Exception
+from rv16_lib.storage.mongo_batch_writer import MongoBatchWriter, BatchWriterSettings
+from rv16_lib.storage.mongo_element import MongoElement
+from tests.conftest import wait_until
+
+
+class Event(MongoElement):
+    collection_name = "events"
+    name: str
+    payload: object = None
+
+
+class FakeCollection:
+    """ Collection answering unordered insert_many like a MongoDB server: duplicate keys are reported
+    per document, with their key pattern. `unique` lists the fields of unique indexes besides `_id`.
+    """
+
+    def __init__(self, unique: tuple[str, ...] = ()):
+        self.documents: dict = {}
+        self.unique = unique
+        self.batch_sizes: list[int] = []
+        # Errors raised by the next insert_many calls, after writing the documents if `written_first`
+        self.failures: list[tuple[Exception, bool]] = []
+        self.blocked: Optional[threading.Event] = None
+
+    def insert_many(self, documents: list[dict], ordered: bool = True):
+        if self.blocked is not None:
+            self.blocked.wait(5)
+        self.batch_sizes.append(len(documents))
+        error, written_first = self.failures.pop(0) if self.failures else (None, False)
+        if error is not None and not written_first:
+            raise error
+
+        write_errors = []
+        for index, document in enumerate(documents):
+            duplicate = self._duplicate_key(document)
+            if duplicate is None:
+                self.documents[document["_id"]] = document
+            else:
+                write_errors.append({"index": index, "code": 11000, "keyPattern": {duplicate: 1},
+                                     "errmsg": f"E11000 duplicate key error index: {duplicate}_ dup key"})
+        if error is not None:
+            raise error
+        if write_errors:
+            raise BulkWriteError({"writeErrors": write_errors, "nInserted": len(documents) - len(write_errors)})
+
+    def _duplicate_key(self, document: dict) -> Optional[str]:
+        if document["_id"] in self.documents:
+            return "_id"
+        for field in self.unique:
+            if any(d.get(field) == document.get(field) for d in self.documents.values()):
+                return field
+        return None
+
+
+class FakeConnector:
+    def __init__(self, collection: FakeCollection):
+        self.db = {"events": collection}
+        self.metrics_target = "fake/events"
+
+
+class Errors:
+    """ on_error handler recording the failed elements."""
+
+    def __init__(self):
+        self.elements: list[MongoElement] = []
+        self.errors: list[Exception] = []
+
+    def __call__(self, elements: list[MongoElement], error: Exception):
+        self.elements.extend(elements)
+        self.errors.append(error)
+
+
+def make_writer(collection: FakeCollection, errors: Optional[Errors] = None, **settings) -> MongoBatchWriter:
+    settings = {"max_delay": 0.01, "retry_delay": 0.001, **settings}
+    return MongoBatchWriter(FakeConnector(collection), settings=BatchWriterSettings(**settings), on_error=errors)
+
+
+def test_elements_are_written_in_batches_of_max_batch_size():
+    collection = FakeCollection()
+    with make_writer(collection, max_batch_size=10) as writer:
+        for i in range(25):
+            writer.submit(Event(name=f"e{i}"))
+        assert writer.flush(5)
+
+    assert len(collection.documents) == 25
+    assert max(collection.batch_sizes) <= 10
+    stats = writer.stats()
+    assert (stats.submitted, stats.written, stats.failed) == (25, 25, 0)
+
+
+def test_a_partial_batch_is_written_after_max_delay():
+    collection = FakeCollection()
+    with make_writer(collection, max_batch_size=1000, max_delay=0.02) as writer:
+        writer.submit(Event(name="e"))
+        wait_until(lambda: writer.stats().written == 1)
+
+
+def test_retried_batches_do_not_insert_documents_twice():
+    collection = FakeCollection()
+    # The first attempt is written, but its answer is lost
+    collection.failures = [(AutoReconnect("connection reset"), True)]
+    errors = Errors()
+    with make_writer(collection, errors) as writer:
+        for i in range(5):
+            writer.submit(Event(name=f"e{i}"))
+        writer.flush(5)
+
+    assert len(collection.documents) == 5
+    stats = writer.stats()
+    assert (stats.written, stats.failed, stats.retries) == (5, 0, 1)
+    assert errors.elements == []
+
+
+def test_batches_failing_after_max_retries_are_reported():
+    collection = FakeCollection()
+    collection.failures = [(AutoReconnect("down"), False)] * 3
+    errors = Errors()
+    with make_writer(collection, errors, max_retries=2) as writer:
+        writer.submit(Event(name="e"))
+        writer.flush(5)
+
+    assert [e.name for e in errors.elements] == ["e"]
+    assert isinstance(errors.errors[0], AutoReconnect)
+    assert writer.stats().failed == 1
+
+
+def test_existing_ids_are_reported_on_the_first_attempt():
+    collection = FakeCollection()
+    existing = ObjectId()
+    collection.documents[existing] = {"_id": existing}
+    errors = Errors()
+    with make_writer(collection, errors) as writer:
+        writer.submit(Event(_id=existing, name="duplicate"))
+        writer.submit(Event(name="new"))
+        writer.flush(5)
+
+    assert [e.name for e in errors.elements] == ["duplicate"]
+    stats = writer.stats()
+    assert (stats.written, stats.failed) == (1, 1)
+
+
+def test_unique_index_violations_are_reported():
+    collection = FakeCollection(unique=("name",))
+    errors = Errors()
+    with make_writer(collection, errors) as writer:
+        writer.submit(Event(name="same"))
+        writer.submit(Event(name="same"))
+        writer.flush(5)
+
+    assert len(collection.documents) == 1
+    assert len(errors.elements) == 1
+    assert isinstance(errors.errors[0], BulkWriteError)
+
+
+def test_unexpected_errors_fail_the_batch_instead_of_dropping_it():
+    collection = FakeCollection()
+    collection.failures = [(InvalidDocument("cannot encode"), False)]
+    errors = Errors()
+    with make_writer(collection, errors) as writer:
+        writer.submit(Event(name="a"))
+        writer.submit(Event(name="b"))
+        writer.flush(5)
+
+    assert sorted(e.name for e in errors.elements) == ["a", "b"]
+    assert writer.stats().failed == 2
+
+
+def test_unencodable_elements_are_rejected_by_submit():
+    with make_writer(FakeCollection()) as writer:
+        with pytest.raises(RV16Exception) as raised:
+            writer.submit(Event(name="e", payload=object()))
+
+    assert raised.value.status_code == 400
+    assert writer.stats().submitted == 0
+
+
+def test_submit_raises_when_the_queue_stays_full():
+    collection = FakeCollection()
+    collection.blocked = threading.Event()
+    writer = make_writer(collection, max_batch_size=1, max_queue_size=1, submit_timeout=0.05)
+    try:
+        writer.submit(Event(name="written"))
+        wait_until(lambda: collection.batch_sizes or writer._queue.empty())
+        writer.submit(Event(name="queued"))
+        with pytest.raises(RV16Exception) as raised:
+            writer.submit(Event(name="rejected"))
+        assert raised.value.status_code == 503
+    finally:
+        collection.blocked.set()
+        writer.close()
+
+    assert writer.stats().written == 2
+
+
+def test_close_writes_the_queued_elements_and_rejects_new_ones():
+    collection = FakeCollection()
+    writer = make_writer(collection, max_delay=10, max_batch_size=1000)
+    for i in range(3):
+        writer.submit(Event(name=f"e{i}"))
+
+    writer.close()
+
+    assert len(collection.documents) == 3
+    with pytest.raises(RV16Exception) as raised:
+        writer.submit(Event(name="late"))
+    assert raised.value.status_code == 500
+
+
+def test_submit_racing_with_close_does_not_leave_the_element_queued():
+    writer = make_writer(FakeCollection())
+    prepare = writer._prepare
+
+    def prepare_then_close(element):
+        item = prepare(element)
+        writer.close()
+        return item
+
+    writer._prepare = prepare_then_close
+    with pytest.raises(RV16Exception) as raised:
+        writer.submit(Event(name="late"))
+
+    assert raised.value.status_code == 500
+    assert writer.flush(1)
+
+
+def test_generated_ids_are_set_on_the_submitted_elements():
+    collection = FakeCollection()
+    event = Event(name="e")
+    with make_writer(collection) as writer:
+        writer.submit(event)
+
+    assert event.id is not None
+    assert collection.documents[event.id]["name"] == "e"
+
+
+def test_submit_async():
+    collection = FakeCollection()
+
+    async def main(writer: MongoBatchWriter):
+        await asyncio.gather(*(writer.submit_async(Event(name=f"e{i}")) for i in range(10)))
+
+    with make_writer(collection) as writer:
+        asyncio.run(main(writer))
+        writer.flush(5)
+
+    assert len(collection.documents) == 10
+
+
+def test_writes_to_the_collection_of_the_elements(mongo_connector):
+    with MongoBatchWriter(mongo_connector, settings=BatchWriterSettings(max_delay=0.01)) as writer:
+        for i in range(20):
+            writer.submit(Event(name=f"e{i}"))
+
+    assert mongo_connector.db["events"].count_documents({}) == 20
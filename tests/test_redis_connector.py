@@ -0,0 +1,25 @@
+import fakeredis
+import pytest
+
+from rv16_lib.exceptions import RV16Exception
+from rv16_lib.storage.codecs import RawCodec
+from rv16_lib.storage.redis_connector import RedisConnector, RedisElement
+
+
+def make_connector(**kwargs) -> RedisConnector:
+    server = fakeredis.FakeServer()
+    return RedisConnector("localhost", 6379, 0, client=fakeredis.FakeRedis(server=server, decode_responses=True),
+                          binary_client=fakeredis.FakeRedis(server=server), ping=False, **kwargs)
+
+
+@pytest.mark.parametrize("codec, value", [(None, ""), (RawCodec(), b"")])
+def test_find_returns_stored_empty_values(codec, value):
+    connector = make_connector(codec=codec)
+    connector.insert_one(RedisElement(key="k", value=value))
+
+    assert connector.find(RedisElement(key="k")) == value
+
+
+def test_find_raises_on_missing_keys():
+    with pytest.raises(RV16Exception):
+        make_connector().find(RedisElement(key="missing"))
@@ -0,0 +1,23 @@
+import mongomock
+
+from rv16_lib.storage.mongo_element import MongoElement, MongoIndex
+from rv16_lib.storage.registry import ConnectorRegistry
+
+
+class Session(MongoElement):
+    collection_name = "sessions"
+    indexes = (MongoIndex(keys=[("token", 1)], unique=True),)
+    token: str
+
+
+def test_indexes_are_created_by_warm_up_not_by_mongo_connector(monkeypatch):
+    client = mongomock.MongoClient()
+    registry = ConnectorRegistry()
+    monkeypatch.setattr(registry, "_build_mongo_client", lambda host, port: client)
+
+    connector = registry.mongo_connector("mongo", 27017, "auth", elements=[Session])
+    assert "token_1" not in client["auth"]["sessions"].index_information()
+
+    registry.warm_up(background=False)
+    assert "token_1" in client["auth"]["sessions"].index_information()
+    assert connector.elements == (Session,)
@@ -0,0 +1,226 @@
+import asyncio
+import time
+
+import pytest
+
+from rv16_lib.resilience import Resilience, ResilienceSettings, RetryPolicy, RetryBudgetSettings, \
+    CircuitBreakerSettings, CircuitState, CircuitOpenError, cap_timeout
+
+HOST = "service:8000"
+
+
+class TransportError(Exception):
+    """Stands for a network error of the HTTP library."""
+
+
+class Response:
+    def __init__(self, status_code: int = 200):
+        self.status_code = status_code
+
+
+def make_resilience(failure_threshold: int = 3, reset_timeout: float = 30.0, probe_timeout: float = 60.0,
+                    max_attempts: int = 3, max_tokens: float = 10.0) -> Resilience:
+    return Resilience(ResilienceSettings(
+        retry=RetryPolicy(max_attempts=max_attempts, base_delay=0.001, max_delay=0.001),
+        budget=RetryBudgetSettings(max_tokens=max_tokens),
+        breaker=CircuitBreakerSettings(failure_threshold=failure_threshold, reset_timeout=reset_timeout,
+                                       probe_timeout=probe_timeout)))
+
+
+def call_kwargs(idempotent: bool = True) -> dict:
+    return dict(idempotent=idempotent, status_of=lambda r: r.status_code,
+                retryable_error=lambda e, idempotent: isinstance(e, TransportError),
+                deadline_error=TimeoutError)
+
+
+def scripted(*outcomes):
+    """Return an attempt function answering or raising the given outcomes in turn, and its call log."""
+    calls = []
+
+    def attempt(timeout):
+        calls.append(timeout)
+        outcome = outcomes[len(calls) - 1]
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+    return attempt, calls
+
+
+def open_breaker(resilience: Resilience):
+    breaker = resilience.breaker(HOST)
+    for _ in range(resilience.settings.breaker.failure_threshold):
+        breaker.record_failure()
+    assert breaker.state is CircuitState.OPEN
+
+
+def test_transport_errors_are_retried():
+    resilience = make_resilience()
+    attempt, calls = scripted(TransportError(), Response(200))
+
+    assert resilience.call_sync(HOST, attempt, **call_kwargs()).status_code == 200
+    assert len(calls) == 2
+
+
+def test_retry_statuses_are_retried_for_idempotent_calls_only():
+    resilience = make_resilience()
+    attempt, calls = scripted(Response(503), Response(200))
+    assert resilience.call_sync(HOST, attempt, **call_kwargs()).status_code == 200
+    assert len(calls) == 2
+
+    attempt, calls = scripted(Response(503), Response(200))
+    assert resilience.call_sync(HOST, attempt, **call_kwargs(idempotent=False)).status_code == 503
+    assert len(calls) == 1
+
+
+def test_retries_stop_after_max_attempts():
+    resilience = make_resilience(failure_threshold=10, max_attempts=3)
+    attempt, calls = scripted(*[TransportError()] * 5)
+
+    with pytest.raises(TransportError):
+        resilience.call_sync(HOST, attempt, **call_kwargs())
+    assert len(calls) == 3
+
+
+def test_retries_stop_when_the_budget_is_exhausted():
+    resilience = make_resilience(failure_threshold=10, max_tokens=0)
+    attempt, calls = scripted(*[TransportError()] * 3)
+
+    with pytest.raises(TransportError):
+        resilience.call_sync(HOST, attempt, **call_kwargs())
+    assert len(calls) == 1
+
+
+def test_the_deadline_caps_the_attempt_timeout():
+    resilience = make_resilience()
+    attempt, calls = scripted(Response(200))
+
+    resilience.call_sync(HOST, attempt, **call_kwargs(), deadline=0.5, timeout=10.0)
+    assert 0 < calls[0] <= 0.5
+
+
+def test_open_circuit_fails_fast():
+    resilience = make_resilience(failure_threshold=3, max_attempts=1)
+    for _ in range(3):
+        with pytest.raises(TransportError):
+            resilience.call_sync(HOST, scripted(TransportError())[0], **call_kwargs())
+
+    attempt, calls = scripted(Response(200))
+    with pytest.raises(CircuitOpenError):
+        resilience.call_sync(HOST, attempt, **call_kwargs())
+    assert calls == []
+
+
+def test_successful_probe_closes_the_circuit():
+    resilience = make_resilience(reset_timeout=0.01)
+    open_breaker(resilience)
+    time.sleep(0.02)
+
+    assert resilience.call_sync(HOST, scripted(Response(200))[0], **call_kwargs()).status_code == 200
+    assert resilience.breaker(HOST).state is CircuitState.CLOSED
+
+
+def test_failed_probe_opens_the_circuit_again():
+    resilience = make_resilience(reset_timeout=0.01, max_attempts=1)
+    open_breaker(resilience)
+    time.sleep(0.02)
+
+    with pytest.raises(TransportError):
+        resilience.call_sync(HOST, scripted(TransportError())[0], **call_kwargs())
+    assert resilience.breaker(HOST).state is CircuitState.OPEN
+
+
+def test_caller_errors_do_not_open_the_circuit():
+    resilience = make_resilience(failure_threshold=2)
+    for _ in range(5):
+        with pytest.raises(ValueError):
+            resilience.call_sync(HOST, scripted(ValueError("invalid URL"))[0], **call_kwargs())
+
+    assert resilience.breaker(HOST).state is CircuitState.CLOSED
+
+
+def test_cancelled_probe_releases_the_circuit():
+    resilience = make_resilience(reset_timeout=0.01)
+    open_breaker(resilience)
+    time.sleep(0.02)
+
+    async def slow(timeout):
+        await asyncio.sleep(10)
+
+    async def ok(timeout):
+        return Response(200)
+
+    async def main():
+        probe = asyncio.ensure_future(resilience.call_async(HOST, slow, **call_kwargs()))
+        await asyncio.sleep(0.01)
+        assert resilience.breaker(HOST).state is CircuitState.HALF_OPEN
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        return await resilience.call_async(HOST, ok, **call_kwargs())
+
+    assert asyncio.run(main()).status_code == 200
+    assert resilience.breaker(HOST).state is CircuitState.CLOSED
+
+
+def test_expired_deadline_does_not_take_the_probe():
+    resilience = make_resilience(reset_timeout=0.01)
+    open_breaker(resilience)
+    time.sleep(0.02)
+
+    attempt, calls = scripted(Response(200))
+    with pytest.raises(TimeoutError):
+        resilience.call_sync(HOST, attempt, **call_kwargs(), deadline=0)
+    assert calls == []
+
+    assert resilience.call_sync(HOST, attempt, **call_kwargs()).status_code == 200
+
+
+def test_unreported_probe_is_replaced_after_probe_timeout():
+    resilience = make_resilience(reset_timeout=0.01, probe_timeout=0.05)
+    open_breaker(resilience)
+    breaker = resilience.breaker(HOST)
+    time.sleep(0.02)
+
+    assert breaker.allow()
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
+
+
+def test_hedged_async_call_returns_the_first_answer():
+    resilience = make_resilience()
+    delays = [1.0, 0.0]
+
+    async def attempt(timeout):
+        await asyncio.sleep(delays.pop(0))
+        return Response(200)
+
+    async def main():
+        started = time.monotonic()
+        response = await resilience.call_async(HOST, attempt, **call_kwargs(), hedge_delay=0.02)
+        return response, time.monotonic() - started
+
+    response, elapsed = asyncio.run(main())
+    assert response.status_code == 200
+    assert elapsed < 0.5
+
+
+def test_disabled_resilience_makes_a_single_attempt():
+    resilience = Resilience(ResilienceSettings(enabled=False))
+    attempt, calls = scripted(TransportError(), Response(200))
+
+    with pytest.raises(TransportError):
+        resilience.call_sync(HOST, attempt, **call_kwargs())
+    assert len(calls) == 1
+
+
+@pytest.mark.parametrize("timeout, remaining, expected", [
+    (10.0, None, 10.0),
+    (None, 2.0, 2.0),
+    (10.0, 2.0, 2.0),
+    ((1.0, 10.0), 2.0, (1.0, 2.0)),
+    ((None, 10.0), 2.0, (2.0, 2.0)),
+])
+def test_cap_timeout(timeout, remaining, expected):
+    assert cap_timeout(timeout, remaining) == expected
@@ -0,0 +1,130 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from rv16_lib.configuration_manager import AsyncConfigurationManagerProxy, ServiceConfigurationRequest
+from rv16_lib.configuration_manager.singleflight import SingleFlight, AsyncSingleFlight
+from rv16_lib.http_client import aclose_http_clients
+from tests.conftest import CM_HOST, CM_PORT, wait_until
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "result"
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        leader = executor.submit(flight.do, "k", fn)
+        assert started.wait(5)
+        followers = [executor.submit(flight.do, "k", fn) for _ in range(7)]
+        wait_until(lambda: flight.coalesced == 7)
+        release.set()
+        results = [leader.result(5)] + [f.result(5) for f in followers]
+
+    assert results == ["result"] * 8
+    assert len(calls) == 1
+
+
+def test_errors_are_raised_to_every_waiter():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def fn():
+        started.set()
+        release.wait(5)
+        raise ValueError("boom")
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        leader = executor.submit(flight.do, "k", fn)
+        assert started.wait(5)
+        follower = executor.submit(flight.do, "k", fn)
+        wait_until(lambda: flight.coalesced == 1)
+        release.set()
+        for future in (leader, follower):
+            with pytest.raises(ValueError):
+                future.result(5)
+
+
+def test_finished_calls_are_not_shared():
+    flight = SingleFlight()
+    counter = iter(range(10))
+
+    assert flight.do("k", lambda: next(counter)) == 0
+    assert flight.do("k", lambda: next(counter)) == 1
+    assert flight.coalesced == 0
+
+
+def test_async_concurrent_calls_share_one_task():
+    flight = AsyncSingleFlight()
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "result"
+
+    async def main():
+        return await asyncio.gather(*(flight.do("k", fn) for _ in range(10)))
+
+    assert asyncio.run(main()) == ["result"] * 10
+    assert len(calls) == 1
+    assert flight.coalesced == 9
+
+
+def test_async_cancelled_waiter_does_not_cancel_the_shared_task():
+    flight = AsyncSingleFlight()
+
+    async def fn():
+        await asyncio.sleep(0.02)
+        return "result"
+
+    async def main():
+        first = asyncio.ensure_future(flight.do("k", fn))
+        second = asyncio.ensure_future(flight.do("k", fn))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == "result"
+
+
+def test_async_errors_are_raised_to_every_waiter():
+    flight = AsyncSingleFlight()
+
+    async def fn():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def main():
+        return await asyncio.gather(*(flight.do("k", fn) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert [type(r) for r in results] == [ValueError] * 3
+
+
+def test_async_proxy_merges_identical_requests(configuration_manager):
+    proxy = AsyncConfigurationManagerProxy(hostname=CM_HOST, port=CM_PORT, cache_ttl=None)
+    payload = ServiceConfigurationRequest(provider="test", service="service")
+
+    async def main():
+        try:
+            return await asyncio.gather(*(proxy.get(payload) for _ in range(10)))
+        finally:
+            await aclose_http_clients()
+
+    results = asyncio.run(main())
+
+    assert results == [{"hostname": "host", "port": 8000}] * 10
+    assert configuration_manager.requests == 1
@@ -0,0 +1,180 @@
+import asyncio
+import threading
+
+import pytest
+
+from rv16_lib.architecture import BaseService, StartupOrchestrator, ComponentState
+from rv16_lib.configuration_manager import ConfigurationManagerProxy
+from rv16_lib.exceptions import RV16Exception
+from tests.conftest import CM_HOST, CM_PORT
+
+
+def test_components_start_after_their_dependencies():
+    started = []
+    orchestrator = StartupOrchestrator()
+    orchestrator.add("api", lambda: started.append("api"), depends_on=["db", "cache"])
+    orchestrator.add("db", lambda: started.append("db"))
+    orchestrator.add("cache", lambda: started.append("cache"))
+
+    orchestrator.start_sync()
+
+    assert started[-1] == "api"
+    assert orchestrator.ready
+
+
+def test_independent_components_start_concurrently():
+    barrier = threading.Barrier(2, timeout=5)
+    orchestrator = StartupOrchestrator()
+    orchestrator.add("a", barrier.wait)
+    orchestrator.add("b", barrier.wait)
+
+    orchestrator.start_sync()
+
+    assert orchestrator.ready
+
+
+def test_coroutine_initializers_are_awaited():
+    async def connect():
+        await asyncio.sleep(0)
+        return "connection"
+
+    orchestrator = StartupOrchestrator()
+    orchestrator.add("db", connect)
+    orchestrator.start_sync()
+
+    assert orchestrator.get("db") == "connection"
+
+
+def test_failed_dependency_fails_its_dependents():
+    orchestrator = StartupOrchestrator()
+    orchestrator.add("db", lambda: 1 / 0)
+    orchestrator.add("api", lambda: "api", depends_on=["db"])
+
+    with pytest.raises(RV16Exception):
+        orchestrator.start_sync()
+
+    readiness = orchestrator.readiness()
+    assert readiness["db"].state is ComponentState.FAILED
+    assert readiness["api"].state is ComponentState.FAILED
+    assert not orchestrator.ready
+
+
+def test_start_again_retries_the_failed_components():
+    attempts = []
+
+    def db():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ConnectionError("down")
+        return "db"
+
+    orchestrator = StartupOrchestrator()
+    orchestrator.add("db", db)
+    orchestrator.add("api", lambda: "api", depends_on=["db"])
+    with pytest.raises(RV16Exception):
+        orchestrator.start_sync()
+
+    orchestrator.start_sync()
+
+    assert orchestrator.ready
+    assert orchestrator.get("api") == "api"
+    assert orchestrator.readiness()["db"].error is None
+
+
+def test_start_after_a_lazy_dependency_was_initialized():
+    orchestrator = StartupOrchestrator()
+    orchestrator.add("cache", lambda: "cache", critical=False)
+    orchestrator.add("api", lambda: "api", depends_on=["cache"])
+    assert orchestrator.get("cache") == "cache"
+
+    orchestrator.start_sync()
+
+    assert orchestrator.get("api") == "api"
+
+
+def test_lazy_components_start_on_first_get():
+    calls = []
+    orchestrator = StartupOrchestrator()
+    orchestrator.add("reports", lambda: calls.append(1) or "reports", critical=False)
+    orchestrator.start_sync()
+    assert calls == []
+
+    assert orchestrator.get("reports") == "reports"
+    assert orchestrator.get("reports") == "reports"
+    assert calls == [1]
+
+
+def test_dependency_cycles_and_unknown_dependencies_are_rejected():
+    orchestrator = StartupOrchestrator()
+    orchestrator.add("a", lambda: "a", depends_on=["b"])
+    orchestrator.add("b", lambda: "b", depends_on=["a"])
+    with pytest.raises(ValueError):
+        orchestrator.start_sync()
+
+    orchestrator = StartupOrchestrator()
+    orchestrator.add("a", lambda: "a", depends_on=["missing"])
+    with pytest.raises(ValueError):
+        orchestrator.start_sync()
+
+
+def test_lazy_coroutine_components_are_built_on_the_loop_of_start():
+    async def connect():
+        return asyncio.get_running_loop()
+
+    orchestrator = StartupOrchestrator()
+    orchestrator.add("client", connect, critical=False)
+
+    async def main():
+        await orchestrator.start()
+        # From a worker thread, e.g. a synchronous endpoint: waits for the initialization
+        return asyncio.get_running_loop(), await asyncio.to_thread(orchestrator.get, "client")
+
+    loop, client_loop = asyncio.run(main())
+    assert client_loop is loop
+
+
+def test_lazy_coroutine_components_start_in_the_background_on_the_loop():
+    async def connect():
+        await asyncio.sleep(0)
+        return "client"
+
+    orchestrator = StartupOrchestrator()
+    orchestrator.add("client", connect, critical=False)
+
+    async def main():
+        await orchestrator.start()
+        with pytest.raises(RV16Exception):
+            orchestrator.get("client")
+        for _ in range(100):
+            if orchestrator.readiness()["client"].state is ComponentState.READY:
+                break
+            await asyncio.sleep(0.001)
+        return orchestrator.get("client")
+
+    assert asyncio.run(main()) == "client"
+
+
+def test_lazy_coroutine_components_need_the_loop_of_start():
+    async def connect():
+        return "client"
+
+    orchestrator = StartupOrchestrator()
+    orchestrator.add("client", connect, critical=False)
+    orchestrator.start_sync()
+
+    with pytest.raises(RV16Exception):
+        orchestrator.get("client")
+    assert orchestrator.readiness()["client"].state is ComponentState.LAZY
+
+
+def test_registration_runs_after_its_dependencies(configuration_manager):
+    service = BaseService()
+    service.service_name = "registered"
+    service.add_provider("users", lambda: "users")
+    service.add_registration(ConfigurationManagerProxy(hostname=CM_HOST, port=CM_PORT), "test", {"port": 8000},
+                             depends_on=["users"])
+
+    asyncio.run(service.start())
+
+    assert service.startup.get("registration") == {"status": "registered"}
+    assert ("test", "registered") in configuration_manager.configurations
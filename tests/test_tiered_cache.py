@@ -0,0 +1,87 @@
+import time
+
+import fakeredis
+import pytest
+
+from rv16_lib.storage import tiered_cache
+from rv16_lib.storage.redis_connector import RedisConnector
+from rv16_lib.storage.tiered_cache import TieredCache, _MISSING
+from tests.conftest import wait_until
+
+
+@pytest.fixture
+def server() -> fakeredis.FakeServer:
+    return fakeredis.FakeServer()
+
+
+def make_cache(server: fakeredis.FakeServer) -> TieredCache:
+    client = fakeredis.FakeRedis(server=server, decode_responses=True)
+    return TieredCache(RedisConnector("localhost", 6379, 0, client=client, ping=False), "test")
+
+
+def test_values_are_loaded_once_then_served_from_the_tiers(server):
+    cache = make_cache(server)
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return {"value": 1}
+
+    assert cache.get("k", loader) == {"value": 1}
+    assert cache.get("k", loader) == {"value": 1}
+    assert make_cache(server).get("k", loader) == {"value": 1}
+
+    assert loads == [1]
+
+
+def test_invalidating_everything_drops_the_namespace_from_redis(server):
+    cache, other = make_cache(server), make_cache(server)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    other.redis.client.set("other:a", "kept")
+
+    cache.invalidate()
+
+    assert other.get("a") is None and other.get("b") is None
+    assert other.redis.client.get("other:a") == "kept"
+    assert other.stats()["redis"].evictions is None
+
+
+def test_invalidations_reach_the_other_replicas(server):
+    writer, reader = make_cache(server), make_cache(server)
+    reader.start_invalidation_listener()
+    try:
+        time.sleep(0.05)
+        reader.local.set("k", "old")
+
+        writer.invalidate("k")
+
+        wait_until(lambda: reader.local.get("k") is _MISSING)
+    finally:
+        reader.stop_invalidation_listener(5)
+
+
+def test_listener_subscribes_again_after_a_disconnection(server, monkeypatch):
+    monkeypatch.setattr(tiered_cache, "_LISTENER_MIN_BACKOFF", 0.01)
+    writer, reader = make_cache(server), make_cache(server)
+    reader.start_invalidation_listener()
+    try:
+        time.sleep(0.05)
+        server.connected = False
+        # Longer than the 1s wait for messages, so that the listener sees the disconnection
+        time.sleep(1.2)
+        assert reader._listener.is_alive()
+
+        # Invalidations published while disconnected were missed: the local tier is cleared
+        reader.local.set("k", "stale")
+        server.connected = True
+        wait_until(lambda: reader.local.get("k") is _MISSING)
+
+        reader.local.set("k", "old")
+        writer.invalidate("k")
+        wait_until(lambda: reader.local.get("k") is _MISSING)
+    finally:
+        server.connected = True
+        reader.stop_invalidation_listener(5)
+
+    assert reader._listener is None